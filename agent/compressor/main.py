@@ -0,0 +1,142 @@
+import re
+import numpy as np
+from memory_manager.text_index.main import TOKEN_REGEX, STOP_WORDS
+
+class ExtractiveCompressor:
+    """
+    Shrinks a list of messages to a token budget without calling an LLM. Sentences are scored by
+    their TF-IDF weight and their centrality, how similar they are to the rest of the text, and the
+    best are packed greedily into the budget, then given back in their original order.
+    """
+
+    def __init__(self, count_tokens, centrality_weight:float = 0.5):
+        """
+        Constructor for ExtractiveCompressor
+
+        Args:
+            count_tokens (callable): Counts the tokens of a list of strings, e.g. ChatApi.get_message_sizes.
+            centrality_weight (float, optional): The share of a sentence's score that comes from its
+                centrality, the rest from its TF-IDF weight. Defaults to 0.5.
+        """
+
+        if not 0 <= centrality_weight <= 1:
+            raise Exception('centrality_weight must be between 0 and 1.')
+
+        # Constants
+        self.SENTENCE_REGEX = re.compile(r'(?<=[.!?])\s+|\n+')
+        self.TOKEN_REGEX = TOKEN_REGEX
+        self.STOP_WORDS = STOP_WORDS
+
+        self.count_tokens = count_tokens
+        self.centrality_weight = centrality_weight
+
+
+    def compress(self, messages:list, token_length:int) -> str:
+        """
+        Compress messages to a token budget.
+
+        Args:
+            messages (list): The messages, dicts with from and message.
+            token_length (int): The token budget.
+
+        Returns:
+            str: The selected sentences, one per line prefixed by their sender.
+        """
+
+        sentences = self.split_sentences(messages)
+        if not sentences or token_length < 1:
+            return ''
+
+        scores = self.score_sentences([sentence for _, sentence in sentences])
+        lines = [f'{sender}: {sentence}' for sender, sentence in sentences]
+        sizes = self.count_tokens(lines)
+
+        # Best first, skipping what no longer fits, then back in conversation order
+        selected = []
+        remaining = token_length
+        for index in np.argsort(-scores, kind='stable'):
+            if sizes[index] <= remaining:
+                selected.append(index)
+                remaining -= sizes[index]
+
+        return '\n'.join(lines[index] for index in sorted(selected))
+
+
+    def split_sentences(self, messages:list) -> list:
+        """
+        Split messages into sentences.
+
+        Args:
+            messages (list): The messages.
+
+        Returns:
+            list: (sender, sentence) pairs in conversation order.
+        """
+
+        sentences = []
+        for message in messages:
+            for sentence in self.SENTENCE_REGEX.split(str(message.get('message') or '')):
+                sentence = sentence.strip()
+                if sentence:
+                    sentences.append((message.get('from'), sentence))
+
+        return sentences
+
+
+    def score_sentences(self, sentences:list) -> np.ndarray:
+        """
+        Score sentences by TF-IDF weight and centrality.
+
+        Args:
+            sentences (list): The sentences.
+
+        Returns:
+            np.ndarray: The score of each sentence, between 0 and 1.
+        """
+
+        vocabulary = {}
+        rows = []
+        for sentence in sentences:
+            terms = [term for term in self.TOKEN_REGEX.findall(sentence.lower()) if term not in self.STOP_WORDS]
+            rows.append([vocabulary.setdefault(term, len(vocabulary)) for term in terms])
+
+        counts = np.zeros((len(sentences), max(len(vocabulary), 1)), dtype=np.float32)
+        for row, columns in enumerate(rows):
+            np.add.at(counts[row], columns, 1)
+
+        # Sublinear term frequency times smoothed inverse document frequency
+        document_frequency = np.count_nonzero(counts, axis=0)
+        idf = np.log((1 + len(sentences)) / (1 + document_frequency)) + 1
+        weights = np.log1p(counts) * idf
+
+        # Centrality: the total cosine similarity of a sentence to every other sentence
+        norms = np.linalg.norm(weights, axis=1, keepdims=True)
+        unit = np.divide(weights, norms, out=np.zeros_like(weights), where=norms > 0)
+        similarity = unit @ unit.T
+        np.fill_diagonal(similarity, 0)
+        centrality = similarity.sum(axis=1)
+
+        # Mean weight per term, so long sentences do not win on length alone
+        lengths = np.array([max(len(columns), 1) for columns in rows], dtype=np.float32)
+        importance = weights.sum(axis=1) / lengths
+
+        return (self.centrality_weight * self.normalize(centrality)
+                + (1 - self.centrality_weight) * self.normalize(importance))
+
+
+    def normalize(self, values:np.ndarray) -> np.ndarray:
+        """
+        Scale values to between 0 and 1.
+
+        Args:
+            values (np.ndarray): The values.
+
+        Returns:
+            np.ndarray: The scaled values, all 0 when they are equal.
+        """
+
+        spread = values.max() - values.min() if len(values) else 0
+        if spread <= 0:
+            return np.zeros_like(values)
+
+        return (values - values.min()) / spread
@@ -0,0 +1,90 @@
+class ConversationState:
+    """
+    The running state of a conversation with one peer: the opening message, a summary of everything
+    that no longer fits, and the raw tail of recent messages. pending is a summarization running in the
+    background, which has to finish before the conversation is used again.
+    """
+
+    __slots__ = ('head', 'summary', 'tail', 'tail_tokens', 'pending')
+
+    def __init__(self):
+
+        self.head = None
+        self.summary = None
+        self.tail = []
+        self.tail_tokens = 0
+        self.pending = None
+
+
+    def append(self, message:dict):
+        """
+        Add a message to the conversation. The first message becomes the head and is always sent.
+
+        Args:
+            message (dict): The message, with its token count.
+        """
+
+        if self.head is None:
+            self.head = message
+        else:
+            self.tail.append(message)
+            self.tail_tokens += message['tokens']
+
+
+    def get_summary_tokens(self) -> int:
+        """
+        Get the token count of the running summary.
+
+        Returns:
+            int: The token count, 0 when nothing has been summarized yet.
+        """
+
+        return self.summary['tokens'] if self.summary is not None else 0
+
+
+    def peek_overflow(self, token_limit:int) -> list:
+        """
+        Get the oldest tail messages that would have to go for the tail to fit a token limit, without
+        removing them.
+
+        Args:
+            token_limit (int): The tokens the tail may take.
+
+        Returns:
+            list: The messages, oldest first.
+        """
+
+        count = 0
+        tail_tokens = self.tail_tokens
+        while count < len(self.tail) - 1 and tail_tokens > token_limit:
+            tail_tokens -= self.tail[count]['tokens']
+            count += 1
+
+        return self.tail[:count]
+
+
+    def drop_oldest(self, count:int):
+        """
+        Remove the oldest tail messages.
+
+        Args:
+            count (int): The number of messages.
+        """
+
+        self.tail_tokens -= sum(message['tokens'] for message in self.tail[:count])
+        del self.tail[:count]
+
+
+    def get_messages(self) -> list:
+        """
+        Get the conversation as it is sent: the head, the summary, then the tail.
+
+        Returns:
+            list: The messages.
+        """
+
+        messages = [self.head] if self.head is not None else []
+        if self.summary is not None:
+            messages.append(self.summary)
+
+        return messages + self.tail
@@ -1,14 +1,30 @@
+import asyncio
+import contextlib
 import datetime
 import json
 import re
 import time
+from concurrent.futures import ThreadPoolExecutor
 from colorama import Fore, Back, Style
-from memory_manager.main import MemoryManager
+from memory_manager.main import MemoryManager, MemoryView
+from memory_manager.storage.main import MemoryStorage
+from memory_manager.eviction.main import EvictionTracker
 from chat_api.main import ChatApi
+from chat_api.request_slots.main import RequestSlots
+from agent.summary_cache.main import SummaryCache
+from agent.conversation.main import ConversationState
+from agent.compressor.main import ExtractiveCompressor
+from agent.prompt_packer.main import PromptPacker
+from agent.message.main import Message, MessageList
+from agent.prompt_template.main import PromptTemplates
 
 class Agent:
 
-    def __init__(self, chat_api:ChatApi, agent_profile:dict, project:str, session_id:str, commands:dict = {}):
+    def __init__(self, chat_api:ChatApi, agent_profile:dict, project:str, session_id:str, commands:dict = {},
+                 memory_storage:MemoryStorage|None = None, memory_eviction:dict|None = None,
+                 memory:MemoryManager|MemoryView|None = None, summary_cache:SummaryCache|None = None,
+                 summary_mode:str = 'full', speculative_summary_threshold:float|None = None,
+                 compression:str|dict|None = None, request_slots:RequestSlots|None = None):
         """
         Constructor for Agent
 
@@ -18,6 +34,21 @@ class Agent:
             project (str, optional): The project name. Defaults to ''.
             user_string (str, optional): The user string. Defaults to ''.
             bot_string (str, optional): The bot string. Defaults to ''.
+            memory_storage (MemoryStorage, optional): Where the agent's memories are kept. Defaults to memory only.
+            memory_eviction (dict, optional): Eviction policies for the agent's memories. Defaults to the usage threshold only.
+            memory (MemoryManager|MemoryView, optional): Memory shared with other agents. Defaults to a memory of its own.
+            summary_cache (SummaryCache, optional): Summaries already made. Defaults to the cache shared by all agents.
+            summary_mode (str, optional): 'full' summarizes the overflowing middle of each conversation sent,
+                'rolling' keeps a running summary per peer and only folds in new overflow. Defaults to 'full'.
+            speculative_summary_threshold (float, optional): In rolling mode, the share of the context a
+                conversation can fill before its oldest messages are summarized in the background, ahead
+                of the turn that would overflow. Defaults to None, summarizing only when needed.
+            compression (str|dict, optional): How context is shrunk: 'llm' summarizes with an API call,
+                'extractive' keeps the most important sentences locally, or a compressor with a
+                compress(messages, token_length) method. A dict chooses per call site, conversation or
+                recall. The profile's compression setting takes precedence. Defaults to 'llm'.
+            request_slots (RequestSlots, optional): The limit on requests to the chat API backend, shared
+                with the other agents on it. Defaults to None, no limit.
         """
 
         super().__init__()
@@ -41,16 +72,19 @@ class Agent:
             raise Exception('session_id must be of type str')
 
         # Constants
-        self.RESPONSE_TEMPLATE = {
-            "from": self.profile['name'],
-            "to": None,
-            "message": None,
-            'timestamp': None,
-            'tokens': 0
-        }
         self.SYSTEM_USER = 'System'
         self.TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
         self.SUMMARY_PROMPT = 'Please summarize the below text.\n\n'
+        self.SUMMARY_USER = 'Summary'
+        self.SUMMARY_MODE_FULL = 'full'
+        self.SUMMARY_MODE_ROLLING = 'rolling'
+        self.COMPRESSION_LLM = 'llm'
+        self.COMPRESSION_EXTRACTIVE = 'extractive'
+        self.SITE_CONVERSATION = 'conversation'
+        self.SITE_RECALL = 'recall'
+        self.ROLLING_SUMMARY_SHARE = 0.25
+        self.RECALL_SHARE = 0.25
+        self.MAX_REPLY_TOKENS = 200
         self.COMMAND_REGEX = r"<commands(:[\w,]+)?>"
 
         # Set-up the template tokens
@@ -65,135 +99,680 @@ class Agent:
 
         # Attributes
         self.name = self.profile['name']
-        self.memory = MemoryManager(self.session_id + '-' + self.name)
+        if memory is not None:
+            self.memory = memory
+        else:
+            self.memory = MemoryManager(self.session_id + '-' + self.name,
+                                        semantic_recall=self.profile.get('semantic_recall', True) is not False,
+                                        storage=memory_storage,
+                                        eviction=EvictionTracker.from_config(memory_eviction))
+        self.summary_cache = summary_cache if summary_cache is not None else SummaryCache.shared()
+        if summary_mode not in [self.SUMMARY_MODE_FULL, self.SUMMARY_MODE_ROLLING]:
+            raise Exception('summary_mode must be full or rolling.')
+        self.summary_mode = summary_mode
+        self.conversations = {}
+        if speculative_summary_threshold is not None and not 0 < speculative_summary_threshold <= 1:
+            raise Exception('speculative_summary_threshold must be between 0 and 1.')
+        self.speculative_summary_threshold = speculative_summary_threshold
+        self.summary_pool = None
+        self.request_slots = request_slots
+        self.compressors = self.create_compressors(self.profile.get('compression', compression))
+        self.prompt_packer = PromptPacker(summary_share=self.ROLLING_SUMMARY_SHARE)
+        self.prompt_templates = PromptTemplates.shared()
         self.outbound_queue = {}
         self.inbound_queue = {}
-        self.system_prompt = self.RESPONSE_TEMPLATE.copy()
+        self.inbound_listener = None
+        self.system_prompt = None
+
+
+    def set_inbound_listener(self, listener):
+        """
+        Register a callable that is told whenever the inbound queue receives a message.
+
+        Args:
+            listener (callable): Called with the agent's name, or None to stop notifications.
+        """
+
+        if listener is not None and not callable(listener):
+            raise Exception('listener must be callable.')
+
+        self.inbound_listener = listener
+
+
+    def notify_inbound(self):
+        """
+        Tell the inbound listener, if any, that this agent has work to interpret.
+        """
+
+        if self.inbound_listener is not None:
+            self.inbound_listener(self.name)
 
 
     def sign_on(self,message_template:str = 'Agent <name> has signed on.'):
         """
-        Signs on to the chat API.
+        Signs on to the chat API. The prompt is rendered from the compiled template, and measured part
+        by part, so the parts every agent shares are counted once through the token cache.
         """
 
         # If message_template is not empty...
         if message_template:
-            system_message = self.fill_in_template(message_template, self.replacement_strings)
-            system_message = self.insert_commands(system_message, self.command_strings)
-            self.system_prompt['message'] = system_message
-            self.system_prompt['to'] = self.profile['name']
-            self.system_prompt['from'] = self.SYSTEM_USER
-            self.system_prompt['timestamp'] = datetime.datetime.now().strftime(self.TIME_FORMAT)
-            self.system_prompt['tokens'] = self.chat_api.get_message_size(self.system_prompt['message'])
-            self.inbound_queue[self.SYSTEM_USER] = [self.system_prompt]
+            parts = self.prompt_templates.render(message_template, self.replacement_strings, self.command_strings)
+            system_message = ''.join(parts)
+            self.system_prompt = Message(system_message, self.SYSTEM_USER, self.profile['name'],
+                                         datetime.datetime.now().strftime(self.TIME_FORMAT),
+                                         sum(self.chat_api.get_message_sizes(parts)))
+            self.inbound_queue[self.SYSTEM_USER] = MessageList([self.system_prompt])
+            self.notify_inbound()
         else:
             raise Exception('message_template cannot be empty.')
         
 
-    def send_to_api(self, messages:list) -> str:
+    def send_to_api(self, messages:list, memories:list|None = None, from_name:str|None = None) -> str:
         """
         Send a message to the API and add to history
         
         Args:
             message (list): The conversation to send
+            memories (list|None, optional): The memories recalled for the conversation. Defaults to recalling them here.
+            from_name (str|None, optional): The peer of the conversation, needed by rolling summaries. Defaults to None.
+            
+        Returns:
+            str: The response from the API.
+        """
+        
+        reply = ''
+
+        if memories is None:
+            memories = self.recall_conversations([messages])[0]
+        memories = self.compress_memories(messages, memories)
+
+        if self.summary_mode == self.SUMMARY_MODE_ROLLING and from_name is not None:
+            # Fold only the messages that no longer fit into the running summary
+            self.wait_for_summary(from_name)
+            state, head, middle, tail, middle_token_length = self.plan_rolling_message(from_name, messages, memories)
+            if middle is not None and self.fold_overflow(state, middle, self.summarize(middle, middle_token_length)):
+                api_message = head + [state.summary] + tail
+            else:
+                api_message = head + tail
+        else:
+            head, middle, tail, middle_token_length = self.plan_api_message(messages, memories)
+
+            # Summarize the middle of the conversation if it does not fit
+            if middle is None:
+                api_message = head
+            else:
+                api_message = head + [self.build_summary_message(self.summarize(middle, middle_token_length))] + tail
+            
+        # Send the messages to the API
+        with self.get_request_slot():
+            reply = self.chat_api.send(message=api_message, max_tokens=self.MAX_REPLY_TOKENS)
+
+        return reply
+
+
+    async def asend_to_api(self, messages:list, memories:list|None = None, from_name:str|None = None) -> str:
+        """
+        Send a message to the API without blocking the event loop.
+        
+        Args:
+            message (list): The conversation to send
+            memories (list|None, optional): The memories recalled for the conversation. Defaults to recalling them here.
+            from_name (str|None, optional): The peer of the conversation, needed by rolling summaries. Defaults to None.
             
         Returns:
             str: The response from the API.
         """
         
         reply = ''
-        api_message = []
+
+        # Measure the memories here, so planning makes no blocking token count
+        if memories is None:
+            memories = self.recall_conversations([messages])[0]
+        await self.ameasure_memories(memories)
+        if self.compressors.get(self.SITE_RECALL) is not None:
+            # Local compressors count tokens with blocking calls, so they run off the event loop
+            memories = await asyncio.to_thread(self.compress_memories, messages, memories)
+
+        if self.summary_mode == self.SUMMARY_MODE_ROLLING and from_name is not None:
+            # Fold only the messages that no longer fit into the running summary
+            await self.await_summary(from_name)
+            state, head, middle, tail, middle_token_length = self.plan_rolling_message(from_name, messages, memories)
+            summary = await self.asummarize(middle, middle_token_length) if middle is not None else ''
+            if summary:
+                self.fold_overflow(state, middle, summary, await self.chat_api.aget_message_size(summary))
+                api_message = head + [state.summary] + tail
+            else:
+                api_message = head + tail
+        else:
+            head, middle, tail, middle_token_length = self.plan_api_message(messages, memories)
+
+            # Summarize the middle of the conversation if it does not fit
+            if middle is None:
+                api_message = head
+            else:
+                api_message = head + [self.build_summary_message(await self.asummarize(middle, middle_token_length))] + tail
+            
+        # Send the messages to the API
+        async with self.get_request_slot():
+            reply = await self.chat_api.asend(message=api_message, max_tokens=self.MAX_REPLY_TOKENS)
+
+        return reply
+
+
+    def plan_api_message(self, messages:list, memories:list|None = None) -> tuple:
+        """
+        Validate a conversation, add recalled memories and pack the prompt into the context of the LLM,
+        less the tokens kept for the reply. The opening message and the newest messages come first,
+        then the memories, then older history; only the older history that does not fit is summarized.
+
+        Args:
+            messages (list): The conversation to send.
+            memories (list|None, optional): The memories recalled for the conversation. Defaults to recalling them here.
+
+        Returns:
+            tuple: The messages before the summary, the messages to summarize (None if everything fits),
+                the messages after the summary, and the token budget for the summary.
+        """
+
+        context_size = self.chat_api.get_context_size()
+
+        self.check_messages(messages)
+        
+        # Get the token length of the first message only
+        token_length = messages[0]['tokens']
+        if token_length > context_size:
+            raise Exception('Starting prompt is too long to send to API.')
+        
+        memories = self.prepare_memories(messages, memories)
+
+        # A conversation from the inbound queue already knows its total
+        history_tokens = messages.tokens - token_length if isinstance(messages, MessageList) else None
+
+        return self.prompt_packer.pack(messages[0], messages[1:], memories, context_size - self.MAX_REPLY_TOKENS,
+                                       history_tokens)
+
+
+    def plan_rolling_message(self, from_name:str, messages:list, memories:list|None = None) -> tuple:
+        """
+        Add new messages to the conversation with a peer and pack it into the context of the LLM, less
+        the tokens kept for the reply, by the same priorities as plan_api_message with the running
+        summary as the oldest history. Only the overflow of this turn is summarized, together with the
+        previous summary, so the cost of a turn does not grow with the length of the conversation. The
+        conversation is only changed once the plan fits. The caller waits for any background summary
+        of the conversation first.
+
+        Args:
+            from_name (str): The peer of the conversation.
+            messages (list): The new messages.
+            memories (list|None, optional): The memories recalled for the conversation. Defaults to recalling them here.
+
+        Returns:
+            tuple: The conversation state, the messages before the summary, the messages to fold into the
+                summary (None if everything fits), the messages after the summary, and the token budget
+                for the summary.
+        """
+
         context_size = self.chat_api.get_context_size()
 
+        self.check_messages(messages)
+
+        state = self.conversations.get(from_name)
+        if state is None:
+            state = ConversationState()
+
+        # The first message of a conversation becomes its head
+        head = state.head if state.head is not None else messages[0]
+        new_messages = list(messages) if state.head is not None else list(messages[1:])
+        if head['tokens'] > context_size:
+            raise Exception('Starting prompt is too long to send to API.')
+
+        history = state.get_messages()[1:] + new_messages
+        history_tokens = state.get_summary_tokens() + state.tail_tokens + sum(message['tokens'] for message in new_messages)
+        memories = self.prepare_memories([head] + history, memories)
+        plan = self.prompt_packer.pack(head, history, memories, context_size - self.MAX_REPLY_TOKENS, history_tokens)
+
+        self.conversations[from_name] = state
+        for message in messages:
+            state.append(message)
+
+        return (state,) + plan
+
+
+    def check_messages(self, messages:list):
+        """
+        Check a conversation is a non-empty list of messages with non-empty string values and
+        non-negative token counts. Messages that were validated when they were received are not
+        checked again.
+
+        Args:
+            messages (list): The conversation.
+        """
+
         # If the messages list is not empty...
-        if messages:
+        if not messages:
+            raise Exception('messages cannot be an empty list.')
 
-            # Check for bad things
-            for message in messages:
-                if not isinstance(message, dict):
-                    raise Exception('messages must be a list of dicts.')
-                
-                # Loop through the dictionary keys
-                for key in message.keys():
-
-                    # Skip tokens, and check values are strings and not empty strings
-                    if key != 'tokens':
-                        if not isinstance(message[key], str):
-                            raise Exception('messages must be a list of dicts with string values.')
-                        elif not message[key]:
-                            raise Exception('messages must be a list of dicts with non-empty string values.')
-                        
-                    # If the key is tokens, check to ensure if it is an int and not negative
-                    else:
-                        if not isinstance(message[key], int):
-                            raise Exception('messages must be a list of dicts with int token values.')
-                        elif message[key] < 0:
-                            raise Exception('messages must be a list of dicts with non-negative token values.')
-            
-            # Get the token length of the first message only
-            token_length = messages[0]['tokens']
-            if token_length > context_size:
-                raise Exception('Starting prompt is too long to send to API.')
+        # Check for bad things
+        for message in messages:
+            if isinstance(message, Message):
+                continue
+
+            if not isinstance(message, dict):
+                raise Exception('messages must be a list of dicts.')
             
+            Message.validate(message)
+
+
+    def prepare_memories(self, messages:list, memories:list|None = None) -> list:
+        """
+        Recall memories for a conversation if none were given, drop those already in the conversation
+        and measure the rest.
+
+        Args:
+            messages (list): The conversation.
+            memories (list|None, optional): The memories recalled for the conversation. Defaults to recalling them here.
+
+        Returns:
+            list: The memories, with their token counts.
+        """
+
+        if memories is None:
+            memories = self.recall_conversations([messages])[0]
+
+        # Skip memories of messages already in the conversation, and measure the rest
+        conversation_keys = set(self.get_message_key(message) for message in messages)
+        memories = [memory for memory in memories if self.get_message_key(memory) not in conversation_keys]
+        self.measure_memories(memories)
+
+        return memories
+
+
+    def compress_memories(self, messages:list, memories:list) -> list:
+        """
+        Shrink the recalled memories with the local compressor of the recall call site, when one is
+        set and the memories take more than RECALL_SHARE of the tokens a prompt may take. They are
+        replaced by one message from Memory; otherwise they are left to the prompt packer as they are.
+
+        Args:
+            messages (list): The conversation, whose messages are not compressed again.
+            memories (list): The memories recalled for the conversation.
+
+        Returns:
+            list: The memories to pack.
+        """
+
+        compressor = self.compressors.get(self.SITE_RECALL)
+        if compressor is None or not memories:
+            return memories
+
+        conversation_keys = set(self.get_message_key(message) for message in messages)
+        memories = [memory for memory in memories if self.get_message_key(memory) not in conversation_keys]
+        self.measure_memories(memories)
+
+        token_length = int((self.chat_api.get_context_size() - self.MAX_REPLY_TOKENS) * self.RECALL_SHARE)
+        if sum(memory['tokens'] for memory in memories) <= token_length:
+            return memories
+
+        summary = compressor.compress(memories, token_length)
+        if not summary:
+            return []
+
+        memory = self.build_recall_message(summary)
+
+        return [memory.replace(tokens=self.chat_api.get_message_size(memory['message']))]
+
+
+    def measure_memories(self, memories:list):
+        """
+        Count the tokens of the memories that were not measured yet, in one batch.
+
+        Args:
+            memories (list): The memories, measured in place.
+        """
+
+        unmeasured = [memory for memory in memories if 'tokens' not in memory]
+        memory_sizes = self.chat_api.get_message_sizes([memory['message'] for memory in unmeasured])
+        for memory, tokens in zip(unmeasured, memory_sizes):
+            memory['tokens'] = tokens
+
+
+    async def ameasure_memories(self, memories:list):
+        """
+        Count the tokens of the memories that were not measured yet, without blocking the event loop.
+
+        Args:
+            memories (list): The memories, measured in place.
+        """
+
+        unmeasured = [memory for memory in memories if 'tokens' not in memory]
+        memory_sizes = await self.chat_api.aget_message_sizes([memory['message'] for memory in unmeasured])
+        for memory, tokens in zip(unmeasured, memory_sizes):
+            memory['tokens'] = tokens
+
+
+    def get_fold_messages(self, state:ConversationState, overflow:list) -> list:
+        """
+        Get the messages a fold summarizes: the running summary, then the overflowing messages.
+
+        Args:
+            state (ConversationState): The conversation.
+            overflow (list): The messages that no longer fit.
+
+        Returns:
+            list: The messages to summarize.
+        """
+
+        return ([state.summary] if state.summary is not None else []) + overflow
+
+
+    def fold_overflow(self, state:ConversationState, middle:list, summary:str, tokens:int|None = None) -> bool:
+        """
+        Replace the messages summarized in a turn, the running summary and the oldest tail messages,
+        with their summary. An empty summary, from a failed API call, leaves the conversation as it was.
+
+        Args:
+            state (ConversationState): The conversation.
+            middle (list): The messages summarized, oldest first.
+            summary (str): Their summary.
+            tokens (int|None, optional): The token count of the summary. Defaults to measuring it.
+
+        Returns:
+            bool: Whether the summary was folded in.
+        """
+
+        if not summary:
+            return False
+
+        state.drop_oldest(len(middle) - (1 if middle[0] is state.summary else 0))
+        self.fold_summary(state, summary, tokens)
+
+        return True
+
+
+    def fold_summary(self, state:ConversationState, summary:str, tokens:int|None = None):
+        """
+        Replace the running summary of a conversation. An empty summary, from a failed API call, keeps
+        the previous one.
+
+        Args:
+            state (ConversationState): The conversation.
+            summary (str): The new summary.
+            tokens (int|None, optional): The token count of the summary. Defaults to measuring it.
+        """
+
+        if summary:
+            if tokens is None:
+                tokens = self.chat_api.get_message_size(summary)
+            state.summary = self.build_summary_message(summary, tokens)
+
+
+    def build_summary_message(self, summary:str, tokens:int = 0) -> Message:
+        """
+        Wrap a summary of part of a conversation in a message from Summary.
+
+        Args:
+            summary (str): The summary.
+            tokens (int, optional): The token count of the summary. Defaults to 0, not measured.
+
+        Returns:
+            Message: The message.
+        """
+
+        return Message(summary, self.SUMMARY_USER, self.profile['name'],
+                       datetime.datetime.now().strftime(self.TIME_FORMAT), tokens)
+
+
+    def add_reply_to_conversation(self, reply:str, to:str, tokens:int|None = None):
+        """
+        Keep the agent's reply in the running conversation with a peer, in rolling summary mode.
+
+        Args:
+            reply (str): The reply.
+            to (str): The peer.
+            tokens (int|None, optional): The token count of the reply. Defaults to measuring it.
+        """
+
+        if self.summary_mode != self.SUMMARY_MODE_ROLLING or not reply or to not in self.conversations:
+            return
+
+        if tokens is None:
+            tokens = self.chat_api.get_message_size(reply)
+        message = Message(reply, self.name, to, datetime.datetime.now().strftime(self.TIME_FORMAT), tokens)
+        self.conversations[to].append(message)
+
+        self.schedule_summary(to)
+
+
+    def schedule_summary(self, from_name:str):
+        """
+        Start summarizing the oldest messages of a conversation in the background once it fills more
+        than speculative_summary_threshold of the context, so the turn that would overflow finds the
+        summary ready and only makes one API call.
+
+        Args:
+            from_name (str): The peer of the conversation.
+        """
+
+        state = self.conversations.get(from_name)
+        if self.speculative_summary_threshold is None or state is None or state.pending is not None:
+            return
+
+        budget = self.chat_api.get_context_size() - self.MAX_REPLY_TOKENS - state.head['tokens']
+        token_limit = int(budget * self.speculative_summary_threshold)
+        if state.get_summary_tokens() + state.tail_tokens <= token_limit:
+            return
+
+        if self.summary_pool is None:
+            self.summary_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix='summarizer')
+        state.pending = self.summary_pool.submit(self.summarize_ahead, state, token_limit, int(budget * self.ROLLING_SUMMARY_SHARE))
+
+
+    def summarize_ahead(self, state:ConversationState, token_limit:int, summary_length:int):
+        """
+        Fold the oldest messages of a conversation into its summary until it fits a token limit. Runs on
+        the summary pool, holding a slot of the chat API backend like any other request; the messages
+        only leave the tail once the summary is made.
+
+        Args:
+            state (ConversationState): The conversation.
+            token_limit (int): The tokens the summary and the tail may take.
+            summary_length (int): The token budget for the summary.
+        """
+
+        overflow = state.peek_overflow(token_limit - summary_length)
+        if overflow and summary_length > 0:
+            summary = self.summarize(self.get_fold_messages(state, overflow), summary_length)
+            if summary:
+                state.drop_oldest(len(overflow))
+                self.fold_summary(state, summary)
+
+
+    def close(self):
+        """
+        Wait for the background summaries and stop the summary pool.
+        """
+
+        if self.summary_pool is not None:
+            self.summary_pool.shutdown(wait=True)
+            self.summary_pool = None
+
+
+    def wait_for_summary(self, from_name:str):
+        """
+        Wait for the background summarization of a conversation, if any. A failed summarization leaves
+        the conversation as it was.
+
+        Args:
+            from_name (str): The peer of the conversation.
+        """
+
+        state = self.conversations.get(from_name)
+        if state is not None and state.pending is not None:
+            try:
+                state.pending.result()
+            except Exception:
+                pass
+            state.pending = None
+
+
+    async def await_summary(self, from_name:str):
+        """
+        Wait for the background summarization of a conversation without blocking the event loop.
+
+        Args:
+            from_name (str): The peer of the conversation.
+        """
+
+        state = self.conversations.get(from_name)
+        if state is not None and state.pending is not None:
+            try:
+                await asyncio.wrap_future(state.pending)
+            except Exception:
+                pass
+            state.pending = None
+    
+
+    def recall_conversations(self, conversations:list) -> list:
+        """
+        Recall the memories for several conversations in one batch. A conversation is searched by its
+        last two messages, or its last message when it only has two.
+
+        Args:
+            conversations (list): The conversations.
+
+        Returns:
+            list: The memories recalled for each conversation.
+        """
+
+        queries = []
+        for messages in conversations:
             if len(messages) > 2:
                 # Recall based on the last two messages
-                memories = self.memory.recall(messages[-2:])
+                queries.append(messages[-2:])
             elif len(messages) > 1:
                 # Recall based on the last message
-                memories = self.memory.recall(messages[-1:])
+                queries.append(messages[-1:])
             else:
-                memories = []
+                queries.append([])
 
-            # Insert the memories just after the first message
-            messages = messages[:1] + memories + messages[1:]
-            
-            # Get the token length of all remaining messages
-            if len(messages) > 1:
-                for message in messages[1:]:
-                    token_length += message['tokens']
-            else:
-                token_length = 0
-            
-            # If the token length is greater than the context size, summarize
-            if token_length > context_size:
-                if len(messages) > 2:
-                    # Get token length of first and last, subtract from context size
-                    middle_token_length = self.chat_api.get_context_size() - (messages[0]['tokens'] + messages[-1]['tokens'])
-                    api_message.append(messages[0])
-                    api_message.append(self.summarize(messages[1:-1], middle_token_length))
-                    api_message.append(messages[-1])
-                elif len(messages) > 1:
-                    # Get the length of the first and last two messages, subtract from context size
-                    middle_token_length = self.chat_api.get_context_size() - (messages[0]['tokens'] + messages[-2]['tokens'] + messages[-1]['tokens'])
-                    api_message.append(messages[0])
-                    api_message.append(self.summarize(messages[1:-2], middle_token_length))
-                    api_message += messages[-2:]
-                else:
-                    raise Exception('Starting prompt plus last message is too long to send to API.')
-            else:
-                api_message = messages
-                
-            # Send the messages to the API
-            reply = self.chat_api.send(message=api_message)
+        recalled = iter(self.memory.recall_many([query for query in queries if query]))
 
-            return reply
+        return [next(recalled) if query else [] for query in queries]
+
+
+    def summarize(self, messages:list, token_length:int, site:str = 'conversation') -> str:
+        """
+        Use an API call to summarize a list of messages. Messages summarized before, with the same
+        budget and model, are answered from the summary cache. Call sites set to a local compressor
+        shrink the messages without an API call.
         
-        else:
-            raise Exception('messages cannot be an empty list.')
-    
+        Args:
+            messages (list): The messages to summarize.
+            site (str, optional): The call site, conversation or recall. Defaults to conversation.
+        
+        Returns:
+            str: The summarized messages.
+        """
+
+        api_message = self.build_summary_request(messages, token_length)
+        compressor = self.compressors.get(site)
+        if compressor is not None:
+            return compressor.compress(messages, token_length)
+
+        model = self.chat_api.get_model_id()
+        reply = self.summary_cache.get(model, token_length, api_message)
+
+        if reply is None:
+            with self.get_request_slot():
+                reply = self.chat_api.send(message=api_message, max_tokens=token_length)
+            if reply:
+                self.summary_cache.put(model, token_length, api_message, reply)
 
-    def summarize(self, messages:list, token_length:int) -> str:
+        return reply
+
+
+    async def asummarize(self, messages:list, token_length:int, site:str = 'conversation') -> str:
         """
-        Use an API call to summarize a list of messages.
+        Use an API call to summarize a list of messages without blocking the event loop, answering
+        from the summary cache when possible.
         
         Args:
             messages (list): The messages to summarize.
+            site (str, optional): The call site, conversation or recall. Defaults to conversation.
         
         Returns:
             str: The summarized messages.
         """
 
-        reply = ''
+        api_message = self.build_summary_request(messages, token_length)
+        compressor = self.compressors.get(site)
+        if compressor is not None:
+            # Local compressors count tokens with blocking calls, so they run off the event loop
+            return await asyncio.to_thread(compressor.compress, messages, token_length)
+
+        model = self.chat_api.get_model_id()
+        reply = self.summary_cache.get(model, token_length, api_message)
+
+        if reply is None:
+            async with self.get_request_slot():
+                reply = await self.chat_api.asend(message=api_message, max_tokens=token_length)
+            if reply:
+                self.summary_cache.put(model, token_length, api_message, reply)
+
+        return reply
+
+
+    def get_request_slot(self):
+        """
+        Get what to hold while a request is sent to the chat API.
+
+        Returns:
+            RequestSlots|contextlib.nullcontext: The backend's request slots, or nothing to wait for
+                when the agent has no limit.
+        """
+
+        return self.request_slots if self.request_slots is not None else contextlib.nullcontext()
+
+
+    def create_compressors(self, compression) -> dict:
+        """
+        Create the local compressors of each call site from the compression setting.
+
+        Args:
+            compression (str|dict|object|None): The setting, for every call site or per call site.
+
+        Returns:
+            dict: The compressor of each call site, None where the LLM summarizes.
+        """
+
+        compressors = {}
+
+        for site in [self.SITE_CONVERSATION, self.SITE_RECALL]:
+            choice = compression.get(site) if isinstance(compression, dict) else compression
+            if choice is None or choice == self.COMPRESSION_LLM:
+                compressors[site] = None
+            elif choice == self.COMPRESSION_EXTRACTIVE:
+                compressors[site] = ExtractiveCompressor(self.chat_api.get_message_sizes)
+            elif callable(getattr(choice, 'compress', None)):
+                compressors[site] = choice
+            else:
+                raise Exception('compression must be llm, extractive or a compressor.')
+
+        return compressors
+
+
+    def build_summary_request(self, messages:list, token_length:int) -> str|list|None:
+        """
+        Build the API message asking the LLM to summarize a list of messages.
+
+        Args:
+            messages (list): The messages to summarize.
+            token_length (int): The token budget for the summary.
+
+        Returns:
+            str|list: The API message, in the format the chat API expects.
+        """
+
         api_message = None
 
         if not isinstance(token_length, int):
@@ -207,31 +786,22 @@ class Agent:
             if not isinstance(message['message'], str):
                 raise Exception('message must be a string.')
 
-        if messages:
-
-            # IF the model expects a string, concatenate the messages
-            if self.chat_api.message_type == self.chat_api.MESSAGE_TYPE_STRING:
-                api_message = self.SUMMARY_PROMPT
-                for message in messages:
-                    api_message += message['message'] + '\n\n'
+        if not messages:
+            raise Exception('messages cannot be an empty list.')
 
-            # If the model expects a list, create a list of messages
-            elif self.chat_api.message_type == self.chat_api.MESSAGE_TYPE_LIST:
-                api_message = []
-                summary_prompt = self.RESPONSE_TEMPLATE.copy()
-                summary_prompt['message'] = self.SUMMARY_PROMPT
-                summary_prompt['to'] = self.profile['name']
-                summary_prompt['from'] = self.SYSTEM_USER
-                api_message.append(summary_prompt)
-                for message in messages:
-                    api_message.append(message)
+        # IF the model expects a string, concatenate the messages
+        if self.chat_api.message_type == self.chat_api.MESSAGE_TYPE_STRING:
+            api_message = self.SUMMARY_PROMPT
+            for message in messages:
+                api_message += message['message'] + '\n\n'
 
-            reply = self.chat_api.send(message=api_message, max_tokens=token_length)
+        # If the model expects a list, create a list of messages
+        elif self.chat_api.message_type == self.chat_api.MESSAGE_TYPE_LIST:
+            api_message = [Message(self.SUMMARY_PROMPT, self.SYSTEM_USER, self.profile['name'])]
+            for message in messages:
+                api_message.append(message)
 
-            return reply
-        
-        else:
-            raise Exception('messages cannot be an empty list.')
+        return api_message
     
 
     def fill_in_template(self, script, replacement_tokens:dict) -> str:
@@ -300,11 +870,7 @@ class Agent:
             message (str): The message to add.
         """
 
-        new_message = self.RESPONSE_TEMPLATE.copy()
-        new_message['message'] = message
-        new_message['to'] = to
-        new_message['from'] = self.profile['name']
-        new_message['timestamp'] = datetime.datetime.now().strftime(self.TIME_FORMAT)
+        new_message = Message(message, self.name, to, datetime.datetime.now().strftime(self.TIME_FORMAT))
 
         if to not in self.outbound_queue:
             self.outbound_queue[to] = []
@@ -312,39 +878,49 @@ class Agent:
         self.outbound_queue[to].append(new_message)
 
 
-    def add_to_inbound_queue(self, message:dict, from_name:str, token_length:int):
+    def add_to_inbound_queue(self, message:Message|dict, from_name:str, token_length:int):
         """
-        Adds a message to the message queue.
+        Adds a message to the message queue. The message is stamped if it has no timestamp, measured
+        unless a token length is given, and validated, once. A plain dict is filled in place first.
         
         Args:
-            message (str): The message to add.
+            message (Message|dict): The message to add.
             from_name (str): The name of the sender.
+            token_length (int): The token count of the message, 0 to measure it.
         """
 
         if not isinstance(from_name, str) or not from_name:
             raise Exception('from_name cannot be None.')
         
-        if not isinstance(message, dict):
+        if not isinstance(message, (Message, dict)):
             raise Exception('message must be a dict.')
         
         if not isinstance(token_length, int) or token_length < 0:
             raise Exception('token_length must be a positive int.')
         
-        if from_name not in self.inbound_queue.keys():
-            self.inbound_queue[from_name] = []
-
-        message['timestamp'] = datetime.datetime.now().strftime(self.TIME_FORMAT)
-        if token_length:
-            message['tokens'] = token_length
+        timestamp = message.get('timestamp') or datetime.datetime.now().strftime(self.TIME_FORMAT)
+        if not token_length:
+            token_length = self.chat_api.get_message_size(message['message'])
+
+        # The conversation keeps a running token total
+        if isinstance(message, Message):
+            message = message.replace(timestamp=timestamp, tokens=token_length)
+            Message.validate(message)
         else:
-            message['tokens'] = self.chat_api.get_message_size(message['message'])
+            message['timestamp'] = timestamp
+            message['tokens'] = token_length
+            message = Message.from_dict(message)
+        if from_name not in self.inbound_queue.keys():
+            self.inbound_queue[from_name] = MessageList()
 
         self.inbound_queue[from_name].append(message)
+        self.notify_inbound()
 
     
     def deliver(self) -> list:
         """
-        Return the message queue, clear it, and update history.
+        Return the message queue, clear it, and update history. Empty replies are returned but not
+        remembered.
         
         Returns:
             list: The message queue.
@@ -353,16 +929,13 @@ class Agent:
         response = []
 
         for to_name in self.outbound_queue:
-            for message in self.outbound_queue[to_name]:
-                ogm = self.RESPONSE_TEMPLATE.copy()
-                ogm['message'] = message['message']
-                ogm['to'] = to_name
-                ogm['from'] = self.profile['name']
-                ogm['timestamp'] = message['timestamp']
-                self.memory.remember(ogm) # type: ignore
-                response.append(ogm)
+            response.extend(self.outbound_queue[to_name])
             self.outbound_queue[to_name] = []
 
+        sent = [message for message in response if message['message']]
+        if sent:
+            self.remember_many(sent)
+
         return response
     
 
@@ -371,21 +944,34 @@ class Agent:
         Receive a message and add it to the message queue.
         
         Args:
-            message (str): The message to receive.
+            message (Message|dict): The message to receive.
         """
 
-        if not isinstance(message, dict):
-            raise Exception('message must be a dict.')
-        
-        if 'from' not in message:
-            raise Exception('message must have a from field.')
-        
-        if not message['from'] or message['from'] in ['', None, 0, False]:
-            raise Exception('message must have a from field.')
+        self.receive_many([message])
+
+
+    def receive_many(self, messages:list):
+        """
+        Receive several messages, remembering them in one batch, and add them to the message queue.
+
+        Args:
+            messages (list): The messages to receive.
+        """
+
+        for message in messages:
+            if not isinstance(message, (Message, dict)):
+                raise Exception('message must be a dict.')
             
-        self.remember(message)
+            if 'from' not in message:
+                raise Exception('message must have a from field.')
+            
+            if not message['from'] or message['from'] in ['', None, 0, False]:
+                raise Exception('message must have a from field.')
+            
+        self.remember_many(messages)
 
-        self.add_to_inbound_queue(message, message['from'], message['tokens'])
+        for message in messages:
+            self.add_to_inbound_queue(message, message['from'], message['tokens'])
 
 
     def remember(self, message_obj:dict = {}) -> str:
@@ -396,20 +982,35 @@ class Agent:
             message_obj (dict): The message object.
         """
 
-        if not isinstance(message_obj, dict):
-            raise Exception('message_obj must be a dict.')
-        
-        keys = ['message', 'from', 'to', 'timestamp', 'tokens']
-        for key in keys:
-            if key not in message_obj or message_obj[key] is None:
-                raise Exception('message_obj must have a ' + key + ' field.')
+        return self.remember_many([message_obj])[0]
+
+
+    def remember_many(self, message_objs:list) -> list:
+        """
+        Remember several messages in one batch.
+
+        Args:
+            message_objs (list): The message objects.
+
+        Returns:
+            list: The URI of each memory.
+        """
+
+        new_memories = []
+
+        for message_obj in message_objs:
+            if not isinstance(message_obj, (Message, dict)):
+                raise Exception('message_obj must be a dict.')
+            
+            keys = ['message', 'from', 'to', 'timestamp', 'tokens']
+            for key in keys:
+                if key not in message_obj or message_obj[key] is None:
+                    raise Exception('message_obj must have a ' + key + ' field.')
 
-        new_memory = message_obj.copy()
-        if new_memory['tokens']:
-            del new_memory['tokens']
-        memory_uri = self.memory.remember(new_memory)
+            # Token counts depend on the model, so they are not remembered
+            new_memories.append({key: value for key, value in message_obj.items() if key != 'tokens'})
 
-        return memory_uri
+        return self.memory.remember_many(new_memories)
 
 
     def recall(self, messages:list) -> dict:
@@ -424,55 +1025,155 @@ class Agent:
         """
 
         response = {}
+        recalled_messages = self.search_memory(messages)
 
-        if not isinstance(messages, list):
-            raise Exception('messages must be a list.')
+        if recalled_messages:
+            token_sizes = self.chat_api.get_message_sizes([message['message'] for message in recalled_messages])
+            search_results, token_count = self.select_recalled(recalled_messages, token_sizes)
+
+            if search_results:
+                response = self.build_recall_message(self.summarize(search_results, token_count, self.SITE_RECALL))
+                response = response.replace(tokens=self.chat_api.get_message_size(response['message']))
+
+        return response
 
-        if messages:
-            response = self.RESPONSE_TEMPLATE.copy()
-            search_terms = messages
-            recalled_messages = []
-            token_count = 0
-            search_results = []
-            max_tokens = self.chat_api.get_context_size()
-            for term in search_terms:
-                if term['tokens']:
-                    del term['tokens']
-            recalled_messages = self.memory.recall(search_terms)
-
-            for message in recalled_messages:
-                message['tokens'] = self.chat_api.get_message_size(message['message'])
-                if token_count + message['tokens'] < max_tokens - (max_tokens * 0.05):
-                    token_count += message['tokens']
-                    search_results.append(message)
+
+    async def arecall(self, messages:list) -> dict:
+        """
+        Search memory for related messages without blocking the event loop.
+        
+        Args:
+            messages (list): The messages to search based on.
+            
+        Returns:
+            str: The response.
+        """
+
+        response = {}
+        recalled_messages = self.search_memory(messages)
+
+        if recalled_messages:
+            token_sizes = await self.chat_api.aget_message_sizes([message['message'] for message in recalled_messages])
+            search_results, token_count = self.select_recalled(recalled_messages, token_sizes)
 
             if search_results:
-                response['message'] = self.summarize(search_results, token_count)
-                response['message'] += 'These are messages which might provide important context.\n\n'
-                response['from'] = 'Memory'
-                response['to'] = self.profile['name']
-                response['timestamp'] = datetime.datetime.now().strftime(self.TIME_FORMAT)
-                response['tokens'] = self.chat_api.get_message_size(response['message'])
+                response = self.build_recall_message(await self.asummarize(search_results, token_count, self.SITE_RECALL))
+                response = response.replace(tokens=await self.chat_api.aget_message_size(response['message']))
 
         return response
 
 
+    def search_memory(self, messages:list) -> list:
+        """
+        Search memory for messages related to the given messages.
+
+        Args:
+            messages (list): The messages to search based on.
+
+        Returns:
+            list: The recalled messages.
+        """
+
+        if not isinstance(messages, list):
+            raise Exception('messages must be a list.')
+
+        if not messages:
+            return []
+
+        return self.memory.recall(messages)
+
+
+    def get_message_key(self, message:dict) -> tuple:
+        """
+        Identify a message by its sender, recipient, timestamp and text.
+
+        Args:
+            message (dict): The message.
+
+        Returns:
+            tuple: The key.
+        """
+
+        return (message.get('from'), message.get('to'), message.get('timestamp'), message.get('message'))
+
+
+    def select_recalled(self, recalled_messages:list, token_sizes:list) -> tuple:
+        """
+        Keep the recalled messages that fit within the context of the LLM.
+
+        Args:
+            recalled_messages (list): The recalled messages.
+            token_sizes (list): The token count of each recalled message.
+
+        Returns:
+            tuple: The selected messages and their total token count.
+        """
+
+        token_count = 0
+        search_results = []
+        max_tokens = self.chat_api.get_context_size()
+
+        for message, tokens in zip(recalled_messages, token_sizes):
+            message['tokens'] = tokens
+            if token_count + message['tokens'] < max_tokens - (max_tokens * 0.05):
+                token_count += message['tokens']
+                search_results.append(message)
+
+        return search_results, token_count
+
+
+    def build_recall_message(self, summary:str) -> dict:
+        """
+        Wrap a summary of recalled messages in a message from Memory.
+
+        Args:
+            summary (str): The summary of the recalled messages.
+
+        Returns:
+            Message: The message, without its token count.
+        """
+
+        return Message(summary + 'These are messages which might provide important context.\n\n', 'Memory',
+                       self.profile['name'], datetime.datetime.now().strftime(self.TIME_FORMAT))
+
+
     def interpret(self):
         """
         Interpret the message queue and add responses to the outbound queue.
         """
 
         if self.inbound_queue:
-            for from_name in self.inbound_queue:
+            recalled = self.recall_conversations(list(self.inbound_queue.values()))
+            for from_name, memories in zip(list(self.inbound_queue), recalled):
                 print(f'...Interpreting {Fore.GREEN}{from_name}{Fore.RESET}\'s conversation...')
-                ogm = []
-                for message in self.inbound_queue[from_name]:
-                    ogm.append(message)
-                reply = self.send_to_api(ogm)
+                ogm = self.inbound_queue[from_name].copy()
+                reply = self.send_to_api(ogm, memories, from_name)
                 self.add_to_outbound_queue(reply, from_name)
-            terms = self.inbound_queue.keys()
+                self.add_reply_to_conversation(reply, from_name)
+            terms = list(self.inbound_queue.keys())
             for term in terms:
                 del self.inbound_queue[term]
 
-        
-        
\ No newline at end of file
+
+    async def ainterpret(self):
+        """
+        Interpret the message queue on the event loop. Conversations are sent to the API concurrently,
+        and their replies are added to the outbound queue in the same order as interpret() would.
+        """
+
+        if self.inbound_queue:
+            conversations = list(self.inbound_queue.items())
+            for from_name, _ in conversations:
+                print(f'...Interpreting {Fore.GREEN}{from_name}{Fore.RESET}\'s conversation...')
+            recalled = self.recall_conversations([conversation for _, conversation in conversations])
+            replies = await asyncio.gather(*[self.asend_to_api(conversation.copy(), memories, from_name)
+                                             for (from_name, conversation), memories in zip(conversations, recalled)])
+            reply_sizes = [None] * len(replies)
+            if self.summary_mode == self.SUMMARY_MODE_ROLLING:
+                reply_sizes = await self.chat_api.aget_message_sizes(list(replies))
+            for (from_name, _), reply, tokens in zip(conversations, replies, reply_sizes):
+                self.add_to_outbound_queue(reply, from_name)
+                self.add_reply_to_conversation(reply, from_name, tokens)
+            for from_name, _ in conversations:
+                del self.inbound_queue[from_name]
+
@@ -0,0 +1,233 @@
+import sys
+from collections.abc import Mapping
+
+class Message(Mapping):
+    """
+    A message between agents. Slotted and immutable, with the agent names interned, so one message can
+    be shared by reference through the outbound queue, the swarm's routing, inbound queues and memory
+    instead of being copied at every hop. It reads and compares like the dict it replaces, with the keys
+    message, from, to, timestamp and tokens.
+    """
+
+    __slots__ = ('message', 'sender', 'recipient', 'timestamp', 'tokens')
+
+    # Message key -> slot, which is also the constructor argument
+    FIELDS = {'message': 'message', 'from': 'sender', 'to': 'recipient', 'timestamp': 'timestamp', 'tokens': 'tokens'}
+    TOKENS_KEY = 'tokens'
+
+    def __init__(self, message:str, sender:str, recipient:str|None = None, timestamp:str|None = None, tokens:int = 0):
+        """
+        Constructor for Message
+
+        Args:
+            message (str): The text, empty when an agent has nothing to say.
+            sender (str): The name of the sender.
+            recipient (str, optional): The name of the recipient. Defaults to None.
+            timestamp (str, optional): When the message was sent. Defaults to None.
+            tokens (int, optional): The token count of the text, 0 until it is measured. Defaults to 0.
+        """
+
+        if not isinstance(message, str):
+            raise Exception('messages must be a list of dicts with string values.')
+
+        if not isinstance(sender, str) or not sender:
+            raise Exception('message must have a from field.')
+
+        for value in (recipient, timestamp):
+            if value is not None and (not isinstance(value, str) or not value):
+                raise Exception('messages must be a list of dicts with non-empty string values.')
+
+        if not isinstance(tokens, int) or tokens < 0:
+            raise Exception('messages must be a list of dicts with non-negative int token values.')
+
+        object.__setattr__(self, 'message', message)
+        object.__setattr__(self, 'sender', sys.intern(sender))
+        object.__setattr__(self, 'recipient', sys.intern(recipient) if recipient is not None else None)
+        object.__setattr__(self, 'timestamp', timestamp)
+        object.__setattr__(self, 'tokens', tokens)
+
+
+    @classmethod
+    def from_dict(cls, message:dict):
+        """
+        Build a message from a dict, checking its values, unless it already is one.
+
+        Args:
+            message (dict): The message.
+
+        Returns:
+            Message: The message.
+        """
+
+        if isinstance(message, cls):
+            return message
+
+        if not isinstance(message, dict):
+            raise Exception('message must be a dict.')
+
+        for key in message:
+            if key not in cls.FIELDS:
+                raise Exception('message has an unknown field: ' + str(key) + '.')
+
+        cls.validate(message)
+
+        return cls(**{slot: message[key] for key, slot in cls.FIELDS.items() if key in message})
+
+
+    @classmethod
+    def validate(cls, message:Mapping):
+        """
+        Check every value of a message is a non-empty string, except the token count, a non-negative int.
+
+        Args:
+            message (Mapping): The message.
+        """
+
+        for key, value in message.items():
+
+            # Check values are strings and not empty strings
+            if key != cls.TOKENS_KEY:
+                if not isinstance(value, str):
+                    raise Exception('messages must be a list of dicts with string values.')
+                elif not value:
+                    raise Exception('messages must be a list of dicts with non-empty string values.')
+
+            # Check the token count is an int and not negative
+            else:
+                if not isinstance(value, int):
+                    raise Exception('messages must be a list of dicts with int token values.')
+                elif value < 0:
+                    raise Exception('messages must be a list of dicts with non-negative token values.')
+
+
+    def replace(self, **changes):
+        """
+        Get the message with some fields changed. The message itself is returned when nothing changes.
+
+        Args:
+            **changes: New values, by constructor argument.
+
+        Returns:
+            Message: The message.
+        """
+
+        if all(getattr(self, slot) == value for slot, value in changes.items()):
+            return self
+
+        fields = {slot: getattr(self, slot) for slot in self.__slots__}
+        fields.update(changes)
+
+        return Message(**fields)
+
+
+    def to_dict(self) -> dict:
+        """
+        Rebuild the message as a dict.
+
+        Returns:
+            dict: The message.
+        """
+
+        return {key: getattr(self, slot) for key, slot in self.FIELDS.items()}
+
+
+    def __getitem__(self, key:str):
+
+        slot = self.FIELDS.get(key)
+        if slot is None:
+            raise KeyError(key)
+
+        return getattr(self, slot)
+
+
+    def __iter__(self):
+
+        return iter(self.FIELDS)
+
+
+    def __len__(self) -> int:
+
+        return len(self.FIELDS)
+
+
+    def __setattr__(self, name:str, value):
+
+        raise AttributeError('Message is immutable.')
+
+
+    def __delattr__(self, name:str):
+
+        raise AttributeError('Message is immutable.')
+
+
+    def __reduce__(self):
+
+        return (Message, tuple(getattr(self, slot) for slot in self.__slots__))
+
+
+    def __repr__(self) -> str:
+
+        return 'Message(' + repr(self.to_dict()) + ')'
+
+
+class Envelope:
+    """
+    A message on its way to one recipient. The swarm routes envelopes, so a message sent to several
+    agents is shared by all of them rather than copied for each.
+    """
+
+    __slots__ = ('message', 'to')
+
+    def __init__(self, message:Message, to:str):
+        """
+        Constructor for Envelope
+
+        Args:
+            message (Message): The message.
+            to (str): The name of the recipient.
+        """
+
+        self.message = message
+        self.to = to
+
+
+class MessageList(list):
+    """
+    The messages of a conversation, keeping the total of their token counts as messages are added so
+    nothing has to add up the whole conversation again before it is sent.
+    """
+
+    def __init__(self, messages:list = (), tokens:int|None = None):
+        """
+        Constructor for MessageList
+
+        Args:
+            messages (list, optional): The messages, already validated. Defaults to none.
+            tokens (int, optional): Their total token count, when it is already known. Defaults to adding it up.
+        """
+
+        super().__init__(messages)
+        self.tokens = tokens if tokens is not None else sum(message[Message.TOKENS_KEY] for message in self)
+
+
+    def append(self, message:Message):
+        """
+        Add a message and its token count.
+
+        Args:
+            message (Message): The message.
+        """
+
+        super().append(message)
+        self.tokens += message[Message.TOKENS_KEY]
+
+
+    def copy(self):
+        """
+        Copy the conversation and its total, without adding it up again.
+
+        Returns:
+            MessageList: The copy.
+        """
+
+        return MessageList(self, self.tokens)
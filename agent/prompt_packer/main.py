@@ -0,0 +1,93 @@
+class PromptPacker:
+    """
+    Fills the context of the LLM as a budget, by priority: the opening message, the newest messages,
+    the recalled memories, then older history from newest to oldest. Whatever older history does not
+    fit is left to be summarized into the space that remains.
+    """
+
+    def __init__(self, newest_count:int = 2, summary_share:float = 0.25):
+        """
+        Constructor for PromptPacker
+
+        Args:
+            newest_count (int, optional): The newest messages packed ahead of the memories. Defaults to 2.
+            summary_share (float, optional): The least share of the budget left after the opening and
+                newest messages that is kept for a summary of the history that does not fit. Defaults to 0.25.
+        """
+
+        if not isinstance(newest_count, int) or newest_count < 1:
+            raise Exception('newest_count must be a positive int.')
+
+        if not 0 <= summary_share < 1:
+            raise Exception('summary_share must be between 0 and 1.')
+
+        self.newest_count = newest_count
+        self.summary_share = summary_share
+
+
+    def pack(self, head:dict, history:list, memories:list, budget:int, history_tokens:int|None = None) -> tuple:
+        """
+        Choose the messages that fit a token budget. Every message needs its token count.
+
+        Args:
+            head (dict): The opening message, e.g. the system prompt. Always packed.
+            history (list): The rest of the conversation, oldest first. The last message is always packed.
+            memories (list): The recalled memories, best first.
+            budget (int): The tokens the prompt may take.
+            history_tokens (int, optional): The total token count of the history, when it is kept as
+                messages arrive. Lets a prompt that fits be packed without walking the history.
+                Defaults to None.
+
+        Returns:
+            tuple: The messages before the summary, the messages to summarize (None if everything fits),
+                the messages after the summary, and the token budget for the summary.
+        """
+
+        remaining = budget - head['tokens']
+        if remaining < 0:
+            raise Exception('Starting prompt is too long to send to API.')
+
+        if history_tokens is not None and history_tokens + sum(memory['tokens'] for memory in memories) <= remaining:
+            return [head] + memories + history, None, [], 0
+
+        # The newest messages, the last one whatever it costs
+        newest_start = len(history)
+        while newest_start > max(len(history) - self.newest_count, 0):
+            tokens = history[newest_start - 1]['tokens']
+            if tokens > remaining and newest_start < len(history):
+                break
+            remaining -= tokens
+            newest_start -= 1
+        if remaining < 0:
+            raise Exception('Starting prompt plus last message is too long to send to API.')
+        newest = history[newest_start:]
+        older = history[:newest_start]
+        summary_reserve = int(remaining * self.summary_share)
+
+        # Memories best first, skipping those that do not fit
+        packed_memories = []
+        for memory in memories:
+            if memory['tokens'] <= remaining:
+                packed_memories.append(memory)
+                remaining -= memory['tokens']
+
+        # Older history from the newest back, stopping at the first message that does not fit
+        older_start = len(older)
+        while older_start > 0 and older[older_start - 1]['tokens'] <= remaining:
+            remaining -= older[older_start - 1]['tokens']
+            older_start -= 1
+
+        if older_start == 0:
+            return [head] + packed_memories + older + newest, None, [], 0
+
+        # Make room for the summary, giving up older history first, then the weakest memories
+        while remaining < summary_reserve and older_start < len(older):
+            remaining += older[older_start]['tokens']
+            older_start += 1
+        while remaining < summary_reserve and packed_memories:
+            remaining += packed_memories.pop()['tokens']
+
+        if remaining < 1:
+            return [head] + packed_memories + older[older_start:] + newest, None, [], 0
+
+        return [head] + packed_memories, older[:older_start], older[older_start:] + newest, remaining
@@ -0,0 +1,169 @@
+import re
+import threading
+
+class PromptTemplate:
+    """
+    A prompt template parsed once into segments: literal text, <field> tokens and <commands:tags>
+    blocks. Rendering walks the segments instead of scanning the text again for every token.
+    """
+
+    KIND_TEXT = 'text'
+    KIND_FIELD = 'field'
+    KIND_COMMANDS = 'commands'
+    TOKEN_REGEX = re.compile(r"<commands(?::([\w,]+))?>|<(\w+)>")
+
+    def __init__(self, template:str):
+        """
+        Constructor for PromptTemplate
+
+        Args:
+            template (str): The template.
+        """
+
+        if not isinstance(template, str):
+            raise Exception('template must be a string.')
+
+        self.segments = []
+        position = 0
+        for match in self.TOKEN_REGEX.finditer(template):
+            if match.start() > position:
+                self.segments.append((self.KIND_TEXT, template[position:match.start()]))
+            if match.group(2) is not None:
+                self.segments.append((self.KIND_FIELD, match.group(2)))
+            else:
+                tags = tuple(match.group(1).split(',')) if match.group(1) else None
+                self.segments.append((self.KIND_COMMANDS, tags))
+            position = match.end()
+        if position < len(template):
+            self.segments.append((self.KIND_TEXT, template[position:]))
+
+
+class PromptTemplates:
+    """
+    Compiles prompt templates and renders agents' prompts from them. Templates, and the field values
+    that are templates themselves, are compiled once, and the block of command strings is built once per
+    tag set, so signing on many agents costs one pass over the segments each.
+    """
+
+    shared_templates = None
+    shared_lock = threading.Lock()
+
+    def __init__(self):
+
+        self.templates = {}
+        self.command_blocks = {}
+        self.lock = threading.Lock()
+
+
+    @classmethod
+    def shared(cls):
+        """
+        Get the templates shared by every agent.
+
+        Returns:
+            PromptTemplates: The shared templates.
+        """
+
+        with cls.shared_lock:
+            if cls.shared_templates is None:
+                cls.shared_templates = cls()
+
+            return cls.shared_templates
+
+
+    def get(self, template:str) -> PromptTemplate:
+        """
+        Get a template, compiling it the first time.
+
+        Args:
+            template (str): The template.
+
+        Returns:
+            PromptTemplate: The compiled template.
+        """
+
+        compiled = self.templates.get(template)
+        if compiled is None:
+            compiled = PromptTemplate(template)
+            with self.lock:
+                self.templates[template] = compiled
+
+        return compiled
+
+
+    def render(self, template:str, values:dict, commands:dict) -> list:
+        """
+        Render a template into its parts; joined, they are the prompt. Fields are filled in the order of
+        values, and a value is itself filled with the fields that come after it, so a guidance can use
+        <name> or <commands:tags>. Unknown fields are left as they are. Every <commands> block gets the
+        commands of the tags named by the first one, or of every tag if it names none.
+
+        Args:
+            template (str): The template.
+            values (dict): The field values, by field name.
+            commands (dict): The command strings, by tag.
+
+        Returns:
+            list: The non-empty parts of the prompt.
+        """
+
+        parts = []
+        command_blocks = []
+        self.expand(template, [(field, str(value)) for field, value in values.items()], parts, command_blocks)
+
+        if command_blocks:
+            block = self.get_command_block(commands, command_blocks[0][1])
+            for position, _ in command_blocks:
+                parts[position] = block
+
+        return [part for part in parts if part]
+
+
+    def expand(self, template:str, fields:list, parts:list, command_blocks:list):
+        """
+        Add the parts of a template to a prompt.
+
+        Args:
+            template (str): The template.
+            fields (list): The (field, value) pairs that can still be filled, in order.
+            parts (list): The parts of the prompt so far.
+            command_blocks (list): The (position in parts, tags) of each command block so far.
+        """
+
+        for kind, value in self.get(template).segments:
+            if kind == PromptTemplate.KIND_TEXT:
+                parts.append(value)
+            elif kind == PromptTemplate.KIND_COMMANDS:
+                command_blocks.append((len(parts), value))
+                parts.append('')
+            else:
+                index = next((index for index, (field, _) in enumerate(fields) if field == value), None)
+                if index is None:
+                    parts.append('<' + value + '>')
+                else:
+                    self.expand(fields[index][1], fields[index + 1:], parts, command_blocks)
+
+
+    def get_command_block(self, commands:dict, tags:tuple|None) -> str:
+        """
+        Get the command strings of some tags, each once, built the first time for a tag set. The block
+        is rebuilt when a different commands dict is given.
+
+        Args:
+            commands (dict): The command strings, by tag.
+            tags (tuple|None): The tags, None for every tag.
+
+        Returns:
+            str: The command strings, separated by blank lines.
+        """
+
+        cached = self.command_blocks.get(tags)
+        if cached is not None and cached[0] is commands:
+            return cached[1]
+
+        selected = tags if tags is not None else commands.keys()
+        block = '\n\n'.join(dict.fromkeys(command for tag in selected if tag in commands for command in commands[tag]))
+        with self.lock:
+            self.command_blocks[tags] = (commands, block)
+
+        return block
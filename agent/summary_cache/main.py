@@ -0,0 +1,214 @@
+import hashlib
+import json
+import sqlite3
+import threading
+from collections import OrderedDict
+from collections.abc import Mapping
+
+class SummaryCache:
+    """
+    Bounded LRU cache of summaries, keyed by the model, the token budget and a hash of the summary
+    request. Optionally backed by an SQLite file, so summaries survive restarts.
+    """
+
+    shared_cache = None
+    shared_lock = threading.Lock()
+
+    def __init__(self, max_entries:int = 1000, path:str|None = None, max_disk_entries:int = 100000):
+        """
+        Constructor for SummaryCache
+
+        Args:
+            max_entries (int, optional): The summaries kept in memory before the least recently used
+                are dropped. Defaults to 1000.
+            path (str|None, optional): The database file of the on-disk tier. Defaults to memory only.
+            max_disk_entries (int, optional): The summaries kept on disk before the oldest are
+                dropped. Defaults to 100000.
+        """
+
+        if not isinstance(max_entries, int) or max_entries < 1:
+            raise Exception('max_entries must be a positive int.')
+
+        if not isinstance(max_disk_entries, int) or max_disk_entries < 1:
+            raise Exception('max_disk_entries must be a positive int.')
+
+        self.max_entries = max_entries
+        self.max_disk_entries = max_disk_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+        self.connection = None
+        if path:
+            self.connection = sqlite3.connect(path, timeout=30, check_same_thread=False)
+            self.connection.execute('PRAGMA journal_mode=WAL')
+            self.connection.execute('''
+                CREATE TABLE IF NOT EXISTS summaries (
+                    key BLOB PRIMARY KEY,
+                    summary TEXT NOT NULL
+                )''')
+            self.connection.commit()
+
+
+    @classmethod
+    def shared(cls):
+        """
+        Get the cache shared by every agent that was not given its own.
+
+        Returns:
+            SummaryCache: The shared cache.
+        """
+
+        with cls.shared_lock:
+            if cls.shared_cache is None:
+                cls.shared_cache = cls()
+
+            return cls.shared_cache
+
+
+    @classmethod
+    def from_config(cls, config:dict|None):
+        """
+        Create a cache from the summary_cache section of the configuration.
+
+        Args:
+            config (dict|None): The summary_cache section.
+
+        Returns:
+            SummaryCache: The cache.
+        """
+
+        settings = {}
+        if isinstance(config, dict):
+            for key in ['max_entries', 'path', 'max_disk_entries']:
+                if config.get(key) is not None:
+                    settings[key] = config[key]
+
+        return cls(**settings)
+
+
+    def make_key(self, model:str, token_length:int, request) -> bytes:
+        """
+        Build the cache key for a summary request. The request holds the messages being summarized,
+        so the same span of messages always gives the same key.
+
+        Args:
+            model (str): The model that summarizes.
+            token_length (int): The token budget of the summary.
+            request (str|list): The summary request sent to the chat API.
+
+        Returns:
+            bytes: The key.
+        """
+
+        content = json.dumps([model, token_length, request], sort_keys=True, default=self.encode_value)
+
+        return hashlib.blake2b(content.encode('utf-8'), digest_size=16).digest()
+
+
+    def encode_value(self, value):
+        """
+        Make a value of a summary request JSON serializable. Messages are encoded like the dicts they
+        replace, so both give the same key.
+
+        Args:
+            value: The value.
+
+        Returns:
+            dict|str: The serializable value.
+        """
+
+        if isinstance(value, Mapping):
+            return dict(value)
+
+        return str(value)
+
+
+    def get(self, model:str, token_length:int, request) -> str|None:
+        """
+        Look up a summary.
+
+        Args:
+            model (str): The model that summarizes.
+            token_length (int): The token budget of the summary.
+            request (str|list): The summary request.
+
+        Returns:
+            str|None: The summary, or None when it is not cached.
+        """
+
+        key = self.make_key(model, token_length, request)
+
+        with self.lock:
+            summary = self.entries.get(key)
+            if summary is not None:
+                self.entries.move_to_end(key)
+                return summary
+
+            if self.connection is not None:
+                row = self.connection.execute('SELECT summary FROM summaries WHERE key = ?', (key,)).fetchone()
+                if row is not None:
+                    summary = row[0]
+                    self.remember_entry(key, summary)
+
+        return summary
+
+
+    def put(self, model:str, token_length:int, request, summary:str):
+        """
+        Store a summary.
+
+        Args:
+            model (str): The model that summarized.
+            token_length (int): The token budget of the summary.
+            request (str|list): The summary request.
+            summary (str): The summary.
+        """
+
+        key = self.make_key(model, token_length, request)
+
+        with self.lock:
+            self.remember_entry(key, summary)
+
+            if self.connection is not None:
+                self.connection.execute('INSERT OR REPLACE INTO summaries VALUES (?, ?)', (key, summary))
+                self.connection.execute('DELETE FROM summaries WHERE rowid <= (SELECT MAX(rowid) FROM summaries) - ?',
+                                        (self.max_disk_entries,))
+                self.connection.commit()
+
+
+    def remember_entry(self, key:bytes, summary:str):
+        """
+        Keep a summary in memory, dropping the least recently used past max_entries. Call with the lock held.
+
+        Args:
+            key (bytes): The key.
+            summary (str): The summary.
+        """
+
+        self.entries[key] = summary
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+
+    def clear(self):
+        """
+        Drop every cached summary, on disk as well.
+        """
+
+        with self.lock:
+            self.entries.clear()
+            if self.connection is not None:
+                self.connection.execute('DELETE FROM summaries')
+                self.connection.commit()
+
+
+    def close(self):
+        """
+        Release the on-disk tier.
+        """
+
+        with self.lock:
+            if self.connection is not None:
+                self.connection.close()
+                self.connection = None
@@ -0,0 +1,38 @@
+import functools
+import tiktoken
+
+@functools.lru_cache(maxsize=None)
+def get_encoder(model:str) -> tiktoken.Encoding:
+    """
+    Get the tiktoken encoder for a model. Encoders are built once per model and reused.
+
+    Args:
+        model (str): The OpenAI model name.
+
+    Returns:
+        tiktoken.Encoding: The encoder.
+    """
+
+    return tiktoken.encoding_for_model(model)
+
+
+def count_tokens(model:str, messages:list) -> list:
+    """
+    Count the tokens of several messages with one batched encode.
+
+    Args:
+        model (str): The OpenAI model name.
+        messages (list): The messages to count.
+
+    Returns:
+        list: The token count of each message.
+    """
+
+    if not messages:
+        return []
+
+    encoder = get_encoder(model)
+    if len(messages) == 1:
+        return [len(encoder.encode(messages[0]))]
+
+    return [len(tokens) for tokens in encoder.encode_batch(messages)]
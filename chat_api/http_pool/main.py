@@ -0,0 +1,150 @@
+import asyncio
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+
+class HttpPool:
+    """Keep-alive HTTP sessions shared by every chat driver that talks to the same host."""
+
+    def __init__(self, pool_size:int = 10, connect_timeout:float = 5, read_timeout:float = 120, keep_alive:float = 30):
+        """
+        Constructor for HttpPool
+
+        Args:
+            pool_size (int, optional): Connections kept open per host. Defaults to 10.
+            connect_timeout (float, optional): Seconds to wait for a connection. Defaults to 5.
+            read_timeout (float, optional): Seconds to wait for a response. Defaults to 120.
+            keep_alive (float, optional): Seconds an idle async connection stays open. Defaults to 30.
+        """
+
+        if not isinstance(pool_size, int) or pool_size < 1:
+            raise Exception('pool_size must be a positive int.')
+
+        # Settings
+        self.pool_size = pool_size
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.keep_alive = keep_alive
+
+        # Sessions by base URL, and by event loop and base URL for the async ones
+        self.sessions = {}
+        self.async_sessions = {}
+        self.lock = threading.Lock()
+
+
+    @classmethod
+    def from_config(cls, config:dict|None):
+        """
+        Create a pool from the http_pool section of the configuration.
+
+        Args:
+            config (dict|None): The http_pool section. Missing keys use the defaults.
+
+        Returns:
+            HttpPool: The pool.
+        """
+
+        settings = {}
+        if isinstance(config, dict):
+            for key in ['pool_size', 'connect_timeout', 'read_timeout', 'keep_alive']:
+                if config.get(key) is not None:
+                    settings[key] = config[key]
+
+        return cls(**settings)
+
+
+    def get_session(self, base_url:str) -> requests.Session:
+        """
+        Get the keep-alive session for a host, creating it on first use.
+
+        Args:
+            base_url (str): The scheme, host and port, e.g. http://127.0.0.1:5000
+
+        Returns:
+            requests.Session: The session.
+        """
+
+        with self.lock:
+            if base_url not in self.sessions:
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, pool_block=True)
+                session = requests.Session()
+                session.mount(base_url, adapter)
+                self.sessions[base_url] = session
+
+            return self.sessions[base_url]
+
+
+    def get_async_session(self, base_url:str) -> 'aiohttp.ClientSession':
+        """
+        Get the keep-alive session for a host on the running event loop, creating it on first use.
+        aiohttp is only imported once a session is needed, in async mode.
+
+        Args:
+            base_url (str): The scheme, host and port, e.g. http://127.0.0.1:5000
+
+        Returns:
+            aiohttp.ClientSession: The session.
+        """
+
+        key = (id(asyncio.get_running_loop()), base_url)
+        session = self.async_sessions.get(key)
+        if session is None or session.closed:
+            import aiohttp
+            connector = aiohttp.TCPConnector(limit_per_host=self.pool_size, keepalive_timeout=self.keep_alive)
+            session = aiohttp.ClientSession(connector=connector)
+            self.async_sessions[key] = session
+
+        return session
+
+
+    def get_timeout(self, read_timeout:float|None = None) -> tuple:
+        """
+        Get the (connect, read) timeout pair for requests.
+
+        Args:
+            read_timeout (float|None, optional): Overrides the pool's read timeout.
+
+        Returns:
+            tuple: The connect and read timeouts.
+        """
+
+        return (self.connect_timeout, self.read_timeout if read_timeout is None else read_timeout)
+
+
+    def get_async_timeout(self, read_timeout:float|None = None) -> 'aiohttp.ClientTimeout':
+        """
+        Get the timeout for aiohttp requests, with connect and read kept separate.
+
+        Args:
+            read_timeout (float|None, optional): Overrides the pool's read timeout.
+
+        Returns:
+            aiohttp.ClientTimeout: The timeout.
+        """
+
+        import aiohttp
+        connect, read = self.get_timeout(read_timeout)
+        return aiohttp.ClientTimeout(total=None, sock_connect=connect, sock_read=read)
+
+
+    def close(self):
+        """
+        Close every session and the connections they keep open.
+        """
+
+        with self.lock:
+            for session in self.sessions.values():
+                session.close()
+            self.sessions = {}
+
+
+    async def aclose(self):
+        """
+        Close the async sessions that belong to the running event loop.
+        """
+
+        loop_id = id(asyncio.get_running_loop())
+        for key in [key for key in self.async_sessions if key[0] == loop_id]:
+            session = self.async_sessions.pop(key)
+            if not session.closed:
+                await session.close()
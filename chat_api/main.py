@@ -1,6 +1,8 @@
+from chat_api.token_cache.main import TokenCache
+
 class ChatApi:
 
-    def __init__(self, host:str, port:int, user_string:str = '', agent_string:str = ''):
+    def __init__(self, host:str, port:int, user_string:str = '', agent_string:str = '', token_cache:TokenCache|None = None):
 
         # Constants
         self.MESSAGE_TYPE_STRING = 'str'
@@ -14,6 +16,7 @@ class ChatApi:
         self.port = port
         self.message_type = self.MESSAGE_TYPE_STRING
         self.message_template = ''
+        self.token_cache = token_cache if token_cache is not None else TokenCache.shared()
 
 
     def send(self, message, max_tokens:int = 200, timeout:int = 120, temp=0.01) -> str:
@@ -21,6 +24,14 @@ class ChatApi:
         return ''
     
 
+    async def asend(self, message, max_tokens:int = 200, timeout:int = 120, temp=0.01) -> str:
+        """
+        Send a message to the LLM without blocking the event loop.
+        """
+
+        return ''
+
+
     def get_context_size(self) -> int:
         """
         Returns the context size of the LLM.
@@ -29,9 +40,142 @@ class ChatApi:
         return self.DEFAULT_CONTEXT_SIZE
 
 
+    def get_model_id(self) -> str:
+        """
+        Returns the identifier of the model, used to keep cached results apart between models.
+        """
+
+        return f'{self.host}:{self.port}'
+
+
     def get_message_size(self, message:str = '') -> int:
         """
         Returns the tokens taken by the message.
         """
 
-        return 0
\ No newline at end of file
+        return self.get_message_sizes([message])[0]
+
+
+    def get_message_sizes(self, messages:list) -> list:
+        """
+        Returns the tokens taken by each message. Counts are cached, and messages that are not cached
+        are counted once each in a single batch.
+
+        Args:
+            messages (list): The messages to count.
+
+        Returns:
+            list: The token count of each message.
+        """
+
+        model_id = self.get_model_id()
+        results = self.token_cache.get_many(model_id, messages)
+        missing = self.get_missing_messages(messages, results)
+
+        if missing:
+            counted = self.store_counts(model_id, missing, self.count_tokens(missing))
+            results = [counted[message] if tokens is None else tokens for message, tokens in zip(messages, results)]
+
+        return results
+
+
+    async def aget_message_size(self, message:str = '') -> int:
+        """
+        Returns the tokens taken by the message without blocking the event loop.
+        """
+
+        return (await self.aget_message_sizes([message]))[0]
+
+
+    async def aget_message_sizes(self, messages:list) -> list:
+        """
+        Returns the tokens taken by each message without blocking the event loop.
+
+        Args:
+            messages (list): The messages to count.
+
+        Returns:
+            list: The token count of each message.
+        """
+
+        model_id = self.get_model_id()
+        results = self.token_cache.get_many(model_id, messages)
+        missing = self.get_missing_messages(messages, results)
+
+        if missing:
+            counted = self.store_counts(model_id, missing, await self.acount_tokens(missing))
+            results = [counted[message] if tokens is None else tokens for message, tokens in zip(messages, results)]
+
+        return results
+
+
+    def store_counts(self, model_id:str, messages:list, token_counts:list) -> dict:
+        """
+        Cache the counts of freshly counted messages. A count that failed is not cached, so the message
+        is counted again next time, and its size in bytes stands in for it meanwhile: no tokenizer makes
+        more tokens than that, so a prompt measured with it never overflows the context.
+
+        Args:
+            model_id (str): The model the messages were counted for.
+            messages (list): The distinct messages counted.
+            token_counts (list): The token count of each message, None where counting failed.
+
+        Returns:
+            dict: The token count of each message.
+        """
+
+        counted = {message: tokens for message, tokens in zip(messages, token_counts) if tokens is not None}
+        self.token_cache.put_many(model_id, list(counted), list(counted.values()))
+
+        return {message: counted.get(message, len(message.encode('utf-8'))) for message in messages}
+
+
+    def get_missing_messages(self, messages:list, results:list) -> list:
+        """
+        List the messages whose count was not cached, without duplicates.
+
+        Args:
+            messages (list): The messages.
+            results (list): The cached counts, None where missing.
+
+        Returns:
+            list: The distinct messages to count.
+        """
+
+        return list(dict.fromkeys(message for message, tokens in zip(messages, results) if tokens is None))
+
+
+    def count_tokens(self, messages:list) -> list:
+        """
+        Count the tokens of each message, bypassing the cache. Drivers override this.
+
+        Args:
+            messages (list): The distinct messages to count.
+
+        Returns:
+            list: The token count of each message, None where counting failed.
+        """
+
+        return [0 for _ in messages]
+
+
+    async def acount_tokens(self, messages:list) -> list:
+        """
+        Count the tokens of each message without blocking the event loop, bypassing the cache.
+
+        Args:
+            messages (list): The distinct messages to count.
+
+        Returns:
+            list: The token count of each message, None where counting failed.
+        """
+
+        return self.count_tokens(messages)
+
+
+    async def aclose(self):
+        """
+        Release any resources held by the asynchronous API calls.
+        """
+
+        pass
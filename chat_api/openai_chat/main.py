@@ -1,15 +1,18 @@
+import asyncio
 import json
 import os
 import openai
-import tiktoken
 import time
 from chat_api.main import ChatApi
+from chat_api.encoders.main import count_tokens
+from chat_api.token_cache.main import TokenCache
 
 class OpenAIApiChat(ChatApi):
 
-    def __init__(self, host:str = 'https://api.openai.com', port:int = 80, model_string:str = 'gpt-3.5-turbo'):
+    def __init__(self, host:str = 'https://api.openai.com', port:int = 80, model_string:str = 'gpt-3.5-turbo',
+                 token_cache:TokenCache|None = None):
 
-        super().__init__(host, port)
+        super().__init__(host, port, token_cache=token_cache)
 
         # Constants
         self.ENDPOINT = '/v1/chat/completions'
@@ -57,21 +60,7 @@ class OpenAIApiChat(ChatApi):
         super().send(message, max_tokens, timeout, temp)
         
         response = ''
-        api_package = []
-
-        system_msg = self.API_MSG.copy()
-        system_msg['role'] = 'system'
-        system_msg['content'] = message[0]['message']
-        api_package.append(system_msg)
-
-        for msg in message[1:]:
-            new_msg = self.API_MSG.copy()
-            new_msg['content'] = msg
-            api_package.append(new_msg)
-        
-        end_message = self.API_MSG.copy()
-        end_message['content'] = self.END_STATEMENT
-        api_package.append(end_message)
+        api_package = self.build_api_package(message)
 
         incomplete = True
         retries = 0
@@ -80,6 +69,7 @@ class OpenAIApiChat(ChatApi):
                 reply = openai.ChatCompletion.create(
                     model=self.model,
                     messages=api_package,
+                    max_tokens=int(max_tokens),
                     timeout=int(timeout),
                     temperature=float(temp)
                 )
@@ -100,6 +90,80 @@ class OpenAIApiChat(ChatApi):
         return response
     
 
+    async def asend(self, message:list = [], max_tokens:int = 200, timeout:int = 120, temp:float= 0.5) -> str:
+        """
+        Send a chat message to the OpenAI API without blocking the event loop.
+        
+        Args:
+            message (str): The message to send to the API.
+            max_tokens (int): The maximum number of tokens to generate.
+            timeout (int): The maximum number of seconds to wait for a response.
+            temp (float): The temperature to use for the response.
+            
+        Returns:
+            str: The response from the API.
+        """
+
+        response = ''
+        api_package = self.build_api_package(message)
+
+        incomplete = True
+        retries = 0
+        while incomplete:
+            try:
+                reply = await openai.ChatCompletion.acreate(
+                    model=self.model,
+                    messages=api_package,
+                    max_tokens=int(max_tokens),
+                    timeout=int(timeout),
+                    temperature=float(temp)
+                )
+                incomplete = False
+            except:
+                await asyncio.sleep(3)
+                retries += 1
+                if retries > self.RETRIES:
+                    raise Exception('OpenAI API call failed after {} retries.'.format(self.RETRIES))
+
+        # Save the first text response to reply
+        try:
+            response = reply['choices'][0]['message']['content'] # type: ignore
+        except:
+            pass
+
+        return response
+
+
+    def build_api_package(self, message:list) -> list:
+        """
+        Convert the conversation into the message list expected by the chat completions endpoint.
+
+        Args:
+            message (list): The conversation, starting with the system prompt.
+
+        Returns:
+            list: The API messages.
+        """
+
+        api_package = []
+
+        system_msg = self.API_MSG.copy()
+        system_msg['role'] = 'system'
+        system_msg['content'] = message[0]['message']
+        api_package.append(system_msg)
+
+        for msg in message[1:]:
+            new_msg = self.API_MSG.copy()
+            new_msg['content'] = self.message_template.replace('<from>', msg['from']).replace('<message>', msg['message'])
+            api_package.append(new_msg)
+        
+        end_message = self.API_MSG.copy()
+        end_message['content'] = self.END_STATEMENT
+        api_package.append(end_message)
+
+        return api_package
+
+
     def get_context_size(self) -> int:
         """
         Returns the context size of the LLM.
@@ -115,15 +179,23 @@ class OpenAIApiChat(ChatApi):
         return -1
 
 
-    def get_message_size(self, message:str = '', timeout:int = 120) -> int:
+    def get_model_id(self) -> str:
         """
-        Returns the tokens taken by the message.
+        Returns the identifier of the model, used to keep cached results apart between models.
+        """
+
+        return self.model
+
+
+    def count_tokens(self, messages:list) -> list:
         """
+        Count the tokens of each message with the model's tiktoken encoder.
 
-        result = 0
+        Args:
+            messages (list): The distinct messages to count.
 
-        encoder = tiktoken.encoding_for_model(self.model)
-        msg_as_tokens = encoder.encode(message)
-        result = len(msg_as_tokens)
+        Returns:
+            list: The token count of each message.
+        """
 
-        return result
\ No newline at end of file
+        return count_tokens(self.model, messages)
@@ -1,14 +1,17 @@
+import asyncio
 import os
 import openai
-import tiktoken
 import time
 from chat_api.main import ChatApi
+from chat_api.encoders.main import count_tokens
+from chat_api.token_cache.main import TokenCache
 
 class OpenAIApiCompletion(ChatApi):
 
-    def __init__(self, host:str = 'https://api.openai.com', port:int = 80, model_string='text-ada-001'):
+    def __init__(self, host:str = 'https://api.openai.com', port:int = 80, model_string='text-ada-001',
+                 token_cache:TokenCache|None = None):
 
-        super().__init__(host, port)
+        super().__init__(host, port, token_cache=token_cache)
 
         # Constants
         self.ENDPOINT = '/v1/completions'
@@ -92,6 +95,47 @@ class OpenAIApiCompletion(ChatApi):
         
         return response
     
+
+    async def asend(self, message:str, max_tokens:int = 200, temp:float= 0.5) -> str:
+        """
+        Send a completion request to the OpenAI API without blocking the event loop.
+        
+        Args:
+            message (str): The message to send to the API.
+            max_tokens (int): The maximum number of tokens to generate.
+            temp (float): The temperature to use for the response.
+            
+        Returns:
+            str: The response from the API.
+        """
+
+        response = ''
+
+        incomplete = True
+        retries = 0
+        while incomplete:
+            try:
+                reply = await openai.Completion.acreate(
+                    engine=self.model,
+                    prompt=message,
+                    max_tokens=max_tokens
+                )
+                incomplete = False
+            except:
+                await asyncio.sleep(3)
+                retries += 1
+                if retries > self.RETRIES:
+                    raise Exception('OpenAI API call failed after {} retries.'.format(self.RETRIES))
+
+        # Save the first text response to reply
+        try:
+            response = reply['choices'][0]['text'] # type: ignore
+        except:
+            pass
+
+        return response
+
+
     def get_context_size(self) -> int:
         """
         Returns the context size of the LLM.
@@ -107,15 +151,23 @@ class OpenAIApiCompletion(ChatApi):
         return -1
 
 
-    def get_message_size(self, message:str = '', timeout:int = 120) -> int:
+    def get_model_id(self) -> str:
         """
-        Returns the tokens taken by the message.
+        Returns the identifier of the model, used to keep cached results apart between models.
         """
 
-        result = 0
+        return self.model
+
 
-        encoder = tiktoken.encoding_for_model(self.model)
-        msg_as_tokens = encoder.encode(message)
-        result = len(msg_as_tokens)
+    def count_tokens(self, messages:list) -> list:
+        """
+        Count the tokens of each message with the model's tiktoken encoder.
+
+        Args:
+            messages (list): The distinct messages to count.
+
+        Returns:
+            list: The token count of each message.
+        """
 
-        return result
\ No newline at end of file
+        return count_tokens(self.model, messages)
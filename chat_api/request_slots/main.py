@@ -0,0 +1,113 @@
+import asyncio
+import threading
+from collections import deque
+
+class RequestSlots:
+    """
+    A limit on the requests in flight to one chat API backend, shared by worker threads and by
+    coroutines on event loops, so a slot released on one side can be taken on the other.
+    """
+
+    def __init__(self, limit:int):
+        """
+        Constructor for RequestSlots
+
+        Args:
+            limit (int): The requests allowed at once.
+        """
+
+        if not isinstance(limit, int) or limit < 1:
+            raise Exception('limit must be a positive int.')
+
+        self.limit = limit
+        self.in_use = 0
+        self.lock = threading.Lock()
+        self.released = threading.Condition(self.lock)
+
+        # Coroutines waiting for a slot, as (event loop, future), served first come first served
+        self.async_waiters = deque()
+
+
+    def acquire(self):
+        """
+        Take a slot, blocking the thread until one is free.
+        """
+
+        with self.released:
+            while self.in_use >= self.limit:
+                self.released.wait()
+            self.in_use += 1
+
+
+    async def aacquire(self):
+        """
+        Take a slot without blocking the event loop. A slot released while the coroutine waits is
+        handed over to it directly.
+        """
+
+        with self.lock:
+            if self.in_use < self.limit:
+                self.in_use += 1
+                return
+            future = asyncio.get_running_loop().create_future()
+            self.async_waiters.append((asyncio.get_running_loop(), future))
+
+        try:
+            await future
+        except asyncio.CancelledError:
+            # Cancelled after the slot was handed over, so it is given back
+            if future.done() and not future.cancelled():
+                self.release()
+            raise
+
+
+    def release(self):
+        """
+        Give a slot back, to a waiting coroutine if there is one, otherwise to a waiting thread.
+        """
+
+        with self.released:
+            while self.async_waiters:
+                loop, future = self.async_waiters.popleft()
+                if not loop.is_closed() and not future.done():
+                    loop.call_soon_threadsafe(self.hand_over, future)
+                    return
+            self.in_use -= 1
+            self.released.notify()
+
+
+    def hand_over(self, future:asyncio.Future):
+        """
+        Give a released slot to a waiting coroutine, on its event loop. A coroutine cancelled in the
+        meantime passes the slot on.
+
+        Args:
+            future (asyncio.Future): The future the coroutine awaits.
+        """
+
+        if future.done():
+            self.release()
+        else:
+            future.set_result(None)
+
+
+    def __enter__(self):
+
+        self.acquire()
+        return self
+
+
+    def __exit__(self, exc_type, exc_value, traceback):
+
+        self.release()
+
+
+    async def __aenter__(self):
+
+        await self.aacquire()
+        return self
+
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+
+        self.release()
@@ -1,11 +1,15 @@
-import requests
+import asyncio
 from chat_api.main import ChatApi
+from chat_api.http_pool.main import HttpPool
+from chat_api.token_cache.main import TokenCache
+from concurrent.futures import ThreadPoolExecutor
 
 class TgwuiApi(ChatApi):
 
-    def __init__(self, host:str = 'http://127.0.0.1', port:int = 5000, user_string:str = '', agent_string:str = ''):
+    def __init__(self, host:str = 'http://127.0.0.1', port:int = 5000, user_string:str = '', agent_string:str = '',
+                 http_pool:HttpPool|None = None, token_cache:TokenCache|None = None):
 
-        super().__init__(host, port)
+        super().__init__(host, port, token_cache=token_cache)
 
         # Constants
         self.ENDPOINT_GENERATE = '/api/v1/generate'
@@ -14,32 +18,76 @@ class TgwuiApi(ChatApi):
         # Variables
         self.message_type = self.MESSAGE_TYPE_STRING
         self.message_template = '<from>: <message>'
+        self.base_url = f'{self.host}:{self.port}'
+        self.http_pool = http_pool if http_pool is not None else HttpPool()
 
 
-    def send(self, messages:list, max_tokens:int = 200, timeout:int = 120, temp:float= 0.5) -> str:
+    def send(self, message:list, max_tokens:int = 200, timeout:int|None = None, temp:float= 0.5) -> str:
 
-        super().send(messages, max_tokens, timeout)
+        super().send(message, max_tokens, timeout)
 
         response = ''
 
-        uri = f'{self.host}:{self.port}{self.ENDPOINT_GENERATE}'
-
-        prompt = ''
-        for message in messages:
-            prompt += f"{message['message']}\n\n"
+        uri = self.base_url + self.ENDPOINT_GENERATE
 
         post = {
-            'prompt': prompt,
+            'prompt': self.build_prompt(message),
+            'max_new_tokens': int(max_tokens),
             'temperature': float(temp)
         }
-        reply = requests.post(uri, json=post, timeout=timeout)
+        session = self.http_pool.get_session(self.base_url)
+        reply = session.post(uri, json=post, timeout=self.http_pool.get_timeout(timeout))
 
         if reply.status_code == 200:
             api_response = reply.json()
             response = api_response['results'][0]['text']
 
         return response
-    
+
+
+    async def asend(self, message:list, max_tokens:int = 200, timeout:int|None = None, temp:float= 0.5) -> str:
+        """
+        Send the conversation to the generate endpoint without blocking the event loop.
+        """
+
+        response = ''
+
+        uri = self.base_url + self.ENDPOINT_GENERATE
+
+        post = {
+            'prompt': self.build_prompt(message),
+            'max_new_tokens': int(max_tokens),
+            'temperature': float(temp)
+        }
+        session = self.http_pool.get_async_session(self.base_url)
+        async with session.post(uri, json=post, timeout=self.http_pool.get_async_timeout(timeout)) as reply:
+            if reply.status == 200:
+                api_response = await reply.json()
+                response = api_response['results'][0]['text']
+
+        return response
+
+
+    def build_prompt(self, message:list|str) -> str:
+        """
+        Join the conversation into a single prompt.
+
+        Args:
+            message (list|str): The messages to send, or an already assembled prompt.
+
+        Returns:
+            str: The prompt.
+        """
+
+        if isinstance(message, str):
+            return message
+
+        prompt = ''
+        for item in message:
+            prompt += f"{item['message']}\n\n"
+
+        return prompt
+
 
     def get_context_size(self) -> int:
         """
@@ -49,25 +97,91 @@ class TgwuiApi(ChatApi):
         return 2048
 
 
-    def get_message_size(self, message:str = '', timeout:int = 120) -> int:
+    def count_tokens(self, messages:list) -> list:
+        """
+        Count the tokens of each message with the token-count endpoint. The endpoint takes one prompt
+        per request, so batches are sent in parallel over the keep-alive connections.
+
+        Args:
+            messages (list): The distinct messages to count.
+
+        Returns:
+            list: The token count of each message, None where counting failed.
         """
-        Returns the tokens taken by the message.
+
+        if len(messages) < 2:
+            return [self.count_message_tokens(message) for message in messages]
+
+        with ThreadPoolExecutor(max_workers=min(len(messages), self.http_pool.pool_size)) as executor:
+            return list(executor.map(self.count_message_tokens, messages))
+
+
+    async def acount_tokens(self, messages:list) -> list:
         """
+        Count the tokens of each message with the token-count endpoint without blocking the event loop.
 
-        result = 0
+        Args:
+            messages (list): The distinct messages to count.
 
-        uri = f'{self.host}:{self.port}{self.ENDPOINT_TOKENCOUNT}'
+        Returns:
+            list: The token count of each message, None where counting failed.
+        """
+
+        return list(await asyncio.gather(*[self.acount_message_tokens(message) for message in messages]))
+
+
+    def count_message_tokens(self, message:str = '', timeout:int|None = None) -> int|None:
+        """
+        Returns the tokens taken by the message, asking the server directly, or None if the server
+        could not count them.
+        """
+
+        result = None
+
+        uri = self.base_url + self.ENDPOINT_TOKENCOUNT
 
         post = {
             'prompt': message
         }
-        reply = requests.post(uri, json=post, timeout=timeout)
+        session = self.http_pool.get_session(self.base_url)
+        reply = session.post(uri, json=post, timeout=self.http_pool.get_timeout(timeout))
 
         if reply.status_code == 200:
-            api_response = reply.json()
             try:
-                result = api_response['results'][0]['tokens']
-            except:
+                result = int(reply.json()['results'][0]['tokens'])
+            except Exception:
                 pass
 
-        return result
\ No newline at end of file
+        return result
+
+
+    async def acount_message_tokens(self, message:str = '', timeout:int|None = None) -> int|None:
+        """
+        Returns the tokens taken by the message, asking the server directly without blocking the event loop,
+        or None if the server could not count them.
+        """
+
+        result = None
+
+        uri = self.base_url + self.ENDPOINT_TOKENCOUNT
+
+        post = {
+            'prompt': message
+        }
+        session = self.http_pool.get_async_session(self.base_url)
+        async with session.post(uri, json=post, timeout=self.http_pool.get_async_timeout(timeout)) as reply:
+            if reply.status == 200:
+                try:
+                    result = int((await reply.json())['results'][0]['tokens'])
+                except Exception:
+                    pass
+
+        return result
+
+
+    async def aclose(self):
+        """
+        Close the keep-alive connections used by the asynchronous calls.
+        """
+
+        await self.http_pool.aclose()
@@ -0,0 +1,110 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+class TokenCache:
+    """Bounded LRU cache of token counts, keyed by model and a hash of the message content."""
+
+    shared_cache = None
+    shared_lock = threading.Lock()
+
+    def __init__(self, max_entries:int = 100000):
+        """
+        Constructor for TokenCache
+
+        Args:
+            max_entries (int, optional): The number of counts kept before the least recently used are
+                dropped. Defaults to 100000.
+        """
+
+        if not isinstance(max_entries, int) or max_entries < 1:
+            raise Exception('max_entries must be a positive int.')
+
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+
+    @classmethod
+    def shared(cls):
+        """
+        Get the cache shared by every chat driver that was not given its own.
+
+        Returns:
+            TokenCache: The shared cache.
+        """
+
+        with cls.shared_lock:
+            if cls.shared_cache is None:
+                cls.shared_cache = cls()
+
+            return cls.shared_cache
+
+
+    def make_key(self, model:str, message:str) -> tuple:
+        """
+        Build the cache key for a message.
+
+        Args:
+            model (str): The model, or backend, that tokenizes the message.
+            message (str): The message.
+
+        Returns:
+            tuple: The key.
+        """
+
+        return (model, hashlib.blake2b(message.encode('utf-8'), digest_size=16).digest())
+
+
+    def get_many(self, model:str, messages:list) -> list:
+        """
+        Look up the token counts of several messages.
+
+        Args:
+            model (str): The model, or backend, that tokenizes the messages.
+            messages (list): The messages.
+
+        Returns:
+            list: The token count of each message, or None where it is not cached.
+        """
+
+        keys = [self.make_key(model, message) for message in messages]
+        results = []
+
+        with self.lock:
+            for key in keys:
+                tokens = self.entries.get(key)
+                if tokens is not None:
+                    self.entries.move_to_end(key)
+                results.append(tokens)
+
+        return results
+
+
+    def put_many(self, model:str, messages:list, token_counts:list):
+        """
+        Store the token counts of several messages.
+
+        Args:
+            model (str): The model, or backend, that tokenized the messages.
+            messages (list): The messages.
+            token_counts (list): The token count of each message.
+        """
+
+        keys = [self.make_key(model, message) for message in messages]
+
+        with self.lock:
+            for key, tokens in zip(keys, token_counts):
+                self.entries[key] = tokens
+                self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+
+    def clear(self):
+        """
+        Drop every cached count.
+        """
+
+        with self.lock:
+            self.entries.clear()
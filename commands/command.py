@@ -74,9 +74,11 @@ class Command:
         return response
     
 
-    def build_command_string(self, config:dict) -> str:
+    @staticmethod
+    def build_command_string(config:dict) -> str:
         """
-        Create the command string for use by agents.
+        Create the command string for use by agents. Static, so the command manifest can build it
+        without importing the command.
         
         Returns:
             str: The command string
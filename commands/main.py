@@ -1,61 +1,227 @@
-import os
+import ast
+import json
 import importlib
-import inspect
+import yaml
 from commands.command import Command
 from pathlib import Path
 
 class Commands:
+    """
+    The registry of commands. What agents need to know about each command, its name, tags, argument
+    schema and command string, comes from a manifest built from the command folders without importing
+    them. The manifest is kept in a file and rebuilt when a command's source or config.yaml changes, and
+    a command's module is only imported when the command is first used.
+    """
 
-    def __init__(self, config:dict = {}):
+    def __init__(self, config:dict = {}, directory:str|None = None, manifest_path:str|None = None):
+        """
+        Constructor for Commands
+
+        Args:
+            config (dict, optional): The commands configuration. Defaults to {}.
+            directory (str|None, optional): The folder holding the command packages. Defaults to this one.
+            manifest_path (str|None, optional): Where the manifest is kept. Defaults to manifest.json in
+                the folder.
+        """
+
+        self.MANIFEST_VERSION = 1
+        self.CONFIG_FILE = 'config.yaml'
+        self.BASE_CLASS = Command.__name__
 
         self.config = config
-        self.commands = self.load_commands()
+        self.directory = Path(directory) if directory is not None else Path(__file__).parent
+        self.manifest_path = manifest_path if manifest_path is not None else str(self.directory / 'manifest.json')
+        self.manifest = self.load_manifest()
+        self.commands = {}
         self.command_strings = self.get_command_list()
-        
+
+
+    def load_manifest(self) -> list:
+        """
+        Get the manifest from its file, or build and save it if the command folders changed since.
+
+        Returns:
+            list: An entry per command.
+        """
+
+        sources = self.get_sources()
+
+        try:
+            with open(self.manifest_path, 'r') as f:
+                manifest = json.load(f)
+            if manifest.get('version') == self.MANIFEST_VERSION and manifest.get('sources') == sources:
+                return manifest['commands']
+        except (OSError, ValueError, AttributeError):
+            pass
+
+        commands = self.build_manifest()
+
+        # A manifest that cannot be saved is rebuilt next time
+        try:
+            with open(self.manifest_path, 'w') as f:
+                json.dump({'version': self.MANIFEST_VERSION, 'sources': sources, 'commands': commands}, f, indent=2)
+        except OSError:
+            pass
+
+        return commands
+
+
+    def get_sources(self) -> dict:
+        """
+        Get the modification time and size of every command source and config file.
+
+        Returns:
+            dict: [modification time in ns, size] by path, relative to the folder.
+        """
+
+        sources = {}
+        for pattern in ['*.py', self.CONFIG_FILE]:
+            for file_path in self.directory.rglob(pattern):
+                stat = file_path.stat()
+                sources[file_path.relative_to(self.directory).as_posix()] = [stat.st_mtime_ns, stat.st_size]
+
+        return dict(sorted(sources.items()))
+
+
+    def build_manifest(self) -> list:
+        """
+        Find the Command subclasses by parsing the modules in the folder, without importing them, and
+        describe each from its config.yaml.
+
+        Returns:
+            list: An entry per command: its name, description, tags, arguments, return type, command
+                string, and the module, class and config file that implement it.
+        """
+
+        # Parse every module once, then find the classes derived from Command, directly or not
+        modules = {}
+        for file_path in sorted(self.directory.rglob('*.py')):
+            module_path = file_path.relative_to(self.directory).with_suffix('')
+            module_name = '.'.join((self.directory.name,) + module_path.parts)
+            tree = ast.parse(file_path.read_text(), filename=str(file_path))
+            classes = [node for node in tree.body if isinstance(node, ast.ClassDef)]
+            modules[module_name] = (file_path, classes)
+
+        command_classes = {self.BASE_CLASS}
+        found = True
+        while found:
+            found = False
+            for _, classes in modules.values():
+                for node in classes:
+                    if node.name not in command_classes and any(self.get_base_name(base) in command_classes for base in node.bases):
+                        command_classes.add(node.name)
+                        found = True
+
+        commands = []
+        for module_name, (file_path, classes) in modules.items():
+            for node in classes:
+                if node.name == self.BASE_CLASS or node.name not in command_classes:
+                    continue
+                config_path = file_path.parent / self.CONFIG_FILE
+                with open(config_path, 'r') as f:
+                    config = yaml.load(f, Loader=yaml.FullLoader)
+                commands.append({
+                    'name': config['name'],
+                    'description': config['description'],
+                    'tags': config['command_types'],
+                    'arguments': config['arguments'],
+                    'returns': config['returns'],
+                    'command_string': Command.build_command_string(config),
+                    'module': module_name,
+                    'class': node.name,
+                    'config': config_path.relative_to(self.directory).as_posix()
+                })
+
+        return commands
+
+
+    def get_base_name(self, base:ast.expr) -> str|None:
+        """
+        Get the name of a base class as written, e.g. Command for commands.command.Command.
+
+        Args:
+            base (ast.expr): The base class expression.
+
+        Returns:
+            str|None: The name, None when it is not a plain name or attribute.
+        """
+
+        if isinstance(base, ast.Name):
+            return base.id
+        if isinstance(base, ast.Attribute):
+            return base.attr
+
+        return None
+
+
+    def get_command(self, name:str) -> Command:
+        """
+        Get a command by name, importing its module the first time it is used.
+
+        Args:
+            name (str): The command name.
+
+        Returns:
+            Command: The command.
+        """
+
+        if name not in self.commands:
+            entry = next((entry for entry in self.manifest if entry['name'] == name), None)
+            if entry is None:
+                raise Exception('Unknown command: ' + name + '.')
+            module = importlib.import_module(entry['module'])
+            command_class = getattr(module, entry['class'])
+            self.commands[name] = command_class(config=str(self.directory / entry['config']))
+
+        return self.commands[name]
+
+
+    def call(self, name:str, asking_agent:str, arguments:dict) -> dict:
+        """
+        Run a command.
+
+        Args:
+            name (str): The command name.
+            asking_agent (str): The name of the agent asking.
+            arguments (dict): The arguments for the command.
+
+        Returns:
+            dict: The response from the command.
+        """
+
+        return self.get_command(name).call(asking_agent, arguments)
+
 
     def load_commands(self) -> list:
         """
-        Look through this directory for modules that inheits the Command class, initializes them,
-        then returns them as a list 
+        Import and initialize every command in the manifest.
         
         Return:
             list: A list of Command objects
         """
 
-        command_list = []
-        directory = Path(__file__).parent
-
-        # Iterate over all Python files in the directory and its subdirectories.
-        for file_path in directory.rglob('*.py'):
-            module_path = file_path.relative_to(directory).with_suffix('')
-            module_name = 'commands.' + '.'.join(module_path.parts)
-            module = importlib.import_module(module_name)
-            for _, obj in inspect.getmembers(module):
-                if inspect.isclass(obj) and issubclass(obj, Command) and obj is not Command and obj.__module__ == module.__name__:
-                    directory = os.path.dirname(file_path)
-                    config_path = os.path.join(directory, 'config.yaml')
-                    command_list.append(obj(config=config_path))
-
-        return command_list
+        return [self.get_command(entry['name']) for entry in self.manifest]
     
 
     def get_command_list(self, tag:str = '') -> dict:
         """
-        Get a list of commands that have been registered. Optionally limit the response by tag
+        Get the command strings of the registered commands by tag. Optionally limit the response to one tag.
         
         Args:
             tag (str): The tag to limit the response by
             
         Return:
-            list: A list of Command objects
+            dict: The command strings, by tag
         """
 
         response = {}
 
-        for command in self.commands:
-            for tag in command.tags:
-                if tag not in response:
-                    response[tag] = []
-                response[tag].append(command.command_string)
+        for entry in self.manifest:
+            for command_tag in entry['tags']:
+                if tag and command_tag != tag:
+                    continue
+                if command_tag not in response:
+                    response[command_tag] = []
+                response[command_tag].append(entry['command_string'])
 
-        return response
\ No newline at end of file
+        return response
@@ -1,17 +1,25 @@
+import asyncio
+import importlib
 import json
 import os
 import threading
 import queue
 import secrets
-import spacy
 import time
 import string
+import sys
+from concurrent.futures import ThreadPoolExecutor
 from agent.main import Agent
-from chat_api.tgwui.main import TgwuiApi
-from chat_api.openai_completion.main import OpenAIApiCompletion
-from chat_api.openai_chat.main import OpenAIApiChat
+from agent.message.main import Message, Envelope
+from name_resolver.main import NameResolver
+from chat_api.main import ChatApi
+from chat_api.request_slots.main import RequestSlots
 from commands.main import Commands
 from config_manager.main import ConfigManager
+from memory_manager.main import MemoryManager, MemoryView
+from agent.summary_cache.main import SummaryCache
+from memory_manager.storage.main import SqliteStorage
+from memory_manager.eviction.main import EvictionTracker
 from colorama import Fore, Back, Style
 from dotenv import load_dotenv
 
@@ -20,14 +28,17 @@ class AgentSwarm():
     AgentSwarm is a collection of agents designed to complete a project or achieve a goal.
     """
 
-    def __init__(self, configuration = ConfigManager()):
+    def __init__(self, configuration:ConfigManager|None = None, start:bool = True):
         
         """
         Constructor for AgentSwarm
         
         Args:
             chat_api (TgwuiApi, optional): The chat API. Defaults to TgwuiApi()
-            configuration (ConfigManager, optional): The configuration manager. Defaults to ConfigManager()
+            configuration (ConfigManager, optional): The configuration manager. Defaults to config.yaml in the
+                working directory.
+            start (bool, optional): Run the main loop once the agents are signed on. Defaults to True;
+                otherwise call start_loop() to run it.
         """
 
         # Constants
@@ -36,31 +47,116 @@ class AgentSwarm():
         self.CHAT_API_OPENAI_COMPLETION = 'openai_completion'
         self.CHAT_API_OPENAI_CHAT = 'openai_chat'
         self.SYSTEM_NAME = 'System'
-        
+        self.MEMORY_BACKEND_SQLITE = 'sqlite'
+        self.MEMORY_NAMESPACE = 'swarm'
+        self.INTERPRET_MODE_THREADS = 'threads'
+        self.INTERPRET_MODE_ASYNC = 'async'
+        self.DEFAULT_MAX_INTERPRETATIONS = 8
+        self.DEFAULT_BACKEND_CONCURRENCY = {
+            self.CHAT_API_TGWUI: 1,
+            self.CHAT_API_OPENAI_COMPLETION: 8,
+            self.CHAT_API_OPENAI_CHAT: 8
+        }
+        self.CHAT_DRIVERS = {
+            self.CHAT_API_TGWUI: ('chat_api.tgwui.main', 'TgwuiApi'),
+            self.CHAT_API_OPENAI_COMPLETION: ('chat_api.openai_completion.main', 'OpenAIApiCompletion'),
+            self.CHAT_API_OPENAI_CHAT: ('chat_api.openai_chat.main', 'OpenAIApiChat')
+        }
+
+        # Startup timing, reported phase by phase once the swarm is ready
+        self.startup_timings = {}
+        self.startup_clock = time.perf_counter()
 
         # Utilities and data
         load_dotenv()
-        self.configuration = configuration
+        self.configuration = configuration if configuration is not None else ConfigManager()
         self.msg_no_agent_named = str(self.configuration.get_property('redirect_failure_string'))
         self.user_string = str(self.configuration.get_property('user_string'))
         self.bot_string = str(self.configuration.get_property('bot_string'))
         self.sign_on_template = str(self.configuration.get_property('sign_on_template'))
         self.project = str(self.configuration.get_project())
         self.session_id = self.generate_session_id()
-        self.lang_processor = spacy.load("en_core_web_sm")
+        self.name_resolver = NameResolver.from_config(self.configuration.get_property('name_resolver')) # type: ignore
+        self.http_pool = None
+        self.chat_drivers = {}
+        self.chat_apis = {}
+        self.lazy_agents = self.configuration.get_property('lazy_agents') is True
+        self.mark_startup('configuration')
 
         # Command management
         self.command_controller = Commands()
+        self.mark_startup('commands')
+
+        # Interpretation concurrency, overall and per chat API backend
+        self.max_concurrent_interpretations = self.get_concurrency_limit('max_concurrent_interpretations',
+                                                                         self.DEFAULT_MAX_INTERPRETATIONS)
+        self.backend_semaphores = {}
+        self.interpret_mode = self.configuration.get_property('interpret_mode')
+        if self.interpret_mode == self.INTERPRET_MODE_ASYNC:
+            # All LLM calls share one event loop instead of a thread each
+            self.event_loop = asyncio.new_event_loop()
+            self.interpreter_pool = None
+        else:
+            self.interpret_mode = self.INTERPRET_MODE_THREADS
+            self.event_loop = None
+            self.interpreter_pool = ThreadPoolExecutor(max_workers=self.max_concurrent_interpretations,
+                                                       thread_name_prefix='interpreter')
+
+        # Scheduling, agents are woken when their inbound queue receives a message
+        self.schedule_condition = threading.Condition()
+        self.active_agents = {}
+        self.exit_on_quiescence = self.configuration.get_property('exit_on_quiescence') is True
+        self.is_idle = False
+        self.stopped_by_user = False
+        self.should_continue = True
 
-        # Agents
+        # Agents, sharing one memory so every message is stored once, and the summaries already made
+        self.memory = self.create_memory()
+        self.summary_cache = SummaryCache.from_config(self.configuration.get_property('summary_cache')) # type: ignore
+        self.mark_startup('memory')
+        self.get_chat_api(str(self.configuration.get_property('chat_api')))
+        self.mark_startup('chat driver')
+        self.agent_definitions = {}
         self.agents = self.create_agents_fron_config()
+        self.name_resolver.set_agents(list(self.agent_definitions.values()))
+        self.agent_order = {name: position for position, name in enumerate(self.agent_definitions)}
         self.dialog_queue = []
+        self.mark_startup('agents')
+        self.sign_on_agents(list(self.agents.values()))
+        self.mark_startup('sign-on')
 
         # Message queue management
         self.message_queue = queue.Queue()
-        self.should_continue = True
 
-        self.start_loop()
+        if self.configuration.get_property('startup_report') is True:
+            self.print_startup_report()
+
+        if start:
+            self.start_loop()
+
+
+    def mark_startup(self, phase:str):
+        """
+        Record how long a startup phase took, since the previous phase ended.
+
+        Args:
+            phase (str): The name of the phase that just ended.
+        """
+
+        now = time.perf_counter()
+        self.startup_timings[phase] = now - self.startup_clock
+        self.startup_clock = now
+
+
+    def print_startup_report(self):
+        """
+        Print how long each startup phase took.
+        """
+
+        for phase, seconds in self.startup_timings.items():
+            print(f'{Fore.CYAN}Startup {phase}: {seconds * 1000:.0f} ms{Style.RESET_ALL}')
+        total = sum(self.startup_timings.values())
+        print(f'{Fore.CYAN}Startup total: {total * 1000:.0f} ms{Style.RESET_ALL}')
 
 
     def generate_session_id(self) -> str:
@@ -82,47 +178,257 @@ class AgentSwarm():
     def start_loop(self):
 
         """
-        Loop through all agents and retrieve messages to deliver. If the user is the recipient, 
-        add to the dialog queue. If the user presses ESC, exit the loop.
+        Wake agents as messages arrive, interpret their conversations and route the replies. The loop
+        blocks while the swarm is idle, and ends when the user types exit at the console or, if
+        exit_on_quiescence is set, when no agent has anything left to do.
+        """
+
+        # Commands are only read from a console. Piped input can stay open after the loop ends, and a
+        # thread still blocked reading it aborts the interpreter on exit
+        if sys.stdin is not None and sys.stdin.isatty():
+            ui_thread = threading.Thread(target=self.user_interface, daemon=True)
+            ui_thread.start()
+
+        # Shut down on every exit, so queued memory writes are stored even when an agent fails
+        try:
+            while self.should_continue:
+
+                # Sleep until at least one agent has something in its inbound queue
+                active_agents = self.wait_for_active_agents()
+                if not active_agents:
+                    break
+
+                # Process messages from the agents that were woken
+                self.interpret_agents(active_agents)
+
+                # Check for messages to deliver
+                system_messages = []
+                for agent in active_agents:
+                    messages = agent.deliver()
+                    if messages:
+                        for message in messages:
+                            # An empty reply means the agent has nothing to say, so nobody is woken
+                            if not message['message']:
+                                continue
+                            # If the message is sent to system, redirect to other agents
+                            if message['to'] == self.SYSTEM_NAME:
+                                system_messages.append(message)
+                            # The message is going to a named agent
+                            else:
+                                self.message_queue.put(Envelope(message, message['to']))
+
+                # Messages to system are sent to every agent or group they name, resolved in one batch
+                for envelope in self.redirect_system_msgs(system_messages):
+                    self.message_queue.put(envelope)
+            
+                # Deliver messages to the agents in one batch each, which schedules the recipients
+                deliveries = {}
+                while not self.message_queue.empty():
+                    envelope = self.message_queue.get()
+                    self.display_message(envelope)
+                    if envelope.to in self.agent_definitions:
+                        deliveries.setdefault(envelope.to, []).append(envelope.message)
+                for recipient, messages in zip(self.get_agents(list(deliveries)), deliveries.values()):
+                    recipient.receive_many(messages)
+        finally:
+            # The input thread only finishes by itself when the user asked to exit
+            if self.stopped_by_user:
+                ui_thread.join()
+            self.shutdown_interpreters()
+
+
+    def schedule_agent(self, agent_name:str):
+        """
+        Mark an agent as having work and wake the main loop. Registered as each agent's inbound listener.
+
+        Args:
+            agent_name (str): The name of the agent whose inbound queue received a message.
         """
 
-        ui_thread = threading.Thread(target=self.user_interface)
-        ui_thread.start()
+        with self.schedule_condition:
+            self.active_agents[agent_name] = None
+            self.schedule_condition.notify()
 
-        while self.should_continue:
 
-            # Check for messages to deliver
-            for _, agent in self.agents.items():
-                messages = agent.deliver()
-                if messages:
-                    for message in messages:
-                        # If the message is sent to system, redirect to other agents
-                        if message['to'] == self.SYSTEM_NAME:
-                            redirected_msgs = self.redirect_system_msg(message)
-                            if redirected_msgs:
-                                # Messaages are sent to every named agent.
-                                # TODO: get more granular on who to send messages to
-                                # TODO: handle "everyone" and "anyone" to go to agent subordinates
-                                for msg in redirected_msgs:
-                                    self.message_queue.put(msg)
-                        # The message is going to a named agent
-                        else:
-                            self.message_queue.put(message)
-            
-            # Deliver messages to the agent
-            while not self.message_queue.empty():
-                message = self.message_queue.get()
-                recipient_name = message['to']
-                self.display_message(message)
-                if recipient_name in self.agents:
-                    self.agents[recipient_name].receive(message)
-
-            # Process messages from agents
-            for _, agent in self.agents.items():
-                print(f'Processing message queue for {Fore.YELLOW}{agent.profile["name"]}{Style.RESET_ALL}...')
-                messages = agent.interpret()
-            
-        ui_thread.join()
+    def wait_for_active_agents(self) -> list:
+        """
+        Block until an agent has been scheduled or the swarm is stopped, then take every scheduled agent.
+
+        Returns:
+            list: The scheduled agents in roster order. Empty when the loop should end.
+        """
+
+        with self.schedule_condition:
+            while self.should_continue and not self.active_agents:
+                # Nothing is pending and nothing is in flight, so the swarm is quiescent
+                if self.exit_on_quiescence:
+                    print(f'{Fore.YELLOW}The swarm is idle, ending the run.{Style.RESET_ALL}')
+                    self.should_continue = False
+                    break
+                if not self.is_idle:
+                    print(f'{Fore.YELLOW}The swarm is idle. Type exit to quit.{Style.RESET_ALL}')
+                    self.is_idle = True
+                self.schedule_condition.wait()
+
+            if not self.should_continue:
+                return []
+
+            agent_names = sorted(self.active_agents, key=self.agent_order.__getitem__)
+            self.active_agents = {}
+            self.is_idle = False
+
+        return [self.agents[name] for name in agent_names]
+
+
+    def stop(self):
+        """
+        Stop the main loop and wake it if it is waiting for work.
+        """
+
+        with self.schedule_condition:
+            self.should_continue = False
+            self.schedule_condition.notify_all()
+
+
+    def interpret_agents(self, agents:list):
+        """
+        Run interpret() for the agents concurrently and wait for all of them to finish.
+
+        Only the LLM round trips overlap. Routing happens before and after this stage on the main
+        thread, so messages are delivered in the same order as when agents ran one at a time.
+
+        Args:
+            agents (list): The agents whose inbound queues should be interpreted.
+        """
+
+        if self.interpret_mode == self.INTERPRET_MODE_ASYNC:
+            self.event_loop.run_until_complete(self.ainterpret_agents(agents)) # type: ignore
+            return
+
+        # Each agent holds a slot of its chat API backend around every request, summaries included
+        futures = [self.interpreter_pool.submit(agent.interpret) for agent in agents] # type: ignore
+
+        # Wait for every agent, then surface the first failure like the sequential loop would
+        for future in futures:
+            future.exception()
+        for future in futures:
+            future.result()
+
+
+    async def ainterpret_agents(self, agents:list):
+        """
+        Interpret the agents on the event loop, limited overall. Each agent holds a slot of its chat
+        API backend around every request, so the conversations it sends at once share the backend limit.
+
+        Args:
+            agents (list): The agents whose inbound queues should be interpreted.
+        """
+
+        overall = asyncio.Semaphore(self.max_concurrent_interpretations)
+
+        async def run(agent:Agent):
+            async with overall:
+                await agent.ainterpret()
+
+        results = await asyncio.gather(*[run(agent) for agent in agents], return_exceptions=True)
+
+        # Surface the first failure once every agent is done
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+
+
+    def shutdown_interpreters(self):
+        """
+        Stop the interpretation workers and release the chat API connections they used. Every resource
+        is released even when another fails to close; the first error is raised once all are closed.
+        """
+
+        def close_chat_apis():
+            async def aclose_chat_apis():
+                await asyncio.gather(*[chat_api.aclose() for chat_api in self.chat_apis.values()])
+
+            try:
+                self.event_loop.run_until_complete(aclose_chat_apis())
+            finally:
+                self.event_loop.close()
+
+        # In order: background summaries finish before their connections are closed, and every
+        # remembered message is made durable before exiting
+        closers = []
+        if self.interpreter_pool is not None:
+            closers.append(lambda: self.interpreter_pool.shutdown(wait=True))
+        closers.extend(agent.close for agent in self.agents.values())
+        if self.event_loop is not None:
+            closers.append(close_chat_apis)
+        if self.http_pool is not None:
+            closers.append(self.http_pool.close)
+        closers.extend([self.memory.close, self.summary_cache.close])
+
+        error = None
+        for close in closers:
+            try:
+                close()
+            except Exception as exception:
+                if error is None:
+                    error = exception
+
+        if error is not None:
+            raise error
+
+
+    def get_backend_semaphore(self, backend:str) -> RequestSlots:
+        """
+        Get the slots limiting concurrent requests to a chat API backend, from threads and coroutines.
+
+        Args:
+            backend (str): The chat API name, as used by the chat_api property.
+
+        Returns:
+            RequestSlots: The slots for the backend.
+        """
+
+        if backend not in self.backend_semaphores:
+            self.backend_semaphores[backend] = RequestSlots(self.get_backend_limit(backend))
+
+        return self.backend_semaphores[backend]
+
+
+    def get_backend_limit(self, backend:str) -> int:
+        """
+        Get the number of concurrent requests allowed to a chat API backend.
+
+        Args:
+            backend (str): The chat API name, as used by the chat_api property.
+
+        Returns:
+            int: The limit.
+        """
+
+        limits = self.configuration.get_property('max_concurrent_per_backend')
+        limit = self.DEFAULT_BACKEND_CONCURRENCY.get(backend, self.max_concurrent_interpretations)
+        if isinstance(limits, dict) and isinstance(limits.get(backend), int) and limits[backend] > 0:
+            limit = limits[backend]
+
+        return limit
+
+
+    def get_concurrency_limit(self, identifier:str, default:int) -> int:
+        """
+        Read a positive integer limit from the configuration.
+
+        Args:
+            identifier (str): The configuration property.
+            default (int): The value used when the property is missing or invalid.
+
+        Returns:
+            int: The limit.
+        """
+
+        limit = self.configuration.get_property(identifier)
+        if isinstance(limit, int) and not isinstance(limit, bool) and limit > 0:
+            return limit
+        return default
 
 
     def user_interface(self):
@@ -131,110 +437,253 @@ class AgentSwarm():
         """
 
         while self.should_continue:
-            line = input()
+            try:
+                line = input()
+            except (EOFError, OSError):
+                # No console to read from, the swarm runs until it is stopped otherwise
+                return
             clean_line = line.strip()
             clean_line = clean_line.lower()
             if clean_line == self.CMD_EXIT:
-                self.should_continue = False
+                self.stopped_by_user = True
+                self.stop()
 
 
-    def display_message(self, message_package):
+    def display_message(self, envelope:Envelope):
         """
         Display a message to the user.
         
         Args:
-            message (dict): The message to display.
+            envelope (Envelope): The message to display and its recipient.
         """
-        print(f'{Fore.GREEN}{message_package["from"]}{Style.RESET_ALL} -> {Fore.YELLOW}{message_package["to"]}{Style.RESET_ALL}: {message_package["message"]}')
+        print(f'{Fore.GREEN}{envelope.message["from"]}{Style.RESET_ALL} -> {Fore.YELLOW}{envelope.to}{Style.RESET_ALL}: {envelope.message["message"]}')
 
 
-    def create_agent(self, agent_definition) -> Agent:
+    def create_agent(self, agent_definition, sign_on:bool = True) -> Agent:
         """
         Creates an agent from the agent definition.
         
         Args:
             agent_definition (dict): The agent definition.
+            sign_on (bool, optional): Whether to sign the agent on now. Defaults to True.
             
         Returns:
             Agent: The agent.
         """
 
-        # Deal with Chat API
+        # Deal with Chat API, every agent on a backend shares its driver
         chat_driver = self.configuration.get_property('chat_api')
-        openai_model_agent = str(self.configuration.get_property('openai_model_chat'))
-        openai_model_completion = str(self.configuration.get_property('openai_model_completion'))
-        if chat_driver == self.CHAT_API_OPENAI_CHAT:
-            self.chat_api = OpenAIApiChat(model_string=openai_model_agent)
-        elif chat_driver == self.CHAT_API_OPENAI_COMPLETION:
-            self.chat_api = OpenAIApiCompletion(model_string=openai_model_completion)
-        else:
-            self.chat_api = TgwuiApi(user_string=self.user_string, agent_string=self.bot_string)
-            
+        chat_api = self.get_chat_api(str(chat_driver))
+
+        # The agent's view of the swarm memory
+        memory = MemoryView(self.memory, str(agent_definition['name']),
+                            semantic_recall=agent_definition.get('semantic_recall', True) is not False)
+
         # Create the agent
-        new_agent = Agent(chat_api=self.chat_api, agent_profile=agent_definition, project=self.project, 
-                          session_id=self.session_id, commands=self.command_controller.command_strings)
-        new_agent.sign_on(self.sign_on_template)
+        new_agent = Agent(chat_api=chat_api, agent_profile=agent_definition, project=self.project, 
+                          session_id=self.session_id, commands=self.command_controller.command_strings,
+                          memory=memory, summary_cache=self.summary_cache,
+                          summary_mode=str(self.configuration.get_property('summary_mode') or 'full'),
+                          speculative_summary_threshold=self.configuration.get_property('speculative_summary_threshold'),
+                          compression=self.configuration.get_property('compression'), # type: ignore
+                          request_slots=self.get_backend_semaphore(str(chat_driver)))
+        new_agent.set_inbound_listener(self.schedule_agent)
+        if sign_on:
+            new_agent.sign_on(self.sign_on_template)
 
         return new_agent
 
 
+    def get_chat_api(self, backend:str) -> ChatApi:
+        """
+        Get the chat API shared by the agents on a backend, creating it the first time. The drivers keep
+        no state per agent, so one instance serves them all along with its connections and token cache.
+
+        Args:
+            backend (str): The chat API name, as used by the chat_api property. Unknown names get tgwui.
+
+        Returns:
+            ChatApi: The chat API.
+        """
+
+        if backend not in self.CHAT_DRIVERS:
+            backend = self.CHAT_API_TGWUI
+
+        if backend not in self.chat_apis:
+            if backend == self.CHAT_API_OPENAI_CHAT:
+                openai_model_agent = str(self.configuration.get_property('openai_model_chat'))
+                chat_api = self.get_chat_driver(backend)(model_string=openai_model_agent)
+            elif backend == self.CHAT_API_OPENAI_COMPLETION:
+                openai_model_completion = str(self.configuration.get_property('openai_model_completion'))
+                chat_api = self.get_chat_driver(backend)(model_string=openai_model_completion)
+            else:
+                # Only local drivers keep connections open, and the pool imports requests
+                from chat_api.http_pool.main import HttpPool
+                if self.http_pool is None:
+                    self.http_pool = HttpPool.from_config(self.configuration.get_property('http_pool')) # type: ignore
+                tgwui_host = self.configuration.get_property('tgwui_host') or 'http://127.0.0.1'
+                tgwui_port = self.configuration.get_property('tgwui_port') or 5000
+                chat_api = self.get_chat_driver(backend)(host=str(tgwui_host), port=int(tgwui_port), # type: ignore
+                                                         user_string=self.user_string,
+                                                         agent_string=self.bot_string,
+                                                         http_pool=self.http_pool)
+            self.chat_apis[backend] = chat_api
+
+        return self.chat_apis[backend]
+
+
+    def get_chat_driver(self, backend:str) -> type:
+        """
+        Get the chat API class of a backend, importing its module the first time. Drivers pull in
+        heavy client libraries, so only the backends in use are imported.
+
+        Args:
+            backend (str): The chat API name, as used by the chat_api property. Unknown names get tgwui.
+
+        Returns:
+            type: The ChatApi subclass.
+        """
+
+        if backend not in self.CHAT_DRIVERS:
+            backend = self.CHAT_API_TGWUI
+
+        if backend not in self.chat_drivers:
+            module_name, class_name = self.CHAT_DRIVERS[backend]
+            self.chat_drivers[backend] = getattr(importlib.import_module(module_name), class_name)
+
+        return self.chat_drivers[backend]
+
+
+    def sign_on_agents(self, agents:list):
+        """
+        Sign agents on concurrently. Each sign-on measures the agent's system prompt, a round trip
+        to the chat API for some backends.
+
+        Args:
+            agents (list): The agents.
+        """
+
+        if not agents:
+            return
+
+        with ThreadPoolExecutor(max_workers=min(len(agents), self.max_concurrent_interpretations),
+                                thread_name_prefix='sign-on') as sign_on_pool:
+            futures = [sign_on_pool.submit(agent.sign_on, self.sign_on_template) for agent in agents]
+
+        # Surface the first failure once every agent is done
+        for future in futures:
+            future.result()
+
+
+    def create_memory(self) -> MemoryManager:
+        """
+        Creates the memory shared by the agents, on disk when a durable backend is configured.
+
+        Returns:
+            MemoryManager: The memory.
+        """
+
+        memory_storage = None
+        storage_config = self.configuration.get_property('memory_storage')
+        if not isinstance(storage_config, dict):
+            storage_config = {}
+        if storage_config.get('backend') == self.MEMORY_BACKEND_SQLITE:
+            namespace = str(storage_config.get('namespace') or self.MEMORY_NAMESPACE)
+            memory_storage = SqliteStorage.from_config(storage_config, namespace)
+
+        return MemoryManager(self.session_id + '-' + self.MEMORY_NAMESPACE, storage=memory_storage,
+                             eviction=EvictionTracker.from_config(self.configuration.get_property('memory_eviction')), # type: ignore
+                             write_behind=storage_config.get('write_behind') is True,
+                             write_queue_size=int(storage_config.get('write_queue_size') or 1000))
+
+
     def create_agents_fron_config(self) -> dict:
         """
-        Creates the agents from the configuration file.
+        Creates the agents from the configuration file. They are signed on afterwards, together.
+        With lazy_agents set, only the first agent and those that set lazy: false are created now,
+        the rest when their first message arrives.
                     
         Returns:
-            list: The list of agents.
+            dict: The agents created, by name.
         """
 
         new_agents = {}
         agents = self.configuration.get_agents()
-        for agent in agents:
-            new_agent = self.create_agent(agent)
+        for position, agent in enumerate(agents):
+            self.agent_definitions[agent['name']] = agent
+            if self.lazy_agents and position > 0 and agent.get('lazy', True) is not False:
+                continue
+            new_agent = self.create_agent(agent, sign_on=False)
             new_agents[new_agent.profile['name']] = new_agent
 
         return new_agents
+
+
+    def get_agents(self, agent_names:list) -> list:
+        """
+        Get agents by name, creating and signing on those that have not received a message yet.
+
+        Args:
+            agent_names (list): The names of configured agents.
+
+        Returns:
+            list: The agents, in the same order.
+        """
+
+        new_agents = []
+        for agent_name in agent_names:
+            if agent_name not in self.agents:
+                new_agent = self.create_agent(self.agent_definitions[agent_name], sign_on=False)
+                self.agents[agent_name] = new_agent
+                new_agents.append(new_agent)
+        self.sign_on_agents(new_agents)
+
+        return [self.agents[agent_name] for agent_name in agent_names]
     
 
-    def redirect_system_msg(self, message_to_review) -> list:
+    def redirect_system_msg(self, message_to_review:Message) -> list:
         """
-        Redirects system messages to the appropriate agent.
+        Redirects system messages to the appropriate agent. Every named agent gets the same message.
         
         Args:
-            message_package (dict): The message package to interpret.
+            message_to_review (Message): The message to interpret.
             
         Returns:
-            dict: The redirected message package.
+            list: An envelope for each recipient.
         """
 
-        # Starting stuff
-        response = []
-        named_agents = []
+        return self.redirect_system_msgs([message_to_review])
 
-        # Cut the message into language chunks
-        document = self.lang_processor(message_to_review['message'])
 
-        # Find named entities
-        for entity in document.ents:
-            if entity.text in self.agents.keys() and entity.text != message_to_review['from']:
-                named_agents.append(entity.text)
+    def redirect_system_msgs(self, messages_to_review:list) -> list:
+        """
+        Redirects several system messages to the agents they name, by name, alias or group such as
+        everyone or subordinates. A message that names nobody is bounced back to its sender.
+
+        Args:
+            messages_to_review (list): The messages to interpret.
 
-        # Remove duplicates from named_agents
-        named_agents = list(dict.fromkeys(named_agents))
+        Returns:
+            list: An envelope for each recipient of each message.
+        """
 
-        # Redirect the message based on the named entities.
-        if len(named_agents) > 0:
+        response = []
+        if not messages_to_review:
+            return response
+
+        named_agents = self.name_resolver.resolve_many([(message['message'], message['from'])
+                                                        for message in messages_to_review])
+
+        for message_to_review, agent_names in zip(messages_to_review, named_agents):
             # Send to every named agent in the message
-            for agent in named_agents:
-                ogm = message_to_review.copy()
-                ogm['to'] = agent
-                response.append(ogm)
-        # Bounce the message back to the agent to direct it at another agent
-        else:
-            ogm = message_to_review.copy()
-            ogm['to'] = message_to_review['from']
-            ogm['from'] = self.SYSTEM_NAME
-            ogm['message'] = self.msg_no_agent_named + message_to_review['message']
-            response.append(ogm)
+            if agent_names:
+                for agent in agent_names:
+                    response.append(Envelope(message_to_review, agent))
+            # Bounce the message back to the agent to direct it at another agent
+            else:
+                ogm = Message(self.msg_no_agent_named + message_to_review['message'], self.SYSTEM_NAME,
+                              message_to_review['from'], message_to_review['timestamp'])
+                response.append(Envelope(ogm, ogm['to']))
 
         return response
 
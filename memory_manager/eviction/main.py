@@ -0,0 +1,223 @@
+import heapq
+import itertools
+import time
+from collections import OrderedDict
+
+class EvictionTracker:
+    """
+    Decides which memories to evict. Usage counts, ages and sizes are tracked as memories are added
+    and used, so finding the memories to evict costs amortized O(log n) per operation rather than a
+    scan of every memory.
+    """
+
+    def __init__(self, usage_threshold:int|None = 50, max_count:int|None = None, max_bytes:int|None = None,
+                 ttl:float|None = None, policy:str = 'lfu'):
+        """
+        Constructor for EvictionTracker
+
+        Args:
+            usage_threshold (int|None, optional): Evict a memory once it has been recalled this many
+                times. Defaults to 50.
+            max_count (int|None, optional): The most memories kept. Defaults to no limit.
+            max_bytes (int|None, optional): The most bytes of memory text kept. Defaults to no limit.
+            ttl (float|None, optional): Seconds a memory is kept after it was added. Defaults to forever.
+            policy (str, optional): Which memory goes when over max_count or max_bytes: lfu for the least
+                used, lru for the least recently used. Defaults to lfu.
+        """
+
+        # Constants
+        self.POLICY_LFU = 'lfu'
+        self.POLICY_LRU = 'lru'
+
+        if policy not in [self.POLICY_LFU, self.POLICY_LRU]:
+            raise Exception(f'policy must be {self.POLICY_LFU} or {self.POLICY_LRU}.')
+
+        for name, limit in [('usage_threshold', usage_threshold), ('max_count', max_count), ('max_bytes', max_bytes)]:
+            if limit is not None and (not isinstance(limit, int) or limit < 1):
+                raise Exception(f'{name} must be a positive int.')
+
+        # Policies
+        self.usage_threshold = usage_threshold
+        self.max_count = max_count
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.policy = policy
+
+        # Usage counts and sizes by memory id
+        self.usage = {}
+        self.sizes = {}
+        self.total_bytes = 0
+
+        # Memories that reached the usage threshold, waiting for collect()
+        self.exhausted = []
+
+        # Insertion order with the time added, oldest first, for the TTL
+        self.added = OrderedDict()
+
+        # Recency order for lru, and a heap of (usage, sequence, id) for lfu. Heap entries go stale when a
+        # memory is used or removed, and are skipped when popped.
+        self.recency = OrderedDict()
+        self.heap = []
+        self.sequence = itertools.count()
+
+
+    @classmethod
+    def from_config(cls, config:dict|None, usage_threshold:int|None = 50):
+        """
+        Create a tracker from the memory_eviction section of the configuration.
+
+        Args:
+            config (dict|None): The memory_eviction section. Missing keys use the defaults.
+            usage_threshold (int|None, optional): The default usage threshold. Defaults to 50.
+
+        Returns:
+            EvictionTracker: The tracker.
+        """
+
+        settings = {'usage_threshold': usage_threshold}
+        if isinstance(config, dict):
+            for key in ['usage_threshold', 'max_count', 'max_bytes', 'ttl', 'policy']:
+                if key in config:
+                    settings[key] = config[key]
+
+        return cls(**settings)
+
+
+    def __len__(self) -> int:
+        return len(self.usage)
+
+
+    def __contains__(self, memory_id) -> bool:
+        return memory_id in self.usage
+
+
+    def add(self, memory_id, size:int = 0, now:float|None = None):
+        """
+        Start tracking a memory.
+
+        Args:
+            memory_id: The memory id.
+            size (int, optional): The size of the memory in bytes. Defaults to 0.
+            now (float|None, optional): The time it was added. Defaults to now.
+        """
+
+        if memory_id in self.usage:
+            self.remove(memory_id)
+
+        self.usage[memory_id] = 0
+        self.sizes[memory_id] = size
+        self.total_bytes += size
+        self.added[memory_id] = time.monotonic() if now is None else now
+        self.recency[memory_id] = None
+        if self.policy == self.POLICY_LFU:
+            heapq.heappush(self.heap, (0, next(self.sequence), memory_id))
+            self.compact_heap()
+
+
+    def touch(self, memory_id):
+        """
+        Count a use of a memory.
+
+        Args:
+            memory_id: The memory id.
+        """
+
+        if memory_id not in self.usage:
+            return
+
+        self.usage[memory_id] += 1
+        self.recency.move_to_end(memory_id)
+        if self.policy == self.POLICY_LFU:
+            heapq.heappush(self.heap, (self.usage[memory_id], next(self.sequence), memory_id))
+            self.compact_heap()
+
+        if self.usage_threshold is not None and self.usage[memory_id] == self.usage_threshold:
+            self.exhausted.append(memory_id)
+
+
+    def remove(self, memory_id) -> bool:
+        """
+        Stop tracking a memory.
+
+        Args:
+            memory_id: The memory id.
+
+        Returns:
+            bool: True if the memory was tracked, False otherwise.
+        """
+
+        if memory_id not in self.usage:
+            return False
+
+        del self.usage[memory_id]
+        self.total_bytes -= self.sizes.pop(memory_id)
+        del self.added[memory_id]
+        del self.recency[memory_id]
+
+        return True
+
+
+    def collect(self, now:float|None = None) -> list:
+        """
+        Stop tracking, and return, every memory that a policy says should be evicted.
+
+        Args:
+            now (float|None, optional): The current time. Defaults to now.
+
+        Returns:
+            list: The memory ids to evict.
+        """
+
+        evicted = []
+
+        # Used too often
+        for memory_id in self.exhausted:
+            if self.remove(memory_id):
+                evicted.append(memory_id)
+        self.exhausted = []
+
+        # Too old
+        if self.ttl is not None:
+            expiry = (time.monotonic() if now is None else now) - self.ttl
+            while self.added:
+                memory_id, added = next(iter(self.added.items()))
+                if added > expiry:
+                    break
+                self.remove(memory_id)
+                evicted.append(memory_id)
+
+        # Over capacity
+        while self.usage and ((self.max_count is not None and len(self.usage) > self.max_count)
+                              or (self.max_bytes is not None and self.total_bytes > self.max_bytes)):
+            memory_id = self.pop_victim()
+            self.remove(memory_id)
+            evicted.append(memory_id)
+
+        return evicted
+
+
+    def pop_victim(self):
+        """
+        Find the memory the policy gives up first.
+
+        Returns:
+            The memory id.
+        """
+
+        if self.policy == self.POLICY_LRU:
+            return next(iter(self.recency))
+
+        while True:
+            usage, _, memory_id = heapq.heappop(self.heap)
+            if self.usage.get(memory_id) == usage:
+                return memory_id
+
+
+    def compact_heap(self):
+        """
+        Rebuild the heap without stale entries once they outnumber the live ones.
+        """
+
+        if len(self.heap) > 2 * len(self.usage) + 64:
+            self.heap = [(usage, next(self.sequence), memory_id) for memory_id, usage in self.usage.items()]
+            heapq.heapify(self.heap)
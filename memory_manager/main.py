@@ -1,81 +1,414 @@
-import uuid
+import itertools
+import queue
+import threading
+from collections.abc import Mapping
 from rdflib import Graph, URIRef, Literal, Namespace
+from memory_manager.text_index.main import TextIndex
+from memory_manager.vector_store.main import HashingEmbedder, VectorStore
+from memory_manager.storage.main import MemoryStorage, parse_memory_id
+from memory_manager.record.main import MemoryRecord
+from memory_manager.eviction.main import EvictionTracker
 
 class MemoryManager:
 
-    def __init__(self, sys_namespace:str):
+    def __init__(self, sys_namespace:str, semantic_recall:bool = True, embedder = None, storage:MemoryStorage|None = None,
+                 eviction:EvictionTracker|None = None, graph_projection:bool = False, write_behind:bool = False,
+                 write_queue_size:int = 1000):
 
         # Constants
         self.SEARCH_THRESHOLD = 50
-        
-        # I'm using two database styles because I'm greedy and want the best of both worlds where graph can
-        # be used for triples and rapid subject searches, and the vector database can be used for detailed
-        # semantic searches that the graph database can't do.
-        self.graph = Graph()
+        self.RECALL_LIMIT = 10
+        self.INDEXED_KEYS = ['message', 'from', 'to']
+        self.SIMILARITY_THRESHOLD = 0.1
+        self.RANK_FUSION_OFFSET = 60
+        self.WRITE_BATCH_SIZE = 100
+
+        # Memories are numbered in the order they are remembered. The graph of triples is an optional
+        # projection of the records: kept up to date only when asked for, built on demand otherwise.
+        self.memory_ids = itertools.count()
         self.namespace = Namespace(sys_namespace)
-        self.usage_counter = {}
+        self.graph = Graph() if graph_projection else None
+        self.predicates = {}
+        self.lock = threading.RLock()
+        self.eviction = eviction if eviction is not None else EvictionTracker(usage_threshold=self.SEARCH_THRESHOLD)
 
+        # Memory records live in the storage backend, indexes over them live here
+        self.storage = storage if storage is not None else MemoryStorage()
+        self.text_index = TextIndex()
 
-    def remember(self, new_memory:dict = {}):
+        # A store shared by several agents keeps each message once: the message key finds the stored
+        # copy, and each agent sees only the memories it owns
+        self.message_keys = {}
+        self.owner_memories = {}
+
+        # Semantic recall: local embeddings of each memory's message in a vector store
+        self.semantic_recall = semantic_recall
+        self.embedder = embedder if embedder is not None else HashingEmbedder()
+        self.vector_store = VectorStore(dimensions=self.embedder.dimensions)
+
+        # Memories kept by a durable backend from earlier runs
+        self.load()
+
+        # Write-behind: remembered messages go to a bounded queue that a writer thread stores and
+        # indexes in batches, so remembering never waits on indexing or the disk
+        self.write_queue = None
+        self.write_worker = None
+        self.write_error = None
+        if write_behind:
+            if not isinstance(write_queue_size, int) or write_queue_size < 1:
+                raise Exception('write_queue_size must be a positive int.')
+            self.write_queue = queue.Queue(maxsize=write_queue_size)
+            self.write_worker = threading.Thread(target=self.write_behind, name='memory-writer', daemon=True)
+            self.write_worker.start()
+
+
+    def remember(self, new_memory:dict = {}, owner:str|None = None):
         """
-        Remember a message.
+        Remember a message. A message already remembered, with the same sender, timestamp and text,
+        is not stored again; the owner is added to the stored copy instead.
 
         Args:
-            message (str, optional): The message to remember. Defaults to ''.
+            new_memory (dict, optional): The message to remember. Defaults to {}.
+            owner (str|None, optional): The agent that can recall the memory. Defaults to no owner.
 
         Returns:
-            bool: True if successful, False otherwise.
+            URIRef: The URI of the memory.
         """
 
-        #if 'message' in message_obj and 'from' in message_obj and 'to' in message_obj and 'timestamp' in message_obj:
-        memory_id = str(uuid.uuid4())
-        memory_uri = URIRef(self.namespace + memory_id)
+        return self.remember_many([new_memory], owner)[0]
 
-        for key in new_memory:
-            predicate = URIRef(str(self.namespace) + key)
-            self.graph.add((memory_uri, predicate, Literal(new_memory[key])))
-            self.usage_counter[memory_id] = 0
 
-        self.prune()
+    def remember_many(self, new_memories:list, owner:str|None = None) -> list:
+        """
+        Remember several messages with one storage write, one embedding pass and one prune. In
+        write-behind mode the messages are queued for the writer thread instead, and their ids are
+        reserved up front; a message that turns out to be remembered already keeps its first id.
 
-        return memory_uri
-    
+        Args:
+            new_memories (list): The messages to remember.
+            owner (str|None, optional): The agent that can recall the memories. Defaults to no owner.
 
-    def recall(self, search_terms:list) -> list:
+        Returns:
+            list: The URI of each memory.
         """
-        Recall a message.
+
+        writes = []
+        memory_uris = []
+
+        # Copy the messages into records now, the caller may change them once they are queued
+        for new_memory in new_memories:
+            record = None
+            if new_memory:
+                record = MemoryRecord()
+                for key, value in new_memory.items():
+                    record.set(key, str(value))
+            writes.append((None, record, owner))
+
+        if self.write_queue is None:
+            return self.write_memories(writes)
+
+        for _, record, _ in writes:
+            memory_id = next(self.memory_ids)
+            if record is not None:
+                self.write_queue.put((memory_id, record, owner))
+            memory_uris.append(self.get_memory_uri(memory_id))
+
+        return memory_uris
+
+
+    def write_memories(self, writes:list) -> list:
+        """
+        Store and index remembered messages.
 
         Args:
-            search_term (str): The search term.
+            writes (list): (reserved memory id or None, MemoryRecord or None, owner) triples.
 
         Returns:
-            str: The message if found, empty string otherwise.
+            list: The URI of each memory.
+        """
+
+        memory_uris = []
+        new_records = {}
+
+        with self.lock:
+            batch_keys = {}
+
+            for memory_id, record, owner in writes:
+                if record is not None:
+                    message_key = record.get_message_key()
+                    known_id = None
+                    if message_key is not None:
+                        known_id = self.message_keys.get(message_key, batch_keys.get(message_key))
+                    if known_id is None:
+                        memory_id = next(self.memory_ids) if memory_id is None else memory_id
+                        if owner is not None:
+                            record.add_owner(owner)
+                        new_records[memory_id] = record
+                        if message_key is not None:
+                            batch_keys[message_key] = memory_id
+                    else:
+                        memory_id = known_id
+                        if owner is not None and memory_id in new_records:
+                            new_records[memory_id].add_owner(owner)
+                        elif owner is not None:
+                            self.share_memory(memory_id, owner)
+                elif memory_id is None:
+                    memory_id = next(self.memory_ids)
+
+                memory_uris.append(self.get_memory_uri(memory_id))
+
+            self.storage.put_many(list(new_records.items()))
+            self.index_memories(list(new_records.items()))
+
+            self.prune()
+
+        return memory_uris
+
+
+    def write_behind(self):
+        """
+        The writer thread: drain queued writes in batches until close() stops it.
+        """
+
+        while True:
+            writes = [self.write_queue.get()]
+            while len(writes) < self.WRITE_BATCH_SIZE:
+                try:
+                    writes.append(self.write_queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            try:
+                self.write_memories([write for write in writes if write is not None])
+            except Exception as error:
+                self.write_error = error
+            finally:
+                for _ in writes:
+                    self.write_queue.task_done()
+
+            if None in writes:
+                return
+
+
+    def flush(self):
+        """
+        Wait until every queued write is stored and indexed. Recall and forget flush first, so they
+        always see the messages remembered before them.
+        """
+
+        if self.write_queue is None:
+            return
+
+        self.write_queue.join()
+
+        if self.write_error is not None:
+            error, self.write_error = self.write_error, None
+            raise Exception(f'Remembering messages failed: {error}')
+
+
+    def share_memory(self, memory_id, owner:str):
+        """
+        Let another agent recall a stored memory.
+
+        Args:
+            memory_id (int|str): The memory id.
+            owner (str): The agent name.
+        """
+
+        record = self.storage.get_many([memory_id])[0]
+        if record is not None and record.add_owner(owner):
+            self.storage.put(memory_id, record)
+            self.owner_memories.setdefault(owner, set()).add(memory_id)
+
+
+    def recall(self, search_terms:list, top_k:int|None = None, semantic:bool|None = None, owner:str|None = None) -> list:
+        """
+        Recall the memories that best match the search terms.
+
+        Args:
+            search_terms (list): Text to search for, or messages whose text is searched for.
+            top_k (int|None, optional): The maximum number of memories. Defaults to RECALL_LIMIT.
+            semantic (bool|None, optional): Also search by meaning in the vector store, merging both
+                rankings. Defaults to the manager's semantic_recall setting.
+            owner (str|None, optional): Only recall the memories of this agent. Defaults to every memory.
+
+        Returns:
+            list: The memories, best match first.
+        """
+
+        return self.recall_many([search_terms], top_k, semantic, owner)[0]
+
+
+    def recall_many(self, queries:list, top_k:int|None = None, semantic:bool|None = None, owner:str|None = None) -> list:
+        """
+        Recall the memories for several queries with one embedding pass, one storage lookup and one prune.
+
+        Args:
+            queries (list): Lists of search terms, one list per query.
+            top_k (int|None, optional): The maximum number of memories per query. Defaults to RECALL_LIMIT.
+            semantic (bool|None, optional): Also search by meaning in the vector store, merging both
+                rankings. Defaults to the manager's semantic_recall setting.
+            owner (str|None, optional): Only recall the memories of this agent. Defaults to every memory.
+
+        Returns:
+            list: The memories of each query, best match first.
         """
 
         results = []
+        top_k = self.RECALL_LIMIT if top_k is None else top_k
+        semantic = self.semantic_recall if semantic is None else semantic
+        texts = [' '.join(self.get_search_text(search_term) for search_term in search_terms) for search_terms in queries]
 
-        for search_term in search_terms:
-            for memory_uri, predicate, _ in self.graph.triples((None, None, Literal(search_term))):
-                memory_id = str(memory_uri).split("/")[-1]
-                self.usage_counter[memory_id] += 1
-                memory = {}
-                keys = [str(predicate).split("/")[-1] for predicate in self.graph.predicates(subject=memory_uri)]
-                for key in keys:
-                    predicate = URIRef(str(self.namespace) + key)
-                    memory[key] = str(self.graph.value(subject=memory_uri, predicate=predicate))
-                results.append(memory)
+        if not texts:
+            return results
 
-        self.prune()
+        self.flush()
+
+        with self.lock:
+            visible = self.get_visible(owner)
+            rankings = [[memory_id for memory_id, _ in self.text_index.search(text, top_k, visible)] for text in texts]
+            if semantic:
+                for ranking, vector in zip(rankings, self.embedder.embed(texts)):
+                    similar = self.vector_store.search(vector, top_k, self.SIMILARITY_THRESHOLD, visible)
+                    ranking[:] = self.fuse_rankings([list(ranking), [memory_id for memory_id, _ in similar]])[:top_k]
+
+            results = self.fetch_many(rankings)
+
+            self.prune()
 
         return results
-    
 
-    def forget(self, search_term:str = '') -> bool:
+
+    def recall_similar(self, search_terms:list, top_k:int|None = None, owner:str|None = None) -> list:
+        """
+        Recall the memories closest in meaning to the search terms, using only the vector store.
+
+        Args:
+            search_terms (list): Text to search for, or messages whose text is searched for.
+            top_k (int|None, optional): The maximum number of memories. Defaults to RECALL_LIMIT.
+            owner (str|None, optional): Only recall the memories of this agent. Defaults to every memory.
+
+        Returns:
+            list: The memories, most similar first.
+        """
+
+        results = []
+        query = ' '.join(self.get_search_text(search_term) for search_term in search_terms)
+
+        self.flush()
+
+        with self.lock:
+            visible = self.get_visible(owner)
+            similar_ids = [memory_id for memory_id, _ in
+                           self.search_vectors(query, self.RECALL_LIMIT if top_k is None else top_k, visible)]
+            results = self.fetch(similar_ids)
+
+            self.prune()
+
+        return results
+
+
+    def fetch(self, memory_ids:list) -> list:
+        """
+        Fetch recalled memories from storage in one lookup and count the use of each.
+
+        Args:
+            memory_ids (list): The memory ids, best first.
+
+        Returns:
+            list: The memory records.
+        """
+
+        return self.fetch_many([memory_ids])[0]
+
+
+    def fetch_many(self, rankings:list) -> list:
+        """
+        Fetch the memories of several recalls from storage in one lookup and count the use of each.
+
+        Args:
+            rankings (list): Lists of memory ids, best first.
+
+        Returns:
+            list: The memory records of each list.
+        """
+
+        results = []
+        memory_ids = list(dict.fromkeys(memory_id for ranking in rankings for memory_id in ranking))
+        records = dict(zip(memory_ids, self.storage.get_many(memory_ids)))
+
+        for ranking in rankings:
+            memories = []
+            for memory_id in ranking:
+                record = records.get(memory_id)
+                if record is not None:
+                    self.eviction.touch(memory_id)
+                    memories.append(record.to_dict())
+            results.append(memories)
+
+        return results
+
+
+    def search_vectors(self, query:str, top_k:int, visible:set|None = None) -> list:
+        """
+        Search the vector store with the embedding of a query.
+
+        Args:
+            query (str): The query text.
+            top_k (int): The maximum number of results.
+            visible (set|None, optional): Only match these memory ids. Defaults to every memory.
+
+        Returns:
+            list: (memory id, similarity) pairs, best first.
+        """
+
+        return self.vector_store.search(self.embedder.embed([query])[0], top_k, self.SIMILARITY_THRESHOLD, visible)
+
+
+    def get_visible(self, owner:str|None):
+        """
+        Get the memory ids an agent can recall.
+
+        Args:
+            owner (str|None): The agent name, None for every memory.
+
+        Returns:
+            set|None: The memory ids, None when every memory is visible.
+        """
+
+        if owner is None:
+            return None
+
+        return self.owner_memories.get(owner, set())
+
+
+    def fuse_rankings(self, rankings:list) -> list:
+        """
+        Merge ranked lists of memory ids with reciprocal rank fusion.
+
+        Args:
+            rankings (list): Lists of memory ids, best first.
+
+        Returns:
+            list: The memory ids, best first.
+        """
+
+        scores = {}
+        for ranking in rankings:
+            for rank, memory_id in enumerate(ranking):
+                scores[memory_id] = scores.get(memory_id, 0.0) + 1.0 / (self.RANK_FUSION_OFFSET + rank)
+
+        return sorted(scores, key=scores.__getitem__, reverse=True)
+
+
+    def forget(self, search_term:str = '', owner:str|None = None) -> bool:
         """
         Forget a message.
 
         Args:
             search_term (str, optional): The search term. Defaults to ''.
+            owner (str|None, optional): Only forget it for this agent. The memory is removed once no
+                agent owns it. Defaults to forgetting it for every agent.
 
         Returns:
             bool: True if successful, False otherwise.
@@ -83,36 +416,312 @@ class MemoryManager:
 
         data_removed = False
 
-        memories_to_remove = []
-        for memory_uri in self.graph.subjects(predicate=self.namespace.message, object=Literal(search_term)):
-            memory_id = str(memory_uri).split("/")[-1]
-            del self.usage_counter[memory_id]
-            memories_to_remove.append(memory_uri)
+        self.flush()
 
-        if len(memories_to_remove) > 0:
-            data_removed = True
+        with self.lock:
+            memory_ids = self.storage.find('message', str(search_term))
 
-        for memory_uri in memories_to_remove:
-            self.graph.remove((memory_uri, None, None))
-            self.graph.remove((None, None, memory_uri))
+            for memory_id, record in zip(memory_ids, self.storage.get_many(memory_ids)):
+                if owner is None:
+                    data_removed = True
+                elif record is not None and record.remove_owner(owner):
+                    data_removed = True
+                    self.owner_memories[owner].discard(memory_id)
+                    if record.owners:
+                        self.storage.put(memory_id, record)
+                        continue
+                else:
+                    continue
+
+                self.eviction.remove(memory_id)
+                self.remove_memory(memory_id)
 
         return data_removed
-    
+
 
     def prune(self):
         """
-        Prune the memory.
+        Prune the memory. Evicts the memories the eviction policies give up: recalled too often, too
+        old, or beyond the count and size budgets.
         """
 
-        memories_to_remove = []
+        for memory_id in self.eviction.collect():
+            self.remove_memory(memory_id)
+
+
+    def remove_memory(self, memory_id):
+        """
+        Remove a memory from the records, the indexes and the graph projection.
+
+        Args:
+            memory_id (int|str): The memory to remove.
+        """
 
-        for memory_id, usage_count in self.usage_counter.items():
-            if usage_count >= self.SEARCH_THRESHOLD:
-                memory_uri = URIRef(self.namespace + memory_id)
-                memories_to_remove.append(memory_uri)
+        record = self.storage.get_many([memory_id])[0]
+        if record is not None:
+            message_key = record.get_message_key()
+            if message_key is not None and self.message_keys.get(message_key) == memory_id:
+                del self.message_keys[message_key]
+            for owner in record.owners:
+                self.owner_memories.get(owner, set()).discard(memory_id)
 
-        for memory_uri in memories_to_remove:
+        if self.graph is not None:
+            memory_uri = self.get_memory_uri(memory_id)
             self.graph.remove((memory_uri, None, None))
             self.graph.remove((None, None, memory_uri))
-            memory_id = memory_uri.split("/")[-1]
-            del self.usage_counter[memory_id] 
\ No newline at end of file
+        self.storage.delete(memory_id)
+        self.text_index.remove(memory_id)
+        self.vector_store.remove(memory_id)
+
+
+    def index_memories(self, records:list):
+        """
+        Index several stored memories, embedding their messages in one pass.
+
+        Args:
+            records (list): (memory id, MemoryRecord) pairs.
+        """
+
+        messages = [record.message for _, record in records if record.message is not None]
+        vectors = iter(self.embedder.embed(messages)) if messages else iter(())
+
+        for memory_id, record in records:
+            self.index_memory(memory_id, record, next(vectors) if record.message is not None else None)
+
+
+    def index_memory(self, memory_id, record:MemoryRecord, vector = None):
+        """
+        Add a stored memory to the text index, the vector store and the graph projection.
+
+        Args:
+            memory_id (int|str): The memory id.
+            record (MemoryRecord): The memory record.
+            vector (np.ndarray, optional): The embedding of the message. Defaults to embedding it here.
+        """
+
+        if self.graph is not None:
+            self.project_memory(self.graph, memory_id, record)
+
+        message_key = record.get_message_key()
+        if message_key is not None:
+            self.message_keys[message_key] = memory_id
+        for owner in record.owners:
+            self.owner_memories.setdefault(owner, set()).add(memory_id)
+
+        self.eviction.add(memory_id, record.get_size())
+        self.text_index.add(memory_id, self.get_indexed_text(record))
+        if record.message is not None:
+            self.vector_store.add(memory_id, vector if vector is not None else self.embedder.embed([record.message])[0])
+
+
+    def project_memory(self, graph:Graph, memory_id, record:MemoryRecord):
+        """
+        Add the triples of a memory to a graph.
+
+        Args:
+            graph (Graph): The graph.
+            memory_id (int|str): The memory id.
+            record (MemoryRecord): The memory record.
+        """
+
+        memory_uri = self.get_memory_uri(memory_id)
+        for key, value in record.items():
+            graph.add((memory_uri, self.get_predicate(key), Literal(value)))
+
+
+    def get_graph(self) -> Graph:
+        """
+        Get the memories as a graph of triples, one per key of each memory. Built from the records
+        when the manager does not keep a graph projection.
+
+        Returns:
+            Graph: The graph.
+        """
+
+        if self.graph is not None:
+            return self.graph
+
+        graph = Graph()
+        for memory_id, record in self.storage.items():
+            self.project_memory(graph, memory_id, record)
+
+        return graph
+
+
+    def get_predicate(self, key:str) -> URIRef:
+        """
+        Get the graph predicate of a record key, built once per key.
+
+        Args:
+            key (str): The record key.
+
+        Returns:
+            URIRef: The predicate.
+        """
+
+        predicate = self.predicates.get(key)
+        if predicate is None:
+            predicate = self.predicates[key] = URIRef(str(self.namespace) + key)
+
+        return predicate
+
+
+    def load(self):
+        """
+        Index the memories already held by the storage backend. The indexes live in RAM, so the
+        eviction budgets apply to the loaded memories too, and those beyond them are evicted here.
+        """
+
+        records = list(self.storage.items())
+        self.index_memories(records)
+
+        next_id = 0
+        for memory_id, _ in records:
+            if isinstance(memory_id, int):
+                next_id = max(next_id, memory_id + 1)
+
+        self.memory_ids = itertools.count(next_id)
+        self.prune()
+
+
+    def close(self):
+        """
+        Store the queued writes, stop the writer thread, commit pending writes and release the storage backend.
+        """
+
+        # The writer is stopped and the storage released even when a queued write failed
+        try:
+            if self.write_queue is not None:
+                try:
+                    self.flush()
+                finally:
+                    self.write_queue.put(None)
+                    self.write_worker.join()
+                    self.write_queue = None
+        finally:
+            self.storage.close()
+
+
+    def get_memory_id(self, memory_uri:URIRef):
+        """
+        Get the id of a memory from its URI.
+
+        Args:
+            memory_uri (URIRef): The memory URI.
+
+        Returns:
+            int|str: The memory id.
+        """
+
+        return parse_memory_id(str(memory_uri)[len(str(self.namespace)):])
+
+
+    def get_memory_uri(self, memory_id) -> URIRef:
+        """
+        Get the URI of a memory from its id.
+
+        Args:
+            memory_id (int|str): The memory id.
+
+        Returns:
+            URIRef: The memory URI.
+        """
+
+        return URIRef(str(self.namespace) + str(memory_id))
+
+
+    def get_indexed_text(self, memory) -> str:
+        """
+        Get the text of a memory that full-text recall searches.
+
+        Args:
+            memory (dict|MemoryRecord): The memory.
+
+        Returns:
+            str: The text to index.
+        """
+
+        return ' '.join(str(memory.get(key)) for key in self.INDEXED_KEYS if memory.get(key) is not None)
+
+
+    def get_search_text(self, search_term) -> str:
+        """
+        Get the text to search for from a search term.
+
+        Args:
+            search_term (str|Mapping): Text, or a message whose text is searched for.
+
+        Returns:
+            str: The text.
+        """
+
+        if isinstance(search_term, Mapping):
+            return str(search_term.get('message') or '')
+
+        return str(search_term)
+
+
+class MemoryView:
+    """
+    An agent's view of a MemoryManager shared by the swarm. Messages the agent remembers are stored
+    once for everyone who sent or received them, and the agent recalls only its own.
+    """
+
+    def __init__(self, manager:MemoryManager, owner:str, semantic_recall:bool|None = None):
+        """
+        Constructor for MemoryView
+
+        Args:
+            manager (MemoryManager): The shared memory manager.
+            owner (str): The agent name.
+            semantic_recall (bool|None, optional): Also search by meaning. Defaults to the manager's setting.
+        """
+
+        self.manager = manager
+        self.owner = owner
+        self.semantic_recall = semantic_recall
+
+
+    def remember(self, new_memory:dict = {}):
+
+        return self.manager.remember(new_memory, owner=self.owner)
+
+
+    def remember_many(self, new_memories:list) -> list:
+
+        return self.manager.remember_many(new_memories, owner=self.owner)
+
+
+    def recall(self, search_terms:list, top_k:int|None = None, semantic:bool|None = None) -> list:
+
+        return self.manager.recall(search_terms, top_k, self.semantic_recall if semantic is None else semantic,
+                                   owner=self.owner)
+
+
+    def recall_many(self, queries:list, top_k:int|None = None, semantic:bool|None = None) -> list:
+
+        return self.manager.recall_many(queries, top_k, self.semantic_recall if semantic is None else semantic,
+                                        owner=self.owner)
+
+
+    def recall_similar(self, search_terms:list, top_k:int|None = None) -> list:
+
+        return self.manager.recall_similar(search_terms, top_k, owner=self.owner)
+
+
+    def forget(self, search_term:str = '') -> bool:
+
+        return self.manager.forget(search_term, owner=self.owner)
+
+
+    def flush(self):
+
+        self.manager.flush()
+
+
+    def close(self):
+        """
+        Nothing to release, the shared manager is closed by the swarm.
+        """
+
+        pass
@@ -0,0 +1,211 @@
+import sys
+
+class MemoryRecord:
+    """
+    A remembered message. Slotted so a record costs a handful of pointers rather than a dict, with the
+    agent names interned so every record from or to an agent shares one string. The owners are the
+    agents that can recall the record from a shared store; they are stored but are not part of the
+    message.
+    """
+
+    __slots__ = ('message', 'sender', 'recipient', 'timestamp', 'extra', 'owners')
+
+    # Record key -> slot. Keys outside this map are kept in extra.
+    FIELDS = {'message': 'message', 'from': 'sender', 'to': 'recipient', 'timestamp': 'timestamp'}
+    INTERNED_KEYS = ('from', 'to')
+    OWNERS_KEY = '_owners'
+    OWNERS_SEPARATOR = '\n'
+
+    def __init__(self, message:str|None = None, sender:str|None = None, recipient:str|None = None,
+                 timestamp:str|None = None, extra:dict|None = None, owners:tuple = ()):
+
+        self.message = message
+        self.sender = sys.intern(sender) if sender is not None else None
+        self.recipient = sys.intern(recipient) if recipient is not None else None
+        self.timestamp = timestamp
+        self.extra = extra
+        self.owners = tuple(sys.intern(owner) for owner in owners)
+
+
+    @classmethod
+    def from_dict(cls, record:dict):
+        """
+        Build a record from a dict of string values.
+
+        Args:
+            record (dict): The record.
+
+        Returns:
+            MemoryRecord: The record.
+        """
+
+        if isinstance(record, MemoryRecord):
+            return record
+
+        memory_record = cls()
+        for key, value in record.items():
+            memory_record.set(key, value)
+
+        return memory_record
+
+
+    def set(self, key:str, value:str):
+        """
+        Set a key of the record.
+
+        Args:
+            key (str): The key.
+            value (str): The value.
+        """
+
+        slot = self.FIELDS.get(key)
+        if key == self.OWNERS_KEY:
+            self.owners = tuple(sys.intern(owner) for owner in value.split(self.OWNERS_SEPARATOR) if owner)
+        elif slot is None:
+            if self.extra is None:
+                self.extra = {}
+            self.extra[sys.intern(key)] = value
+        elif key in self.INTERNED_KEYS and value is not None:
+            setattr(self, slot, sys.intern(value))
+        else:
+            setattr(self, slot, value)
+
+
+    def get(self, key:str, default = None):
+        """
+        Get a key of the record.
+
+        Args:
+            key (str): The key.
+            default (optional): Returned when the key is not set. Defaults to None.
+
+        Returns:
+            The value.
+        """
+
+        slot = self.FIELDS.get(key)
+        if slot is None:
+            return self.extra.get(key, default) if self.extra is not None else default
+
+        value = getattr(self, slot)
+        return default if value is None else value
+
+
+    def items(self) -> list:
+        """
+        Get the keys and values that are set.
+
+        Returns:
+            list: (key, value) pairs.
+        """
+
+        pairs = [(key, getattr(self, slot)) for key, slot in self.FIELDS.items() if getattr(self, slot) is not None]
+        if self.extra is not None:
+            pairs.extend(self.extra.items())
+
+        return pairs
+
+
+    def to_dict(self) -> dict:
+        """
+        Rebuild the record as a dict.
+
+        Returns:
+            dict: The record.
+        """
+
+        return dict(self.items())
+
+
+    def stored_items(self) -> list:
+        """
+        Get the keys and values a storage backend keeps, the owners included.
+
+        Returns:
+            list: (key, value) pairs.
+        """
+
+        pairs = self.items()
+        if self.owners:
+            pairs.append((self.OWNERS_KEY, self.OWNERS_SEPARATOR.join(self.owners)))
+
+        return pairs
+
+
+    def add_owner(self, owner:str) -> bool:
+        """
+        Let an agent recall the record.
+
+        Args:
+            owner (str): The agent name.
+
+        Returns:
+            bool: True if the agent was not an owner yet, False otherwise.
+        """
+
+        if owner in self.owners:
+            return False
+
+        self.owners += (sys.intern(owner),)
+
+        return True
+
+
+    def remove_owner(self, owner:str) -> bool:
+        """
+        Stop an agent from recalling the record.
+
+        Args:
+            owner (str): The agent name.
+
+        Returns:
+            bool: True if the agent was an owner, False otherwise.
+        """
+
+        if owner not in self.owners:
+            return False
+
+        self.owners = tuple(name for name in self.owners if name != owner)
+
+        return True
+
+
+    def get_message_key(self):
+        """
+        Get the key that identifies the message: who sent it, to whom, when, and what it says. A message
+        routed to several agents keeps its recipient, System for a broadcast, so it has one key.
+
+        Returns:
+            tuple|None: The key, None when the record is not a complete message.
+        """
+
+        if self.sender is None or self.timestamp is None or self.message is None:
+            return None
+
+        return (self.sender, self.recipient, self.timestamp, self.message)
+
+
+    def get_size(self) -> int:
+        """
+        Get the size of the record's text in bytes, the measure used by the eviction byte budget.
+
+        Returns:
+            int: The size in bytes.
+        """
+
+        return sum(len(value.encode('utf-8')) for _, value in self.items())
+
+
+    def __eq__(self, other) -> bool:
+
+        if isinstance(other, MemoryRecord):
+            return self.items() == other.items()
+        if isinstance(other, dict):
+            return self.to_dict() == other
+
+        return NotImplemented
+
+
+    def __repr__(self) -> str:
+
+        return f'MemoryRecord({self.to_dict()!r})'
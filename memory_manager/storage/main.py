@@ -0,0 +1,285 @@
+import sqlite3
+import threading
+from memory_manager.record.main import MemoryRecord
+
+class MemoryStorage:
+    """Keeps memory records in a dict. The default, non-durable backend for MemoryManager."""
+
+    def __init__(self):
+
+        self.records = {}
+
+
+    def put(self, memory_id:str, record:dict):
+        """
+        Store a record, replacing any record with the same id.
+
+        Args:
+            memory_id (int|str): The memory id.
+            record (dict|MemoryRecord): The record, with string values.
+        """
+
+        self.records[memory_id] = MemoryRecord.from_dict(record)
+
+
+    def put_many(self, records:list):
+        """
+        Store several records in one write.
+
+        Args:
+            records (list): (memory id, record) pairs.
+        """
+
+        for memory_id, record in records:
+            self.put(memory_id, record)
+
+
+    def get_many(self, memory_ids:list) -> list:
+        """
+        Fetch several records.
+
+        Args:
+            memory_ids (list): The memory ids.
+
+        Returns:
+            list: The MemoryRecords in the same order, None where a record does not exist.
+        """
+
+        return [self.records.get(memory_id) for memory_id in memory_ids]
+
+
+    def delete(self, memory_id:str) -> bool:
+        """
+        Delete a record.
+
+        Args:
+            memory_id (int|str): The memory id.
+
+        Returns:
+            bool: True if the record existed, False otherwise.
+        """
+
+        return self.records.pop(memory_id, None) is not None
+
+
+    def find(self, key:str, value:str) -> list:
+        """
+        Find the records with a key set to a value.
+
+        Args:
+            key (str): The key.
+            value (str): The value.
+
+        Returns:
+            list: The memory ids.
+        """
+
+        return [memory_id for memory_id, record in self.records.items() if record.get(key) == value]
+
+
+    def items(self):
+        """
+        Iterate over every stored record.
+
+        Returns:
+            iterator: (memory id, MemoryRecord) pairs.
+        """
+
+        return iter(list(self.records.items()))
+
+
+    def commit(self):
+        """
+        Make pending writes durable. Nothing to do for the in-memory backend.
+        """
+
+        pass
+
+
+    def close(self):
+        """
+        Release the backend.
+        """
+
+        pass
+
+
+class SqliteStorage(MemoryStorage):
+    """Keeps memory records in an SQLite database in WAL mode, so they survive restarts."""
+
+    def __init__(self, path:str, namespace:str, batch_size:int = 100, cache_size_kb:int = 8192):
+        """
+        Constructor for SqliteStorage
+
+        Args:
+            path (str): The database file. Several namespaces can share one file.
+            namespace (str): Separates the memories of different owners in the file, e.g. the agent name.
+            batch_size (int, optional): Writes grouped in one transaction before a commit. Defaults to 100.
+            cache_size_kb (int, optional): The page cache limit of the connection. Defaults to 8192.
+        """
+
+        if not isinstance(batch_size, int) or batch_size < 1:
+            raise Exception('batch_size must be a positive int.')
+
+        self.path = path
+        self.namespace = namespace
+        self.batch_size = batch_size
+        self.pending_writes = 0
+        self.lock = threading.Lock()
+
+        # Agents interpret on worker threads, so the connection is shared behind the lock
+        self.connection = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.connection.execute(f'PRAGMA cache_size=-{int(cache_size_kb)}')
+        self.connection.execute('''
+            CREATE TABLE IF NOT EXISTS memory_values (
+                namespace TEXT NOT NULL,
+                memory_id TEXT NOT NULL,
+                key TEXT NOT NULL,
+                value TEXT,
+                PRIMARY KEY (namespace, memory_id, key)
+            )''')
+        self.connection.execute('''
+            CREATE INDEX IF NOT EXISTS memory_values_key_value ON memory_values (namespace, key, value)''')
+        self.connection.commit()
+
+
+    @classmethod
+    def from_config(cls, config:dict, namespace:str):
+        """
+        Create a backend from the memory_storage section of the configuration.
+
+        Args:
+            config (dict): The memory_storage section.
+            namespace (str): The owner of the memories, e.g. the agent name.
+
+        Returns:
+            SqliteStorage: The backend.
+        """
+
+        settings = {}
+        for key in ['batch_size', 'cache_size_kb']:
+            if config.get(key) is not None:
+                settings[key] = config[key]
+
+        return cls(str(config.get('path') or 'memory.db'), namespace, **settings)
+
+
+    def put(self, memory_id, record):
+
+        with self.lock:
+            self.connection.execute('DELETE FROM memory_values WHERE namespace = ? AND memory_id = ?',
+                                    (self.namespace, str(memory_id)))
+            self.connection.executemany('INSERT INTO memory_values VALUES (?, ?, ?, ?)',
+                                        [(self.namespace, str(memory_id), key, value)
+                                         for key, value in MemoryRecord.from_dict(record).stored_items()])
+            self.count_write()
+
+
+    def put_many(self, records:list):
+
+        if not records:
+            return
+
+        with self.lock:
+            self.connection.executemany('DELETE FROM memory_values WHERE namespace = ? AND memory_id = ?',
+                                        [(self.namespace, str(memory_id)) for memory_id, _ in records])
+            self.connection.executemany('INSERT INTO memory_values VALUES (?, ?, ?, ?)',
+                                        [(self.namespace, str(memory_id), key, value)
+                                         for memory_id, record in records
+                                         for key, value in MemoryRecord.from_dict(record).stored_items()])
+            self.count_write(len(records))
+
+
+    def get_many(self, memory_ids:list) -> list:
+
+        records = {}
+        placeholders = ', '.join('?' * len(memory_ids))
+
+        if memory_ids:
+            with self.lock:
+                rows = self.connection.execute(
+                    f'SELECT memory_id, key, value FROM memory_values WHERE namespace = ? AND memory_id IN ({placeholders})',
+                    [self.namespace] + [str(memory_id) for memory_id in memory_ids]).fetchall()
+            for memory_id, key, value in rows:
+                records.setdefault(memory_id, MemoryRecord()).set(key, value)
+
+        return [records.get(str(memory_id)) for memory_id in memory_ids]
+
+
+    def delete(self, memory_id) -> bool:
+
+        with self.lock:
+            cursor = self.connection.execute('DELETE FROM memory_values WHERE namespace = ? AND memory_id = ?',
+                                             (self.namespace, str(memory_id)))
+            self.count_write()
+
+        return cursor.rowcount > 0
+
+
+    def find(self, key:str, value:str) -> list:
+
+        with self.lock:
+            rows = self.connection.execute(
+                'SELECT memory_id FROM memory_values WHERE namespace = ? AND key = ? AND value = ?',
+                (self.namespace, key, value)).fetchall()
+
+        return [parse_memory_id(row[0]) for row in rows]
+
+
+    def items(self):
+
+        with self.lock:
+            rows = self.connection.execute(
+                'SELECT memory_id, key, value FROM memory_values WHERE namespace = ? ORDER BY rowid',
+                (self.namespace,)).fetchall()
+
+        records = {}
+        for memory_id, key, value in rows:
+            records.setdefault(parse_memory_id(memory_id), MemoryRecord()).set(key, value)
+
+        return iter(records.items())
+
+
+    def count_write(self, count:int = 1):
+        """
+        Count writes and commit once a batch is complete. Call with the lock held.
+
+        Args:
+            count (int, optional): The records written. Defaults to 1.
+        """
+
+        self.pending_writes += count
+        if self.pending_writes >= self.batch_size:
+            self.connection.commit()
+            self.pending_writes = 0
+
+
+    def commit(self):
+
+        with self.lock:
+            self.connection.commit()
+            self.pending_writes = 0
+
+
+    def close(self):
+
+        self.commit()
+        with self.lock:
+            self.connection.close()
+
+
+def parse_memory_id(memory_id:str):
+    """
+    Read a memory id stored as text. MemoryManager numbers its memories; ids from older databases
+    are uuid strings and are kept as they are.
+
+    Args:
+        memory_id (str): The stored id.
+
+    Returns:
+        int|str: The memory id.
+    """
+
+    return int(memory_id) if memory_id.isdigit() else memory_id
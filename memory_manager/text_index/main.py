@@ -0,0 +1,149 @@
+import heapq
+import math
+import re
+from collections import Counter
+
+# How text is split into terms, shared with the extractive compressor
+TOKEN_REGEX = re.compile(r"[a-z0-9]+")
+STOP_WORDS = frozenset([
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'but', 'by', 'for', 'if', 'in', 'into', 'is', 'it',
+    'no', 'not', 'of', 'on', 'or', 'such', 'that', 'the', 'their', 'then', 'there', 'these', 'they',
+    'this', 'to', 'was', 'will', 'with', 'i', 'you', 'we', 'me', 'my', 'your', 'our'
+])
+
+class TextIndex:
+    """Inverted index over memory text, ranked with BM25."""
+
+    def __init__(self, k1:float = 1.5, b:float = 0.75):
+        """
+        Constructor for TextIndex
+
+        Args:
+            k1 (float, optional): BM25 term frequency saturation. Defaults to 1.5.
+            b (float, optional): BM25 document length normalization. Defaults to 0.75.
+        """
+
+        # Constants
+        self.TOKEN_REGEX = TOKEN_REGEX
+        self.STOP_WORDS = STOP_WORDS
+        self.K1 = k1
+        self.B = b
+
+        # Postings map a term to {document id: term frequency}
+        self.postings = {}
+        self.document_terms = {}
+        self.document_lengths = {}
+        self.total_length = 0
+
+
+    def __len__(self) -> int:
+        return len(self.document_lengths)
+
+
+    def tokenize(self, text:str) -> list:
+        """
+        Split text into lower case terms, without stop words.
+
+        Args:
+            text (str): The text.
+
+        Returns:
+            list: The terms.
+        """
+
+        return [term for term in self.TOKEN_REGEX.findall(text.lower()) if term not in self.STOP_WORDS]
+
+
+    def add(self, document_id, text:str):
+        """
+        Index a document. A document that is already indexed is replaced.
+
+        Args:
+            document_id: The id of the document.
+            text (str): The text to index.
+        """
+
+        if document_id in self.document_lengths:
+            self.remove(document_id)
+
+        terms = self.tokenize(text)
+        frequencies = Counter(terms)
+
+        for term, frequency in frequencies.items():
+            if term not in self.postings:
+                self.postings[term] = {}
+            self.postings[term][document_id] = frequency
+
+        self.document_terms[document_id] = tuple(frequencies)
+        self.document_lengths[document_id] = len(terms)
+        self.total_length += len(terms)
+
+
+    def remove(self, document_id) -> bool:
+        """
+        Remove a document from the index.
+
+        Args:
+            document_id: The id of the document.
+
+        Returns:
+            bool: True if the document was indexed, False otherwise.
+        """
+
+        if document_id not in self.document_lengths:
+            return False
+
+        for term in self.document_terms.pop(document_id):
+            postings = self.postings[term]
+            del postings[document_id]
+            if not postings:
+                del self.postings[term]
+
+        self.total_length -= self.document_lengths.pop(document_id)
+
+        return True
+
+
+    def search(self, text:str, top_k:int = 10, visible:set|None = None) -> list:
+        """
+        Find the documents that best match the text.
+
+        Terms are scored rarest first. Once the rarer terms have found at least top_k candidates, a
+        term matching more documents than there are candidates only re-scores the candidates, so very
+        common terms cost as much as the candidate set rather than their whole postings list.
+
+        Args:
+            text (str): The query.
+            top_k (int, optional): The maximum number of results. Defaults to 10.
+            visible (set|None, optional): Only match these documents. Defaults to every document.
+
+        Returns:
+            list: (document id, score) pairs, best first.
+        """
+
+        scores = {}
+        document_count = len(self.document_lengths)
+        if not document_count or top_k < 1:
+            return []
+
+        average_length = self.total_length / document_count or 1
+        query_terms = Counter(term for term in self.tokenize(text) if term in self.postings)
+
+        for term in sorted(query_terms, key=lambda term: len(self.postings[term])):
+            postings = self.postings[term]
+            frequency = len(postings)
+            idf = math.log(1 + (document_count - frequency + 0.5) / (frequency + 0.5)) * query_terms[term]
+
+            if len(scores) >= top_k and frequency > len(scores):
+                matches = [(document_id, postings[document_id]) for document_id in scores if document_id in postings]
+            else:
+                matches = postings.items()
+                if visible is not None:
+                    matches = [(document_id, term_frequency) for document_id, term_frequency in matches
+                               if document_id in visible]
+
+            for document_id, term_frequency in matches:
+                length_norm = self.K1 * (1 - self.B + self.B * self.document_lengths[document_id] / average_length)
+                scores[document_id] = scores.get(document_id, 0.0) + idf * term_frequency * (self.K1 + 1) / (term_frequency + length_norm)
+
+        return heapq.nlargest(top_k, scores.items(), key=lambda item: item[1])
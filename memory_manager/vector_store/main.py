@@ -0,0 +1,229 @@
+import re
+import zlib
+import numpy as np
+
+class HashingEmbedder:
+    """Local text embeddings from hashed words and word pairs. No model download or network call."""
+
+    def __init__(self, dimensions:int = 256):
+        """
+        Constructor for HashingEmbedder
+
+        Args:
+            dimensions (int, optional): The size of each vector. Defaults to 256.
+        """
+
+        if not isinstance(dimensions, int) or dimensions < 1:
+            raise Exception('dimensions must be a positive int.')
+
+        self.TOKEN_REGEX = re.compile(r"[a-z0-9]+")
+        self.dimensions = dimensions
+
+
+    def embed(self, texts:list) -> np.ndarray:
+        """
+        Embed several texts.
+
+        Args:
+            texts (list): The texts.
+
+        Returns:
+            np.ndarray: One unit length row per text. Texts without words give a zero row.
+        """
+
+        vectors = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+
+        for row, text in enumerate(texts):
+            words = self.TOKEN_REGEX.findall(text.lower())
+            features = words + [a + ' ' + b for a, b in zip(words, words[1:])]
+            for feature in features:
+                hashed = zlib.crc32(feature.encode('utf-8'))
+                sign = 1.0 if hashed & 0x80000000 else -1.0
+                vectors[row, hashed % self.dimensions] += sign
+
+        # Dampen repeated features, then scale to unit length so a dot product is the cosine
+        np.copysign(np.log1p(np.abs(vectors)), vectors, out=vectors)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        np.divide(vectors, norms, out=vectors, where=norms > 0)
+
+        return vectors
+
+
+class VectorStore:
+    """Unit vectors in one contiguous matrix, searched by cosine similarity."""
+
+    def __init__(self, dimensions:int = 256, chunk_size:int = 4096, approximate_threshold:int = 50000, probes:int = 16):
+        """
+        Constructor for VectorStore
+
+        Args:
+            dimensions (int, optional): The size of each vector. Defaults to 256.
+            chunk_size (int, optional): Rows added each time the matrix grows. Defaults to 4096.
+            approximate_threshold (int, optional): Stored vectors needed before searches use the
+                approximate index. 0 disables it. Defaults to 50000.
+            probes (int, optional): Clusters the approximate index searches. Defaults to 16.
+        """
+
+        if not isinstance(chunk_size, int) or chunk_size < 1:
+            raise Exception('chunk_size must be a positive int.')
+
+        self.dimensions = dimensions
+        self.chunk_size = chunk_size
+        self.approximate_threshold = approximate_threshold
+        self.probes = probes
+
+        # Rows of the matrix, the id stored in each row and which rows are in use
+        self.matrix = np.zeros((0, dimensions), dtype=np.float32)
+        self.row_ids = []
+        self.active = np.zeros(0, dtype=bool)
+        self.rows = {}
+        self.free_rows = []
+        self.size = 0
+
+        # Approximate index: cluster centroids and the cluster of each row
+        self.centroids = None
+        self.row_clusters = np.zeros(0, dtype=np.int32)
+        self.indexed_count = 0
+
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+
+    def add(self, item_id, vector:np.ndarray):
+        """
+        Store a vector. A vector already stored under the id is replaced.
+
+        Args:
+            item_id: The id of the vector.
+            vector (np.ndarray): A unit length vector.
+        """
+
+        if item_id in self.rows:
+            self.remove(item_id)
+
+        if self.free_rows:
+            row = self.free_rows.pop()
+        else:
+            if self.size == len(self.matrix):
+                self.grow()
+            row = self.size
+            self.size += 1
+            self.row_ids.append(None)
+
+        self.matrix[row] = vector
+        self.row_ids[row] = item_id
+        self.active[row] = True
+        self.rows[item_id] = row
+
+        if self.centroids is not None:
+            self.row_clusters[row] = int(np.argmax(self.centroids @ vector))
+
+        if self.approximate_threshold and len(self.rows) >= max(self.approximate_threshold, 2 * self.indexed_count):
+            self.build_index()
+
+
+    def remove(self, item_id) -> bool:
+        """
+        Remove a vector. Its row is reused by the next add.
+
+        Args:
+            item_id: The id of the vector.
+
+        Returns:
+            bool: True if the vector was stored, False otherwise.
+        """
+
+        row = self.rows.pop(item_id, None)
+        if row is None:
+            return False
+
+        self.active[row] = False
+        self.row_ids[row] = None
+        self.free_rows.append(row)
+
+        return True
+
+
+    def search(self, vector:np.ndarray, top_k:int = 10, min_score:float = 0.0, visible:set|None = None) -> list:
+        """
+        Find the stored vectors most similar to a vector.
+
+        Args:
+            vector (np.ndarray): A unit length query vector.
+            top_k (int, optional): The maximum number of results. Defaults to 10.
+            min_score (float, optional): The lowest cosine similarity returned. Defaults to 0.0.
+            visible (set|None, optional): Only match the vectors with these ids. Defaults to every vector.
+
+        Returns:
+            list: (id, score) pairs, best first.
+        """
+
+        if not self.rows or top_k < 1 or not vector.any():
+            return []
+
+        if visible is not None:
+            # Only score the rows of the visible ids, in the clusters closest to the query when indexed
+            candidates = np.fromiter((self.rows[item_id] for item_id in visible if item_id in self.rows), dtype=np.int64)
+            if self.centroids is not None and len(candidates):
+                clusters = np.argsort(self.centroids @ vector)[-self.probes:]
+                candidates = candidates[np.isin(self.row_clusters[candidates], clusters)]
+            scores = self.matrix[candidates] @ vector
+        elif self.centroids is not None:
+            # Only score the rows in the clusters closest to the query
+            clusters = np.argsort(self.centroids @ vector)[-self.probes:]
+            candidates = np.flatnonzero(np.isin(self.row_clusters[:self.size], clusters) & self.active[:self.size])
+            scores = self.matrix[candidates] @ vector
+        else:
+            # Score every row in place, without copying the matrix
+            candidates = np.arange(self.size)
+            scores = self.matrix[:self.size] @ vector
+            scores[~self.active[:self.size]] = -np.inf
+
+        if not len(candidates):
+            return []
+
+        if len(candidates) > top_k:
+            best = np.argpartition(scores, -top_k)[-top_k:]
+        else:
+            best = np.arange(len(candidates))
+        best = best[np.argsort(scores[best])[::-1]]
+
+        return [(self.row_ids[candidates[i]], float(scores[i])) for i in best if scores[i] > min_score]
+
+
+    def grow(self):
+        """
+        Add a chunk of empty rows to the matrix.
+        """
+
+        self.matrix = np.concatenate([self.matrix, np.zeros((self.chunk_size, self.dimensions), dtype=np.float32)])
+        self.active = np.concatenate([self.active, np.zeros(self.chunk_size, dtype=bool)])
+        self.row_clusters = np.concatenate([self.row_clusters, np.zeros(self.chunk_size, dtype=np.int32)])
+
+
+    def build_index(self, iterations:int = 4):
+        """
+        Cluster the stored vectors with a few rounds of spherical k-means. Searches then only score
+        the clusters nearest the query, trading a little recall for speed on large stores.
+
+        Args:
+            iterations (int, optional): The k-means rounds. Defaults to 4.
+        """
+
+        rows = np.flatnonzero(self.active[:self.size])
+        vectors = self.matrix[rows]
+        cluster_count = max(1, int(np.sqrt(len(rows))))
+
+        generator = np.random.default_rng(0)
+        centroids = vectors[generator.choice(len(rows), cluster_count, replace=False)]
+        for _ in range(iterations):
+            assignments = np.argmax(vectors @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignments, vectors)
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            centroids = np.where(norms > 0, sums / np.maximum(norms, 1e-12), centroids)
+
+        self.centroids = centroids.astype(np.float32)
+        self.row_clusters[rows] = np.argmax(vectors @ self.centroids.T, axis=1)
+        self.indexed_count = len(rows)
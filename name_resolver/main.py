@@ -0,0 +1,315 @@
+from collections import deque
+
+class NameResolver:
+    """
+    Finds the agents a message is addressed to. Agent names, their aliases and group words such as
+    everyone are compiled into one Aho-Corasick automaton, rebuilt when the agents change, so a message
+    is scanned once in linear time however many agents there are. A name only counts as a whole word.
+    Messages that name nobody can optionally go through spaCy's named entities, in one batch.
+    """
+
+    def __init__(self, case_sensitive:bool = False, fallback:str|None = None):
+        """
+        Constructor for NameResolver
+
+        Args:
+            case_sensitive (bool, optional): Whether agent names and aliases have to match their case.
+                Group words match in any case. Defaults to False.
+            fallback (str|None, optional): 'spacy' to look for names among spaCy's named entities in
+                messages that name nobody. spaCy is only loaded when it is first needed. Defaults to None.
+        """
+
+        # Constants
+        self.GROUP_EVERYONE = 'everyone'
+        self.GROUP_SUBORDINATES = 'subordinates'
+        self.GROUP_TERMS = {
+            'everyone': self.GROUP_EVERYONE,
+            'everybody': self.GROUP_EVERYONE,
+            'all agents': self.GROUP_EVERYONE,
+            'subordinates': self.GROUP_SUBORDINATES,
+            'my team': self.GROUP_SUBORDINATES,
+            'anyone': self.GROUP_SUBORDINATES,
+            'anybody': self.GROUP_SUBORDINATES
+        }
+        self.FALLBACK_SPACY = 'spacy'
+        self.SPACY_MODEL = 'en_core_web_sm'
+
+        if fallback not in [None, self.FALLBACK_SPACY]:
+            raise Exception('fallback must be spacy or None.')
+
+        # Attributes
+        self.case_sensitive = case_sensitive
+        self.fallback = fallback
+        self.supervisors = {}
+        self.aliases = {}
+        self.automaton = None
+        self.lang_processor = None
+
+
+    @classmethod
+    def from_config(cls, config:dict|None):
+        """
+        Create a resolver from the name_resolver section of the configuration.
+
+        Args:
+            config (dict|None): The name_resolver section.
+
+        Returns:
+            NameResolver: The resolver.
+        """
+
+        settings = {}
+        if isinstance(config, dict):
+            if config.get('case_sensitive') is not None:
+                settings['case_sensitive'] = config['case_sensitive'] is True
+            if config.get('fallback') not in [None, 'none']:
+                settings['fallback'] = config['fallback']
+
+        return cls(**settings)
+
+
+    def set_agents(self, profiles:list):
+        """
+        Set the agents that can be addressed. The automaton is rebuilt on the next resolve.
+
+        Args:
+            profiles (list): The agent profiles, with a name, a supervisor and optionally a list of aliases.
+        """
+
+        self.supervisors = {}
+        self.aliases = {}
+        for profile in profiles:
+            name = profile['name']
+            self.supervisors[name] = profile.get('supervisor')
+            self.aliases[name] = name
+            for alias in profile.get('aliases') or []:
+                if alias in self.aliases and self.aliases[alias] != name:
+                    raise Exception('alias ' + alias + ' is used by two agents.')
+                self.aliases[alias] = name
+
+        self.automaton = None
+
+
+    def resolve(self, text:str, sender:str|None = None) -> list:
+        """
+        Find the agents a message is addressed to.
+
+        Args:
+            text (str): The message.
+            sender (str|None, optional): The agent that sent it, never one of its own recipients. Defaults to None.
+
+        Returns:
+            list: The agent names, in the order they are first mentioned.
+        """
+
+        return self.resolve_many([(text, sender)])[0]
+
+
+    def resolve_many(self, messages:list) -> list:
+        """
+        Find the agents several messages are addressed to. The messages that name nobody go through the
+        fallback together.
+
+        Args:
+            messages (list): (text, sender) pairs.
+
+        Returns:
+            list: The agent names for each message, in the order they are first mentioned.
+        """
+
+        results = [self.expand(self.match(text), sender) for text, sender in messages]
+
+        unresolved = [position for position, names in enumerate(results) if not names]
+        if unresolved and self.fallback == self.FALLBACK_SPACY:
+            texts = [messages[position][0] for position in unresolved]
+            for position, entities in zip(unresolved, self.find_entities(texts)):
+                results[position] = self.expand(entities, messages[position][1])
+
+        return results
+
+
+    def match(self, text:str) -> list:
+        """
+        Find the names, aliases and group words in a text, at word boundaries. Where matches overlap,
+        the leftmost longest wins.
+
+        Args:
+            text (str): The text.
+
+        Returns:
+            list: The agent names and groups matched, in order.
+        """
+
+        if self.automaton is None:
+            self.automaton = self.build_automaton()
+        goto, fail, outputs = self.automaton
+
+        folded = self.fold(text)
+        matches = []
+        state = 0
+        for end, character in enumerate(folded, 1):
+            while state and character not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(character, 0)
+            for length, target, exact in outputs[state]:
+                start = end - length
+                if self.is_word(text, start, end) and (exact is None or text[start:end] == exact):
+                    matches.append((start, end, target))
+
+        # Leftmost longest, without overlaps
+        matches.sort(key=lambda match: (match[0], -match[1]))
+        targets = []
+        last_end = 0
+        for start, end, target in matches:
+            if start >= last_end:
+                targets.append(target)
+                last_end = end
+
+        return targets
+
+
+    def expand(self, targets:list, sender:str|None) -> list:
+        """
+        Turn matched names and groups into agent names, without duplicates or the sender.
+
+        Args:
+            targets (list): The agent names and groups matched.
+            sender (str|None): The agent that sent the message.
+
+        Returns:
+            list: The agent names.
+        """
+
+        names = []
+        for target in targets:
+            if target == self.GROUP_EVERYONE:
+                names.extend(self.supervisors)
+            elif target == self.GROUP_SUBORDINATES:
+                names.extend(name for name, supervisor in self.supervisors.items() if supervisor == sender)
+            else:
+                names.append(target)
+
+        return [name for name in dict.fromkeys(names) if name != sender]
+
+
+    def build_automaton(self) -> tuple:
+        """
+        Compile the names, aliases and group words into an Aho-Corasick automaton.
+
+        Returns:
+            tuple: The goto table, the failure links, and the matches ending in each state as
+                (length, agent name or group, exact text when the case has to match) triples.
+        """
+
+        patterns = [(term, group, None) for term, group in self.GROUP_TERMS.items()]
+        patterns += [(self.fold(alias), name, alias if self.case_sensitive else None) for alias, name in self.aliases.items()]
+
+        goto = [{}]
+        outputs = [[]]
+        for pattern, target, exact in patterns:
+            state = 0
+            for character in pattern:
+                if character not in goto[state]:
+                    goto.append({})
+                    outputs.append([])
+                    goto[state][character] = len(goto) - 1
+                state = goto[state][character]
+            outputs[state].append((len(pattern), target, exact))
+
+        # Breadth first, each state fails over to the longest proper suffix that is also a prefix
+        fail = [0] * len(goto)
+        pending = deque(goto[0].values())
+        while pending:
+            state = pending.popleft()
+            for character, next_state in goto[state].items():
+                pending.append(next_state)
+                fallback = fail[state]
+                while fallback and character not in goto[fallback]:
+                    fallback = fail[fallback]
+                fail[next_state] = goto[fallback].get(character, 0)
+                outputs[next_state] = outputs[next_state] + outputs[fail[next_state]]
+
+        return goto, fail, outputs
+
+
+    def find_entities(self, texts:list) -> list:
+        """
+        Find agent names among spaCy's named entities, for texts the automaton found nobody in. An
+        entity counts when it is a name or alias once spaces and punctuation are dropped, so "System
+        Agent" finds SystemAgent.
+
+        Args:
+            texts (list): The texts.
+
+        Returns:
+            list: The agent names found in each text.
+        """
+
+        if self.lang_processor is None:
+            try:
+                import spacy
+                self.lang_processor = spacy.load(self.SPACY_MODEL)
+            except (ImportError, OSError):
+                # Without spaCy or its model there is no fallback
+                self.fallback = None
+                return [[] for _ in texts]
+
+        compact_names = {self.compact(alias): name for alias, name in self.aliases.items()}
+        results = []
+        for document in self.lang_processor.pipe(texts):
+            names = [compact_names.get(self.compact(entity.text)) for entity in document.ents]
+            results.append([name for name in names if name is not None])
+
+        return results
+
+
+    def fold(self, text:str) -> str:
+        """
+        Lower the case of a text, one character for one, so positions in the folded text are
+        positions in the text.
+
+        Args:
+            text (str): The text.
+
+        Returns:
+            str: The folded text.
+        """
+
+        folded = text.lower()
+        if len(folded) != len(text):
+            folded = ''.join(character.lower() if len(character.lower()) == 1 else character for character in text)
+
+        return folded
+
+
+    def compact(self, text:str) -> str:
+        """
+        Drop everything but letters and digits from a text, and lower its case.
+
+        Args:
+            text (str): The text.
+
+        Returns:
+            str: The compact text.
+        """
+
+        return ''.join(character for character in text if character.isalnum()).lower()
+
+
+    def is_word(self, text:str, start:int, end:int) -> bool:
+        """
+        Check a span of a text is not part of a longer word.
+
+        Args:
+            text (str): The text.
+            start (int): Where the span starts.
+            end (int): Where the span ends.
+
+        Returns:
+            bool: True if the characters either side are not letters, digits or underscores.
+        """
+
+        before = start == 0 or not (text[start - 1].isalnum() or text[start - 1] == '_')
+        after = end == len(text) or not (text[end].isalnum() or text[end] == '_')
+
+        return before and after
@@ -1,10 +1,13 @@
+import asyncio
 import unittest
 import uuid
 import os
 import datetime
 import dateutil.parser
 from agent.main import Agent
+from memory_manager.main import MemoryManager, MemoryView
 from chat_api.main import ChatApi
+from chat_api.request_slots.main import RequestSlots
 from config_manager.main import ConfigManager
 
 
@@ -225,6 +228,15 @@ class TestAgent(unittest.TestCase):
         response = self.agent.send_to_api(messages)
         self.assertEqual(response, '')
 
+    def test_asend_to_api(self):
+        messages = [self.sample_messages[0], self.sample_messages[0]]
+        response = asyncio.run(self.agent.asend_to_api(messages))
+        self.assertEqual(response, '')
+
+    def test_asend_to_api_empty_message(self):
+        with self.assertRaises(Exception):
+            asyncio.run(self.agent.asend_to_api([]))
+
     def test_send_to_api_empty_message(self):
         with self.assertRaises(Exception):
             self.agent.send_to_api([])
@@ -302,6 +314,12 @@ class TestAgent(unittest.TestCase):
         response = self.agent.summarize(messages, tokens)
         self.assertEqual(response, '')
 
+    def test_asummarize(self):
+        tokens = 100
+        messages = [self.sample_messages[0], self.sample_messages[0]]
+        response = asyncio.run(self.agent.asummarize(messages, tokens))
+        self.assertEqual(response, '')
+
     def test_summarize_empty_messages(self):
         tokens = 100
         with self.assertRaises(Exception):
@@ -409,6 +427,22 @@ class TestAgent(unittest.TestCase):
         with self.assertRaises(Exception):
             self.agent.add_to_inbound_queue(new_message, new_message['from'], -1)
 
+    def test_add_to_inbound_queue_notifies_listener(self):
+        notified = []
+        self.agent.set_inbound_listener(notified.append)
+        self.agent.add_to_inbound_queue(self.sample_messages[0], self.sample_messages[0]['from'], 1)
+        self.assertEqual(notified, [self.agent.name])
+
+    def test_sign_on_notifies_listener(self):
+        notified = []
+        self.agent.set_inbound_listener(notified.append)
+        self.agent.sign_on()
+        self.assertEqual(notified, [self.agent.name])
+
+    def test_set_inbound_listener_not_callable(self):
+        with self.assertRaises(Exception):
+            self.agent.set_inbound_listener('listener')
+
     # receive
 
     def test_receive(self):
@@ -420,6 +454,36 @@ class TestAgent(unittest.TestCase):
         }
         self.assertEqual(sample_reply, self.agent.inbound_queue)
 
+    def test_receive_shared_memory_stores_once(self):
+        memory = MemoryManager(self.session_id + '-swarm')
+        recipient_config = self.config_manager.get_agents()[1]
+        sender = Agent(self.chat_api, self.agent_config, self.project, self.session_id,
+                       memory=MemoryView(memory, self.agent_config['name']))
+        recipient = Agent(self.chat_api, recipient_config, self.project, self.session_id,
+                          memory=MemoryView(memory, recipient_config['name']))
+        sender.add_to_outbound_queue('The deployment script is ready.', recipient.name)
+        recipient.receive(sender.deliver()[0])
+        self.assertEqual(len(memory.eviction), 1)
+        self.assertEqual(len(recipient.memory.recall(['deployment'])), 1)
+
+    def test_deliver_remembers_without_tokens(self):
+        self.agent.add_to_outbound_queue('The deployment script is ready.', 'Agent2')
+        self.agent.add_to_outbound_queue('', 'Agent2')
+        self.assertEqual(len(self.agent.deliver()), 2)
+        self.assertEqual(len(self.agent.memory.eviction), 1)
+        self.assertNotIn('tokens', self.agent.memory.recall(['deployment script'])[0])
+
+    def test_receive_delivered_message_shares_text(self):
+        recipient_config = self.config_manager.get_agents()[1]
+        recipient = Agent(self.chat_api, recipient_config, self.project, self.session_id)
+        self.agent.add_to_outbound_queue('The deployment script is ready.', recipient.name)
+        delivered = self.agent.deliver()[0]
+        recipient.receive(delivered)
+        received = recipient.inbound_queue[self.agent.name][0]
+        self.assertIs(received.message, delivered.message)
+        self.assertEqual(received['timestamp'], delivered['timestamp'])
+        self.assertIs(received['from'], delivered['from'])
+
     def test_receive_empty_message(self):
         with self.assertRaises(Exception):
             self.agent.receive({})
@@ -495,6 +559,9 @@ class TestAgent(unittest.TestCase):
     def test_recall_empty_list(self):
         self.assertEqual(self.agent.recall([]), {})
 
+    def test_arecall_empty_list(self):
+        self.assertEqual(asyncio.run(self.agent.arecall([])), {})
+
     # interpret
 
     def test_interpret(self):
@@ -502,3 +569,27 @@ class TestAgent(unittest.TestCase):
         self.agent.interpret()
         self.assertEqual(self.agent.inbound_queue, {})
         self.assertNotEqual(self.agent.outbound_queue, {})
+
+    def test_ainterpret(self):
+        self.agent.receive(self.sample_messages[0])
+        asyncio.run(self.agent.ainterpret())
+        self.assertEqual(self.agent.inbound_queue, {})
+        self.assertNotEqual(self.agent.outbound_queue, {})
+
+    def test_ainterpret_holds_backend_slot_per_request(self):
+        in_flight = []
+
+        class SlowChatApi(ChatApi):
+            async def asend(self, message, max_tokens:int = 200, timeout:int = 120) -> str:
+                in_flight.append(slots.in_use)
+                await asyncio.sleep(0.01)
+                return 'ok'
+
+        slots = RequestSlots(1)
+        agent = Agent(SlowChatApi(host='https://127.0.0.1', port=5000), self.agent_config, self.project,
+                      self.session_id, request_slots=slots)
+        for name in ['Agent1', 'Agent2', 'Agent3']:
+            agent.receive(dict(self.sample_messages[0], **{'from': name}))
+        asyncio.run(agent.ainterpret())
+        self.assertEqual(in_flight, [1, 1, 1])
+        self.assertEqual(len(agent.outbound_queue), 3)
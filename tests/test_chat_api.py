@@ -0,0 +1,286 @@
+import asyncio
+import threading
+import unittest
+import openai
+from chat_api.main import ChatApi
+from chat_api.token_cache.main import TokenCache
+from chat_api.request_slots.main import RequestSlots
+from chat_api.http_pool.main import HttpPool
+from chat_api.tgwui.main import TgwuiApi
+from chat_api.openai_chat.main import OpenAIApiChat
+
+
+class CountingChatApi(ChatApi):
+
+    def __init__(self, token_cache:TokenCache):
+        super().__init__(host='https://127.0.0.1', port=5000, token_cache=token_cache)
+        self.counted = []
+
+    def count_tokens(self, messages:list) -> list:
+        self.counted.append(list(messages))
+        return [len(message.split()) for message in messages]
+
+
+class FailingCountChatApi(CountingChatApi):
+
+    # The first count of every message fails, like a server that errors once
+    def count_tokens(self, messages:list) -> list:
+        counts = super().count_tokens(messages)
+        return [None if len(self.counted) == 1 else tokens for tokens in counts]
+
+
+class StubResponse:
+
+    def __init__(self, status_code:int, body):
+        self.status_code = status_code
+        self.body = body
+
+    def json(self):
+        if isinstance(self.body, Exception):
+            raise self.body
+        return self.body
+
+
+class StubPool(HttpPool):
+
+    def __init__(self, response:StubResponse):
+        super().__init__()
+        self.response = response
+
+    def get_session(self, base_url:str):
+        return self
+
+    def post(self, uri:str, json:dict, timeout:tuple) -> StubResponse:
+        self.posted = json
+        return self.response
+
+
+class RecordingChatCompletion:
+
+    requests = []
+    reply = {'choices': [{'message': {'content': 'Done.'}}]}
+
+    @classmethod
+    def create(cls, **request) -> dict:
+        cls.requests.append(request)
+        return cls.reply
+
+    @classmethod
+    async def acreate(cls, **request) -> dict:
+        cls.requests.append(request)
+        return cls.reply
+
+
+class TestChatApi(unittest.TestCase):
+
+    def setUp(self):
+
+        self.token_cache = TokenCache(max_entries=3)
+        self.chat_api = CountingChatApi(self.token_cache)
+
+    # get_message_size
+
+    def test_get_message_size(self):
+        self.assertEqual(self.chat_api.get_message_size('one two three'), 3)
+
+    def test_get_message_size_is_cached(self):
+        self.chat_api.get_message_size('one two three')
+        self.chat_api.get_message_size('one two three')
+        self.assertEqual(self.chat_api.counted, [['one two three']])
+
+    def test_stub_get_message_size(self):
+        chat_api = ChatApi(host='https://127.0.0.1', port=5000, token_cache=TokenCache())
+        self.assertEqual(chat_api.get_message_size('one two three'), 0)
+
+    # get_message_sizes
+
+    def test_get_message_sizes(self):
+        sizes = self.chat_api.get_message_sizes(['one', 'one two', 'one'])
+        self.assertEqual(sizes, [1, 2, 1])
+
+    def test_get_message_sizes_counts_duplicates_once(self):
+        self.chat_api.get_message_sizes(['one', 'one two', 'one'])
+        self.assertEqual(self.chat_api.counted, [['one', 'one two']])
+
+    def test_get_message_sizes_only_counts_missing(self):
+        self.chat_api.get_message_size('one')
+        self.chat_api.get_message_sizes(['one', 'one two'])
+        self.assertEqual(self.chat_api.counted, [['one'], ['one two']])
+
+    def test_get_message_sizes_empty_list(self):
+        self.assertEqual(self.chat_api.get_message_sizes([]), [])
+
+    def test_aget_message_sizes(self):
+        sizes = asyncio.run(self.chat_api.aget_message_sizes(['one', 'one two']))
+        self.assertEqual(sizes, [1, 2])
+
+    def test_failed_count_not_cached(self):
+        chat_api = FailingCountChatApi(self.token_cache)
+        self.assertEqual(chat_api.get_message_sizes(['one two', 'één']), [7, 5])
+        self.assertEqual(self.token_cache.get_many(chat_api.get_model_id(), ['one two']), [None])
+        self.assertEqual(chat_api.get_message_sizes(['one two', 'één']), [2, 1])
+
+    def test_afailed_count_not_cached(self):
+        chat_api = FailingCountChatApi(self.token_cache)
+        self.assertEqual(asyncio.run(chat_api.aget_message_sizes(['one two'])), [7])
+        self.assertEqual(asyncio.run(chat_api.aget_message_sizes(['one two'])), [2])
+
+    # TgwuiApi
+
+    def test_tgwui_count_message_tokens(self):
+        chat_api = TgwuiApi(http_pool=StubPool(StubResponse(200, {'results': [{'tokens': 3}]})))
+        self.assertEqual(chat_api.count_message_tokens('one two three'), 3)
+
+    def test_tgwui_count_fails_on_server_error(self):
+        chat_api = TgwuiApi(http_pool=StubPool(StubResponse(500, {})))
+        self.assertIsNone(chat_api.count_message_tokens('one two three'))
+
+    def test_tgwui_count_fails_on_malformed_body(self):
+        for body in [{'results': []}, ValueError('not json')]:
+            chat_api = TgwuiApi(http_pool=StubPool(StubResponse(200, body)))
+            self.assertIsNone(chat_api.count_message_tokens('one two three'))
+
+    def test_tgwui_send_limits_reply(self):
+        pool = StubPool(StubResponse(200, {'results': [{'text': 'Done.'}]}))
+        self.assertEqual(TgwuiApi(http_pool=pool).send('Deploy the release.', max_tokens=50), 'Done.')
+        self.assertEqual(pool.posted['max_new_tokens'], 50)
+
+    # OpenAIApiChat
+
+    def test_openai_chat_limits_reply(self):
+        chat_completion, openai.ChatCompletion = openai.ChatCompletion, RecordingChatCompletion
+        RecordingChatCompletion.requests = []
+        try:
+            chat_api = OpenAIApiChat(token_cache=TokenCache())
+            message = [{'from': 'System', 'to': 'Agent1', 'message': 'Deploy the release.', 'timestamp': ''}]
+            self.assertEqual(chat_api.send(message, max_tokens=50), 'Done.')
+            self.assertEqual(asyncio.run(chat_api.asend(message, max_tokens=60)), 'Done.')
+        finally:
+            openai.ChatCompletion = chat_completion
+        self.assertEqual([request['max_tokens'] for request in RecordingChatCompletion.requests], [50, 60])
+
+    # TokenCache
+
+    def test_token_cache_keeps_models_apart(self):
+        self.token_cache.put_many('model-a', ['one'], [1])
+        self.assertEqual(self.token_cache.get_many('model-b', ['one']), [None])
+
+    def test_token_cache_evicts_least_recently_used(self):
+        self.token_cache.put_many('model', ['a', 'b', 'c'], [1, 2, 3])
+        self.token_cache.get_many('model', ['a'])
+        self.token_cache.put_many('model', ['d'], [4])
+        self.assertEqual(self.token_cache.get_many('model', ['a', 'b', 'c', 'd']), [1, None, 3, 4])
+
+    def test_token_cache_invalid_size(self):
+        with self.assertRaises(Exception):
+            TokenCache(max_entries=0)
+
+
+class TestRequestSlots(unittest.TestCase):
+
+    def test_limits_coroutines(self):
+        slots = RequestSlots(2)
+        in_flight = []
+
+        async def request():
+            async with slots:
+                in_flight.append(slots.in_use)
+                await asyncio.sleep(0.01)
+
+        async def run():
+            await asyncio.gather(*[request() for _ in range(6)])
+
+        asyncio.run(run())
+        self.assertEqual(max(in_flight), 2)
+        self.assertEqual(slots.in_use, 0)
+
+    def test_thread_release_wakes_coroutine(self):
+        slots = RequestSlots(1)
+        slots.acquire()
+
+        async def run():
+            threading.Timer(0.01, slots.release).start()
+            await asyncio.wait_for(slots.aacquire(), timeout=1)
+
+        asyncio.run(run())
+        self.assertEqual(slots.in_use, 1)
+
+    def test_cancelled_waiter_passes_slot_on(self):
+        slots = RequestSlots(1)
+
+        async def run():
+            await slots.aacquire()
+            waiter = asyncio.ensure_future(slots.aacquire())
+            await asyncio.sleep(0)
+            waiter.cancel()
+            slots.release()
+            await asyncio.wait_for(slots.aacquire(), timeout=1)
+
+        asyncio.run(run())
+        self.assertEqual(slots.in_use, 1)
+
+    def test_invalid_limit(self):
+        with self.assertRaises(Exception):
+            RequestSlots(0)
+
+
+class TestHttpPool(unittest.TestCase):
+
+    def test_session_reused_per_host(self):
+        pool = HttpPool()
+        session = pool.get_session('http://127.0.0.1:5000')
+        self.assertIs(pool.get_session('http://127.0.0.1:5000'), session)
+        self.assertIsNot(pool.get_session('http://127.0.0.1:5001'), session)
+        pool.close()
+
+    def test_session_pool_size(self):
+        pool = HttpPool(pool_size=3)
+        adapter = pool.get_session('http://127.0.0.1:5000').get_adapter('http://127.0.0.1:5000/api')
+        self.assertEqual(adapter._pool_maxsize, 3)
+        pool.close()
+
+    def test_get_timeout(self):
+        pool = HttpPool(connect_timeout=2, read_timeout=60)
+        self.assertEqual(pool.get_timeout(), (2, 60))
+        self.assertEqual(pool.get_timeout(10), (2, 10))
+
+    def test_get_async_timeout(self):
+        timeout = HttpPool(connect_timeout=2, read_timeout=60).get_async_timeout(10)
+        self.assertEqual((timeout.sock_connect, timeout.sock_read, timeout.total), (2, 10, None))
+
+    def test_from_config(self):
+        pool = HttpPool.from_config({'pool_size': 4, 'connect_timeout': 1, 'read_timeout': None})
+        self.assertEqual((pool.pool_size, pool.connect_timeout, pool.read_timeout, pool.keep_alive), (4, 1, 120, 30))
+
+    def test_from_config_missing_section(self):
+        pool = HttpPool.from_config(None)
+        self.assertEqual((pool.pool_size, pool.connect_timeout, pool.read_timeout, pool.keep_alive), (10, 5, 120, 30))
+
+    def test_invalid_pool_size(self):
+        with self.assertRaises(Exception):
+            HttpPool.from_config({'pool_size': 0})
+
+    def test_close(self):
+        pool = HttpPool()
+        session = pool.get_session('http://127.0.0.1:5000')
+        pool.close()
+        self.assertEqual(pool.sessions, {})
+        self.assertIsNot(pool.get_session('http://127.0.0.1:5000'), session)
+        pool.close()
+
+    def test_async_session_reused_per_loop(self):
+        pool = HttpPool()
+
+        async def run():
+            session = pool.get_async_session('http://127.0.0.1:5000')
+            same = pool.get_async_session('http://127.0.0.1:5000') is session
+            await pool.aclose()
+            return session, same
+
+        first, same = asyncio.run(run())
+        self.assertTrue(same)
+        self.assertTrue(first.closed)
+        self.assertEqual(pool.async_sessions, {})
+
+        second, _ = asyncio.run(run())
+        self.assertIsNot(second, first)
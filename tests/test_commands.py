@@ -0,0 +1,56 @@
+import json
+import os
+import sys
+import tempfile
+import unittest
+from commands.main import Commands
+from commands.command import Command
+
+
+class TestCommands(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.manifest_path = os.path.join(self.temp_dir.name, 'manifest.json')
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_command_strings_from_manifest(self):
+        commands = Commands(manifest_path=self.manifest_path)
+        self.assertEqual(list(commands.command_strings), ['user'])
+        self.assertIn('ask_user(msg: str, timeout: int = 60) -> str', commands.command_strings['user'][0])
+        self.assertTrue(os.path.exists(self.manifest_path))
+
+    def test_command_imported_on_first_use(self):
+        sys.modules.pop('commands.user_input.main', None)
+        commands = Commands(manifest_path=self.manifest_path)
+        self.assertNotIn('commands.user_input.main', sys.modules)
+        command = commands.get_command('ask_user')
+        self.assertIsInstance(command, Command)
+        self.assertIs(commands.get_command('ask_user'), command)
+        self.assertEqual(command.command_string, commands.command_strings['user'][0])
+
+    def test_manifest_reused(self):
+        Commands(manifest_path=self.manifest_path)
+        commands = Commands(manifest_path=self.manifest_path)
+        commands.build_manifest = None
+        self.assertEqual(commands.load_manifest(), commands.manifest)
+
+    def test_manifest_rebuilt_when_sources_change(self):
+        commands = Commands(manifest_path=self.manifest_path)
+        sources = commands.get_sources()
+        sources['user_input/config.yaml'][0] -= 1
+        with open(self.manifest_path, 'w') as f:
+            json.dump({'version': commands.MANIFEST_VERSION, 'sources': sources, 'commands': []}, f)
+        self.assertEqual(Commands(manifest_path=self.manifest_path).command_strings, commands.command_strings)
+
+    def test_get_command_list_by_tag(self):
+        commands = Commands(manifest_path=self.manifest_path)
+        self.assertEqual(commands.get_command_list('internet'), {})
+        self.assertEqual(commands.get_command_list('user'), commands.command_strings)
+
+    def test_unknown_command(self):
+        commands = Commands(manifest_path=self.manifest_path)
+        with self.assertRaises(Exception):
+            commands.get_command('launch_rocket')
@@ -0,0 +1,102 @@
+import os
+import unittest
+import uuid
+from agent.main import Agent
+from agent.compressor.main import ExtractiveCompressor
+from agent.summary_cache.main import SummaryCache
+from chat_api.main import ChatApi
+from chat_api.token_cache.main import TokenCache
+from config_manager.main import ConfigManager
+
+
+def count_words(texts:list) -> list:
+    return [len(text.split()) for text in texts]
+
+
+class WordChatApi(ChatApi):
+
+    def __init__(self):
+        super().__init__(host='https://127.0.0.1', port=5000, token_cache=TokenCache())
+        self.sent = 0
+
+    def count_tokens(self, messages:list) -> list:
+        return count_words(messages)
+
+    def send(self, message, max_tokens:int = 200, timeout:int = 120) -> str:
+        self.sent += 1
+        return 'A summary.'
+
+
+class TestExtractiveCompressor(unittest.TestCase):
+
+    def setUp(self):
+        self.compressor = ExtractiveCompressor(count_words)
+        self.messages = [
+            {'from': 'Agent1', 'message': 'The deployment script is ready. It deploys the web server.'},
+            {'from': 'Agent2', 'message': 'Thanks! The deployment script needs the database password.'},
+            {'from': 'Agent1', 'message': 'Lunch is at noon.'},
+            {'from': 'Agent2', 'message': 'Run the deployment script after the database migration.'}
+        ]
+
+    def test_fits_budget(self):
+        summary = self.compressor.compress(self.messages, 20)
+        self.assertLessEqual(len(summary.split()), 20)
+        self.assertTrue(summary)
+
+    def test_keeps_central_sentences(self):
+        summary = self.compressor.compress(self.messages, 20)
+        self.assertIn('deployment script', summary)
+        self.assertNotIn('Lunch', summary)
+
+    def test_keeps_conversation_order(self):
+        lines = self.compressor.compress(self.messages, 1000).split('\n')
+        self.assertEqual(lines[0], 'Agent1: The deployment script is ready.')
+        self.assertEqual(len(lines), 6)
+
+    def test_empty(self):
+        self.assertEqual(self.compressor.compress([], 100), '')
+        self.assertEqual(self.compressor.compress(self.messages, 0), '')
+
+    def test_invalid_centrality_weight(self):
+        with self.assertRaises(Exception):
+            ExtractiveCompressor(count_words, centrality_weight=2)
+
+
+class TestAgentCompression(unittest.TestCase):
+
+    def setUp(self):
+        current_directory = os.path.dirname(os.path.abspath(__file__))
+        config_manager = ConfigManager(os.path.join(current_directory, 'test_config.yaml'))
+        self.profile = config_manager.get_agents()[0]
+        self.project = config_manager.get_project()
+        self.chat_api = WordChatApi()
+        self.messages = [{'from': 'Agent1', 'to': 'ChiefExecAgent', 'message': 'The deployment script is ready.',
+                          'timestamp': '2024-01-01 00:00:00', 'tokens': 5}]
+
+    def create_agent(self, **settings) -> Agent:
+        return Agent(self.chat_api, self.profile, self.project, str(uuid.uuid4()), summary_cache=SummaryCache(), **settings)
+
+    def test_llm_by_default(self):
+        self.create_agent().summarize(self.messages, 100)
+        self.assertEqual(self.chat_api.sent, 1)
+
+    def test_extractive_makes_no_api_call(self):
+        summary = self.create_agent(compression='extractive').summarize(self.messages, 100)
+        self.assertEqual(summary, 'Agent1: The deployment script is ready.')
+        self.assertEqual(self.chat_api.sent, 0)
+
+    def test_per_call_site(self):
+        agent = self.create_agent(compression={'recall': 'extractive'})
+        agent.summarize(self.messages, 100, agent.SITE_RECALL)
+        self.assertEqual(self.chat_api.sent, 0)
+        agent.summarize(self.messages, 100)
+        self.assertEqual(self.chat_api.sent, 1)
+
+    def test_profile_overrides(self):
+        self.profile = dict(self.profile, compression='extractive')
+        self.create_agent(compression='llm').summarize(self.messages, 100)
+        self.assertEqual(self.chat_api.sent, 0)
+
+    def test_invalid_compression(self):
+        with self.assertRaises(Exception):
+            self.create_agent(compression='abstractive')
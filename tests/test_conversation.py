@@ -0,0 +1,225 @@
+import asyncio
+import os
+import threading
+import unittest
+import uuid
+from agent.main import Agent
+from agent.conversation.main import ConversationState
+from agent.summary_cache.main import SummaryCache
+from chat_api.main import ChatApi
+from chat_api.request_slots.main import RequestSlots
+from chat_api.token_cache.main import TokenCache
+from config_manager.main import ConfigManager
+
+
+class WordChatApi(ChatApi):
+
+    def __init__(self):
+        super().__init__(host='https://127.0.0.1', port=5000, token_cache=TokenCache())
+        self.summary_requests = []
+        self.summary_threads = []
+        self.prompts = []
+
+    def get_context_size(self) -> int:
+        return 300
+
+    def count_tokens(self, messages:list) -> list:
+        return [len(message.split()) for message in messages]
+
+    def send(self, message, max_tokens:int = 200, timeout:int = 120) -> str:
+        if isinstance(message, str):
+            self.summary_requests.append(message)
+            self.summary_threads.append(threading.current_thread().name)
+            return 'summary of earlier messages'
+        self.prompts.append(message)
+        return 'ok'
+
+
+class AsyncWordChatApi(WordChatApi):
+
+    def __init__(self):
+        super().__init__()
+        self.blocking_counts = 0
+
+    def count_tokens(self, messages:list) -> list:
+        try:
+            asyncio.get_running_loop()
+            self.blocking_counts += 1
+        except RuntimeError:
+            pass
+        return super().count_tokens(messages)
+
+    async def acount_tokens(self, messages:list) -> list:
+        return [len(message.split()) for message in messages]
+
+    async def asend(self, message, max_tokens:int = 200, timeout:int = 120) -> str:
+        return self.send(message, max_tokens, timeout)
+
+
+class TestConversationState(unittest.TestCase):
+
+    def setUp(self):
+        self.state = ConversationState()
+        for number in range(4):
+            self.state.append({'message': f'message {number}', 'tokens': 10})
+
+    def test_first_message_is_head(self):
+        self.assertEqual(self.state.head['message'], 'message 0')
+        self.assertEqual(len(self.state.tail), 3)
+        self.assertEqual(self.state.tail_tokens, 30)
+
+    def test_get_messages(self):
+        self.state.summary = {'message': 'summary', 'tokens': 1}
+        self.assertEqual([message['message'] for message in self.state.get_messages()],
+                         ['message 0', 'summary', 'message 1', 'message 2', 'message 3'])
+
+
+class TestRollingSummaries(unittest.TestCase):
+
+    def setUp(self):
+
+        current_directory = os.path.dirname(os.path.abspath(__file__))
+        config_manager = ConfigManager(os.path.join(current_directory, 'test_config.yaml'))
+        self.chat_api = WordChatApi()
+        self.agent = Agent(self.chat_api, config_manager.get_agents()[0], config_manager.get_project(),
+                           str(uuid.uuid4()), summary_cache=SummaryCache(), summary_mode='rolling')
+
+    def send_turn(self, number:int):
+        self.agent.receive({
+            'from': 'Agent1',
+            'to': self.agent.name,
+            'message': ' '.join(f'word{number}' for _ in range(20)),
+            'timestamp': f'2024-01-01 00:00:{number:02d}',
+            'tokens': 20
+        })
+        self.agent.interpret()
+
+    def test_history_kept_between_turns(self):
+        self.send_turn(0)
+        self.send_turn(1)
+        # The head, then the reply, the second message and its reply
+        self.assertEqual([message['from'] for message in self.agent.conversations['Agent1'].tail],
+                         [self.agent.name, 'Agent1', self.agent.name])
+        self.assertEqual(self.chat_api.summary_requests, [])
+
+    def test_only_overflow_is_summarized(self):
+        for number in range(30):
+            self.send_turn(number)
+        state = self.agent.conversations['Agent1']
+        self.assertEqual(state.summary['message'], 'summary of earlier messages')
+        self.assertLessEqual(state.get_summary_tokens() + state.tail_tokens,
+                             self.chat_api.get_context_size() - self.agent.MAX_REPLY_TOKENS)
+        # Each fold only sees the summary and a turn or two of overflow, however long the conversation
+        longest = max(len(request.split()) for request in self.chat_api.summary_requests)
+        self.assertLess(longest, 60)
+
+    def test_prompt_fits_context(self):
+        for number in range(30):
+            self.send_turn(number)
+        prompt = self.chat_api.prompts[-1]
+        self.assertLessEqual(sum(message['tokens'] for message in prompt),
+                             self.chat_api.get_context_size() - self.agent.MAX_REPLY_TOKENS)
+        self.assertTrue(prompt[0]['message'].startswith('word0'))
+        self.assertEqual(prompt[1]['from'], 'Summary')
+
+    def test_memories_trimmed_to_context(self):
+        self.send_turn(0)
+        memories = [{'from': 'Agent2', 'to': self.agent.name, 'message': ' '.join(f'memory{number}' for _ in range(30)),
+                     'timestamp': '2023-01-01 00:00:00'} for number in range(10)]
+        self.agent.receive({'from': 'Agent1', 'to': self.agent.name, 'message': 'word1 ' * 20,
+                            'timestamp': '2024-01-01 00:00:01', 'tokens': 20})
+        self.agent.send_to_api(self.agent.inbound_queue['Agent1'].copy(), memories, 'Agent1')
+        prompt = self.chat_api.prompts[-1]
+        self.assertLessEqual(sum(message['tokens'] for message in prompt),
+                             self.chat_api.get_context_size() - self.agent.MAX_REPLY_TOKENS)
+        self.assertEqual(len([message for message in prompt if message['from'] == 'Agent2']), 1)
+
+    def test_recalled_memories_compressed(self):
+        agent = Agent(self.chat_api, self.agent.profile, 'project', str(uuid.uuid4()), summary_cache=SummaryCache(),
+                      summary_mode='rolling', compression={'conversation': 'llm', 'recall': 'extractive'})
+        memories = [{'from': 'Agent2', 'to': agent.name, 'message': f'The memory{number} service is deployed.',
+                     'timestamp': '2023-01-01 00:00:00'} for number in range(10)]
+        message = {'from': 'Agent1', 'to': agent.name, 'message': 'word ' * 20, 'timestamp': '2024-01-01 00:00:00',
+                   'tokens': 20}
+        agent.send_to_api([message], memories, 'Agent1')
+        prompt = self.chat_api.prompts[-1]
+        self.assertEqual([message['from'] for message in prompt], ['Agent1', 'Memory'])
+        self.assertLess(prompt[1]['tokens'], sum(len(memory['message'].split()) for memory in memories))
+
+    def test_conversation_unchanged_when_too_long(self):
+        self.send_turn(0)
+        state = self.agent.conversations['Agent1']
+        tail = list(state.tail)
+        message = {'from': 'Agent1', 'to': self.agent.name, 'message': 'word ' * 120,
+                   'timestamp': '2024-01-01 00:00:01', 'tokens': 120}
+        with self.assertRaises(Exception):
+            self.agent.send_to_api([message], [], 'Agent1')
+        self.assertEqual(state.tail, tail)
+
+    def test_invalid_summary_mode(self):
+        with self.assertRaises(Exception):
+            Agent(self.chat_api, self.agent.profile, 'project', str(uuid.uuid4()), summary_mode='partial')
+
+
+class TestAsyncRollingSummaries(unittest.TestCase):
+
+    def setUp(self):
+
+        current_directory = os.path.dirname(os.path.abspath(__file__))
+        config_manager = ConfigManager(os.path.join(current_directory, 'test_config.yaml'))
+        self.chat_api = AsyncWordChatApi()
+        self.agent = Agent(self.chat_api, config_manager.get_agents()[0], config_manager.get_project(),
+                           str(uuid.uuid4()), summary_cache=SummaryCache(), summary_mode='rolling',
+                           compression={'conversation': 'extractive', 'recall': 'extractive'})
+
+    def test_no_blocking_token_counts(self):
+        for number in range(30):
+            self.agent.receive({
+                'from': 'Agent1',
+                'to': self.agent.name,
+                'message': ' '.join(f'word{number}.' for _ in range(20)),
+                'timestamp': f'2024-01-01 00:00:{number:02d}',
+                'tokens': 20
+            })
+            asyncio.run(self.agent.ainterpret())
+        self.assertIsNotNone(self.agent.conversations['Agent1'].summary)
+        self.assertEqual(self.chat_api.blocking_counts, 0)
+
+
+class TestSpeculativeSummaries(TestRollingSummaries):
+
+    def setUp(self):
+
+        super().setUp()
+        self.agent.speculative_summary_threshold = 0.5
+
+    def test_summaries_made_in_background(self):
+        for number in range(30):
+            self.send_turn(number)
+        self.agent.wait_for_summary('Agent1')
+        self.assertTrue(self.chat_api.summary_threads)
+        self.assertTrue(all(name.startswith('summarizer') for name in self.chat_api.summary_threads))
+
+    def test_background_summaries_hold_backend_slot(self):
+        slots = RequestSlots(1)
+        self.agent.request_slots = slots
+        in_use = []
+        send = self.chat_api.send
+
+        def send_in_slot(message, max_tokens:int = 200, timeout:int = 120) -> str:
+            in_use.append(slots.in_use)
+            return send(message, max_tokens, timeout)
+
+        self.chat_api.send = send_in_slot
+        for number in range(30):
+            self.send_turn(number)
+        self.agent.close()
+        self.assertTrue(all(name.startswith('summarizer') for name in self.chat_api.summary_threads))
+        self.assertEqual(set(in_use), {1})
+        self.assertEqual(slots.in_use, 0)
+        self.assertIsNone(self.agent.summary_pool)
+
+    def test_invalid_threshold(self):
+        with self.assertRaises(Exception):
+            Agent(self.chat_api, self.agent.profile, 'project', str(uuid.uuid4()), summary_mode='rolling',
+                  speculative_summary_threshold=1.5)
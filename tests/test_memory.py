@@ -0,0 +1,489 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+import uuid
+import datetime
+from memory_manager.main import MemoryManager, MemoryView
+from memory_manager.vector_store.main import HashingEmbedder, VectorStore
+from memory_manager.storage.main import SqliteStorage
+from memory_manager.eviction.main import EvictionTracker
+from memory_manager.record.main import MemoryRecord
+from agent.message.main import Message
+
+
+class TestMemoryManager(unittest.TestCase):
+
+    def setUp(self):
+
+        self.memory = MemoryManager(str(uuid.uuid4()) + '-Agent1')
+        self.timestamp = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        self.sample_memories = [
+            {
+                'from': 'Agent1',
+                'to': 'Agent2',
+                'message': 'The database schema needs a users table.',
+                'timestamp': self.timestamp
+            },
+            {
+                'from': 'Agent2',
+                'to': 'Agent1',
+                'message': 'I will write the deployment script tonight.',
+                'timestamp': self.timestamp
+            },
+            {
+                'from': 'Agent2',
+                'to': 'Agent1',
+                'message': 'The users table now has an email column.',
+                'timestamp': self.timestamp
+            },
+        ]
+        for memory in self.sample_memories:
+            self.memory.remember(memory)
+
+    # remember
+
+    def test_remember(self):
+        memory_uri = self.memory.remember(self.sample_memories[0])
+        self.assertIsInstance(memory_uri, str)
+
+    def test_remember_numbers_memories(self):
+        memory_uri = self.memory.remember(dict(self.sample_memories[0], message='The schema is deployed.'))
+        self.assertEqual(self.memory.get_memory_id(memory_uri), len(self.sample_memories))
+
+    def test_remember_same_message_once(self):
+        memory_uri = self.memory.remember(self.sample_memories[0])
+        self.assertEqual(self.memory.get_memory_id(memory_uri), 0)
+        self.assertEqual(len(self.memory.eviction), len(self.sample_memories))
+
+    def test_remember_many(self):
+        new_memories = [dict(self.sample_memories[0], message='The schema is deployed.'),
+                        dict(self.sample_memories[0], message='The release is tagged.')]
+        memory_uris = self.memory.remember_many(new_memories)
+        self.assertEqual([self.memory.get_memory_id(memory_uri) for memory_uri in memory_uris], [3, 4])
+        self.assertEqual(self.memory.recall(['release tagged'])[0], new_memories[1])
+
+    def test_remember_many_same_message_once(self):
+        new_memory = dict(self.sample_memories[0], message='The schema is deployed.')
+        memory_uris = self.memory.remember_many([new_memory, dict(new_memory)])
+        self.assertEqual(memory_uris[0], memory_uris[1])
+
+    def test_same_reply_to_two_peers(self):
+        new_memory = dict(self.sample_memories[0], message='The schema is deployed.')
+        memory_uris = self.memory.remember_many([new_memory, dict(new_memory, to='Agent3')])
+        self.assertNotEqual(memory_uris[0], memory_uris[1])
+        self.assertEqual(self.memory.recall(['schema deployed'], top_k=2),
+                         [new_memory, dict(new_memory, to='Agent3')])
+
+    # graph
+
+    def test_graph_projection(self):
+        memory = MemoryManager('session1-Agent1', graph_projection=True)
+        memory_uri = memory.remember(self.sample_memories[0])
+        self.assertEqual(len(memory.graph), 4)
+        self.assertTrue(memory.forget(self.sample_memories[0]['message']))
+        self.assertEqual(len(memory.graph), 0)
+        self.assertIsNotNone(memory_uri)
+
+    def test_graph_built_on_demand(self):
+        self.assertIsNone(self.memory.graph)
+        self.assertEqual(len(self.memory.get_graph()), 4 * len(self.sample_memories))
+
+    # recall
+
+    def test_recall(self):
+        results = self.memory.recall(['deployment script'])
+        self.assertEqual(results, [self.sample_memories[1]])
+
+    def test_recall_ranks_best_match_first(self):
+        results = self.memory.recall(['users table email'])
+        self.assertEqual(results[0], self.sample_memories[2])
+        self.assertEqual(results[1], self.sample_memories[0])
+
+    def test_recall_many(self):
+        results = self.memory.recall_many([['deployment script'], ['users table email']])
+        self.assertEqual(results[0], [self.sample_memories[1]])
+        self.assertEqual(results[1][0], self.sample_memories[2])
+
+    def test_recall_many_empty(self):
+        self.assertEqual(self.memory.recall_many([]), [])
+
+    def test_recall_message_term(self):
+        results = self.memory.recall([{'from': 'Agent3', 'message': 'Where is the deployment script?'}])
+        self.assertEqual(results, [self.sample_memories[1]])
+
+    def test_recall_many_message_terms(self):
+        results = self.memory.recall_many([[Message('Where is the deployment script?', 'Agent3', 'Agent1', self.timestamp)],
+                                           [Message('Does it have an email column?', 'Agent1', 'Agent2', self.timestamp)]])
+        self.assertEqual(results, [[self.sample_memories[1]], [self.sample_memories[2]]])
+
+    def test_recall_is_case_insensitive(self):
+        results = self.memory.recall(['DEPLOYMENT'])
+        self.assertEqual(results, [self.sample_memories[1]])
+
+    def test_recall_top_k(self):
+        results = self.memory.recall(['users table'], top_k=1)
+        self.assertEqual(len(results), 1)
+
+    def test_recall_no_match(self):
+        self.assertEqual(self.memory.recall(['kubernetes']), [])
+
+    def test_recall_empty_terms(self):
+        self.assertEqual(self.memory.recall([]), [])
+
+    def test_recall_returns_copies(self):
+        self.memory.recall(['deployment'])[0]['message'] = 'changed'
+        self.assertEqual(self.memory.recall(['deployment']), [self.sample_memories[1]])
+
+    def test_recall_without_semantic_search(self):
+        results = self.memory.recall(['deployment script'], semantic=False)
+        self.assertEqual(results, [self.sample_memories[1]])
+
+    # recall_similar
+
+    def test_recall_similar(self):
+        results = self.memory.recall_similar(['script for the deployment'], top_k=1)
+        self.assertEqual(results, [self.sample_memories[1]])
+
+    def test_recall_similar_no_match(self):
+        self.assertEqual(self.memory.recall_similar(['kubernetes']), [])
+
+    # forget
+
+    def test_forget(self):
+        self.assertTrue(self.memory.forget(self.sample_memories[1]['message']))
+        self.assertEqual(self.memory.recall(['deployment']), [])
+
+    def test_forget_unknown_message(self):
+        self.assertFalse(self.memory.forget('Nobody said this.'))
+
+    # prune
+
+    def test_prune_after_search_threshold(self):
+        for _ in range(self.memory.SEARCH_THRESHOLD):
+            self.memory.recall(['deployment'])
+        self.assertEqual(self.memory.recall(['deployment']), [])
+
+    def test_prune_max_count(self):
+        memory = MemoryManager('session1-Agent1', eviction=EvictionTracker(max_count=2))
+        for sample_memory in self.sample_memories:
+            memory.remember(sample_memory)
+        self.assertEqual(len(memory.eviction), 2)
+        self.assertEqual(memory.recall(['schema']), [])
+
+
+class TestWriteBehind(unittest.TestCase):
+
+    def setUp(self):
+        self.memory = MemoryManager('session1-Agent1', write_behind=True, write_queue_size=10)
+        self.sample_memory = {
+            'from': 'Agent1',
+            'to': 'Agent2',
+            'message': 'The deployment script is ready.',
+            'timestamp': '2024-01-01 00:00:00'
+        }
+
+    def tearDown(self):
+        self.memory.close()
+
+    def test_recall_sees_queued_writes(self):
+        for number in range(50):
+            self.memory.remember(dict(self.sample_memory, message=f'Deployment step {number} is done.'))
+        self.assertEqual(len(self.memory.recall(['deployment'], top_k=100)), 50)
+
+    def test_remember_copies_message(self):
+        new_memory = dict(self.sample_memory)
+        self.memory.remember(new_memory)
+        new_memory['message'] = 'Changed after remembering.'
+        self.assertEqual(self.memory.recall(['deployment']), [self.sample_memory])
+
+    def test_same_message_stored_once(self):
+        self.memory.remember(self.sample_memory)
+        self.memory.remember(self.sample_memory)
+        self.memory.flush()
+        self.assertEqual(len(self.memory.eviction), 1)
+
+    def test_close_stores_queued_writes(self):
+        directory = tempfile.TemporaryDirectory()
+        path = os.path.join(directory.name, 'memory.db')
+        memory = MemoryManager('session1-Agent1', storage=SqliteStorage(path, 'Agent1'), write_behind=True)
+        memory.remember(self.sample_memory)
+        memory.close()
+        self.assertFalse(memory.write_worker.is_alive())
+        memory = MemoryManager('session2-Agent1', storage=SqliteStorage(path, 'Agent1'))
+        self.assertEqual(memory.recall(['deployment']), [self.sample_memory])
+        memory.close()
+        directory.cleanup()
+
+    def test_close_releases_storage_after_write_error(self):
+        directory = tempfile.TemporaryDirectory()
+        path = os.path.join(directory.name, 'memory.db')
+        memory = MemoryManager('session1-Agent1', storage=SqliteStorage(path, 'Agent1'), write_behind=True)
+        memory.remember(self.sample_memory)
+        memory.write_error = Exception('disk full')
+        with self.assertRaises(Exception):
+            memory.close()
+        self.assertFalse(memory.write_worker.is_alive())
+        with self.assertRaises(sqlite3.ProgrammingError):
+            memory.storage.connection.execute('SELECT 1')
+        directory.cleanup()
+
+    def test_invalid_queue_size(self):
+        with self.assertRaises(Exception):
+            MemoryManager('session1-Agent1', write_behind=True, write_queue_size=0)
+
+
+class TestMemoryView(unittest.TestCase):
+
+    def setUp(self):
+        self.memory = MemoryManager('session1-swarm')
+        self.sender = MemoryView(self.memory, 'Agent1')
+        self.recipient = MemoryView(self.memory, 'Agent2')
+        self.bystander = MemoryView(self.memory, 'Agent3')
+        self.sample_memory = {
+            'from': 'Agent1',
+            'to': 'Agent2',
+            'message': 'The deployment script is ready.',
+            'timestamp': '2024-01-01 00:00:00'
+        }
+
+    def test_message_stored_once(self):
+        sent_uri = self.sender.remember(self.sample_memory)
+        received_uri = self.recipient.remember(self.sample_memory)
+        self.assertEqual(sent_uri, received_uri)
+        self.assertEqual(len(self.memory.eviction), 1)
+
+    def test_recall_only_own_memories(self):
+        self.sender.remember(self.sample_memory)
+        self.recipient.remember(self.sample_memory)
+        self.assertEqual(self.sender.recall(['deployment']), [self.sample_memory])
+        self.assertEqual(self.recipient.recall(['deployment']), [self.sample_memory])
+        self.assertEqual(self.bystander.recall(['deployment']), [])
+        self.assertEqual(self.bystander.recall_similar(['deployment script']), [])
+
+    def test_forget_for_one_agent(self):
+        self.sender.remember(self.sample_memory)
+        self.recipient.remember(self.sample_memory)
+        self.assertTrue(self.sender.forget(self.sample_memory['message']))
+        self.assertEqual(self.sender.recall(['deployment']), [])
+        self.assertEqual(self.recipient.recall(['deployment']), [self.sample_memory])
+        self.assertTrue(self.recipient.forget(self.sample_memory['message']))
+        self.assertEqual(len(self.memory.eviction), 0)
+        self.assertEqual(self.memory.message_keys, {})
+
+
+class TestVectorStore(unittest.TestCase):
+
+    def setUp(self):
+
+        self.embedder = HashingEmbedder(dimensions=64)
+        self.texts = ['alpha beta gamma', 'delta epsilon', 'gamma delta zeta', 'eta theta iota']
+        self.vectors = self.embedder.embed(self.texts)
+        self.store = VectorStore(dimensions=64, chunk_size=2, approximate_threshold=0)
+        for item_id, vector in enumerate(self.vectors):
+            self.store.add(item_id, vector)
+
+    def test_embed_unit_length(self):
+        norms = (self.vectors ** 2).sum(axis=1)
+        for norm in norms:
+            self.assertAlmostEqual(float(norm), 1.0, places=5)
+
+    def test_search(self):
+        results = self.store.search(self.vectors[1], top_k=1)
+        self.assertEqual(results[0][0], 1)
+        self.assertAlmostEqual(results[0][1], 1.0, places=5)
+
+    def test_search_top_k(self):
+        self.assertEqual(len(self.store.search(self.vectors[0], top_k=2)), 2)
+
+    def test_remove(self):
+        self.assertTrue(self.store.remove(1))
+        self.assertNotIn(1, [item_id for item_id, _ in self.store.search(self.vectors[1], top_k=4)])
+
+    def test_remove_reuses_row(self):
+        self.store.remove(1)
+        self.store.add('new', self.vectors[1])
+        self.assertEqual(self.store.size, 4)
+        self.assertEqual(self.store.search(self.vectors[1], top_k=1)[0][0], 'new')
+
+    def test_approximate_index(self):
+        store = VectorStore(dimensions=64, approximate_threshold=2, probes=4)
+        for item_id, vector in enumerate(self.vectors):
+            store.add(item_id, vector)
+        self.assertIsNotNone(store.centroids)
+        self.assertEqual(store.search(self.vectors[3], top_k=1)[0][0], 3)
+
+
+class TestSqliteStorage(unittest.TestCase):
+
+    def setUp(self):
+
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'memory.db')
+        self.sample_memory = {
+            'from': 'Agent1',
+            'to': 'Agent2',
+            'message': 'The deployment script is ready.',
+            'timestamp': datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        }
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_memories_survive_restart(self):
+        memory = MemoryManager('session1-Agent1', storage=SqliteStorage(self.path, 'Agent1'))
+        memory.remember(self.sample_memory)
+        memory.close()
+        memory = MemoryManager('session2-Agent1', storage=SqliteStorage(self.path, 'Agent1'))
+        self.assertEqual(memory.recall(['deployment']), [self.sample_memory])
+        memory.close()
+
+    def test_namespaces_are_separate(self):
+        memory = MemoryManager('session1-Agent1', storage=SqliteStorage(self.path, 'Agent1'))
+        memory.remember(self.sample_memory)
+        other = MemoryManager('session1-Agent2', storage=SqliteStorage(self.path, 'Agent2'))
+        self.assertEqual(other.recall(['deployment']), [])
+        memory.close()
+        other.close()
+
+    def test_forget(self):
+        memory = MemoryManager('session1-Agent1', storage=SqliteStorage(self.path, 'Agent1'))
+        memory.remember(self.sample_memory)
+        self.assertTrue(memory.forget(self.sample_memory['message']))
+        memory.close()
+        memory = MemoryManager('session2-Agent1', storage=SqliteStorage(self.path, 'Agent1'))
+        self.assertEqual(memory.recall(['deployment']), [])
+        memory.close()
+
+    def test_ids_continue_after_restart(self):
+        memory = MemoryManager('session1-Agent1', storage=SqliteStorage(self.path, 'Agent1'))
+        first_id = memory.get_memory_id(memory.remember(self.sample_memory))
+        memory.close()
+        memory = MemoryManager('session2-Agent1', storage=SqliteStorage(self.path, 'Agent1'))
+        second_memory = dict(self.sample_memory, message='The release is tagged.')
+        self.assertEqual(memory.get_memory_id(memory.remember(second_memory)), first_id + 1)
+        memory.close()
+
+    def test_owners_survive_restart(self):
+        memory = MemoryManager('session1-swarm', storage=SqliteStorage(self.path, 'swarm'))
+        MemoryView(memory, 'Agent1').remember(self.sample_memory)
+        MemoryView(memory, 'Agent2').remember(self.sample_memory)
+        memory.close()
+        memory = MemoryManager('session2-swarm', storage=SqliteStorage(self.path, 'swarm'))
+        self.assertEqual(MemoryView(memory, 'Agent2').recall(['deployment']), [self.sample_memory])
+        self.assertEqual(MemoryView(memory, 'Agent3').recall(['deployment']), [])
+        memory.close()
+
+    def test_load_keeps_eviction_budget(self):
+        memory = MemoryManager('session1-Agent1', storage=SqliteStorage(self.path, 'Agent1'))
+        memory.remember_many([dict(self.sample_memory, message=f'Deployment step {number} is done.')
+                              for number in range(5)])
+        memory.close()
+        memory = MemoryManager('session2-Agent1', storage=SqliteStorage(self.path, 'Agent1'),
+                               eviction=EvictionTracker(max_count=2))
+        self.assertEqual(len(memory.eviction), 2)
+        self.assertEqual(len(memory.recall(['deployment'], top_k=10)), 2)
+        memory.close()
+
+    def test_put_many_one_batch(self):
+        storage = SqliteStorage(self.path, 'Agent1', batch_size=3)
+        storage.put_many([(1, {'message': 'one'}), (2, {'message': 'two'})])
+        self.assertEqual(storage.pending_writes, 2)
+        self.assertEqual([record.get('message') for record in storage.get_many([1, 2])], ['one', 'two'])
+        storage.close()
+
+    def test_batched_commits(self):
+        storage = SqliteStorage(self.path, 'Agent1', batch_size=2)
+        storage.put('1', {'message': 'one'})
+        self.assertEqual(storage.pending_writes, 1)
+        storage.put('2', {'message': 'two'})
+        self.assertEqual(storage.pending_writes, 0)
+        storage.close()
+
+    def test_invalid_batch_size(self):
+        with self.assertRaises(Exception):
+            SqliteStorage(self.path, 'Agent1', batch_size=0)
+
+
+class TestMemoryRecord(unittest.TestCase):
+
+    def setUp(self):
+        self.sample_memory = {
+            'from': 'Agent1',
+            'to': 'Agent2',
+            'message': 'The deployment script is ready.',
+            'timestamp': '2024-01-01 00:00:00'
+        }
+
+    def test_round_trip(self):
+        self.assertEqual(MemoryRecord.from_dict(self.sample_memory).to_dict(), self.sample_memory)
+
+    def test_extra_keys(self):
+        record = MemoryRecord.from_dict(dict(self.sample_memory, channel='ops'))
+        self.assertEqual(record.get('channel'), 'ops')
+        self.assertEqual(record.to_dict()['channel'], 'ops')
+
+    def test_names_are_interned(self):
+        first = MemoryRecord.from_dict(self.sample_memory)
+        second = MemoryRecord.from_dict({'from': ''.join(['Agent', '1'])})
+        self.assertIs(first.sender, second.sender)
+
+    def test_slotted(self):
+        with self.assertRaises(AttributeError):
+            MemoryRecord().tokens = 1
+
+
+class TestEvictionTracker(unittest.TestCase):
+
+    def test_usage_threshold(self):
+        tracker = EvictionTracker(usage_threshold=2)
+        tracker.add('a')
+        tracker.touch('a')
+        self.assertEqual(tracker.collect(), [])
+        tracker.touch('a')
+        self.assertEqual(tracker.collect(), ['a'])
+        self.assertNotIn('a', tracker)
+
+    def test_max_count_least_frequently_used(self):
+        tracker = EvictionTracker(usage_threshold=None, max_count=2)
+        tracker.add('a')
+        tracker.add('b')
+        tracker.touch('a')
+        tracker.add('c')
+        self.assertEqual(tracker.collect(), ['b'])
+
+    def test_max_count_least_recently_used(self):
+        tracker = EvictionTracker(usage_threshold=None, max_count=2, policy='lru')
+        tracker.add('a')
+        tracker.add('b')
+        tracker.touch('a')
+        tracker.touch('b')
+        tracker.touch('b')
+        tracker.touch('a')
+        tracker.add('c')
+        self.assertEqual(tracker.collect(), ['b'])
+
+    def test_max_bytes(self):
+        tracker = EvictionTracker(usage_threshold=None, max_bytes=10)
+        tracker.add('a', 6)
+        tracker.add('b', 6)
+        self.assertEqual(tracker.collect(), ['a'])
+        self.assertEqual(tracker.total_bytes, 6)
+
+    def test_ttl(self):
+        tracker = EvictionTracker(usage_threshold=None, ttl=10)
+        tracker.add('a', now=0)
+        tracker.add('b', now=5)
+        self.assertEqual(tracker.collect(now=12), ['a'])
+        self.assertEqual(tracker.collect(now=16), ['b'])
+
+    def test_remove(self):
+        tracker = EvictionTracker(usage_threshold=None, max_count=1)
+        tracker.add('a')
+        self.assertTrue(tracker.remove('a'))
+        tracker.add('b')
+        self.assertEqual(tracker.collect(), [])
+
+    def test_invalid_policy(self):
+        with self.assertRaises(Exception):
+            EvictionTracker(policy='random')
@@ -0,0 +1,98 @@
+import pickle
+import unittest
+from agent.message.main import Message, MessageList, Envelope
+
+
+class TestMessage(unittest.TestCase):
+
+    def setUp(self):
+        self.sample_message = {
+            'from': 'Agent1',
+            'to': 'ChiefExecAgent',
+            'message': 'Message 1',
+            'timestamp': '2024-01-01 00:00:00',
+            'tokens': 3
+        }
+
+    def test_message_reads_like_a_dict(self):
+        message = Message.from_dict(self.sample_message)
+        self.assertEqual(message, self.sample_message)
+        self.assertEqual(self.sample_message, message)
+        self.assertEqual((message['from'], message.get('tokens')), ('Agent1', 3))
+        self.assertEqual(message.to_dict(), self.sample_message)
+
+    def test_from_dict_keeps_message(self):
+        message = Message.from_dict(self.sample_message)
+        self.assertIs(Message.from_dict(message), message)
+
+    def test_message_is_immutable(self):
+        message = Message.from_dict(self.sample_message)
+        with self.assertRaises(AttributeError):
+            message.tokens = 4
+        with self.assertRaises(TypeError):
+            message['tokens'] = 4
+
+    def test_names_are_interned(self):
+        first = Message('One', ''.join(['Agent', '1']))
+        second = Message('Two', ''.join(['Agent', '1']))
+        self.assertIs(first.sender, second.sender)
+
+    def test_replace(self):
+        message = Message.from_dict(self.sample_message)
+        self.assertIs(message.replace(tokens=3), message)
+        measured = message.replace(tokens=5)
+        self.assertEqual((measured['tokens'], measured['message'], message['tokens']), (5, 'Message 1', 3))
+
+    def test_pickle(self):
+        message = Message.from_dict(self.sample_message)
+        self.assertEqual(pickle.loads(pickle.dumps(message)), message)
+
+    def test_empty_value(self):
+        self.sample_message['to'] = ''
+        with self.assertRaises(Exception):
+            Message.from_dict(self.sample_message)
+
+    def test_none_value(self):
+        self.sample_message['message'] = None
+        with self.assertRaises(Exception):
+            Message.from_dict(self.sample_message)
+
+    def test_negative_tokens(self):
+        self.sample_message['tokens'] = -1
+        with self.assertRaises(Exception):
+            Message.from_dict(self.sample_message)
+
+    def test_unknown_field(self):
+        self.sample_message['priority'] = 'high'
+        with self.assertRaises(Exception):
+            Message.from_dict(self.sample_message)
+
+    def test_from_dict_not_a_dict(self):
+        with self.assertRaises(Exception):
+            Message.from_dict('Message 1')
+
+
+class TestMessageList(unittest.TestCase):
+
+    def test_running_total(self):
+        messages = MessageList()
+        messages.append(Message('One', 'Agent1', tokens=3))
+        messages.append(Message('Two', 'Agent1', tokens=4))
+        self.assertEqual(messages.tokens, 7)
+        self.assertEqual(MessageList(list(messages)).tokens, 7)
+
+    def test_copy_keeps_total(self):
+        messages = MessageList([Message('One', 'Agent1', tokens=3)])
+        copy = messages.copy()
+        copy.append(Message('Two', 'Agent1', tokens=4))
+        self.assertEqual((messages.tokens, copy.tokens), (3, 7))
+        self.assertIsInstance(copy, MessageList)
+
+
+class TestEnvelope(unittest.TestCase):
+
+    def test_broadcast_shares_message(self):
+        message = Message('Everyone please help', 'Agent1', 'System')
+        envelopes = [Envelope(message, name) for name in ['Agent2', 'Agent3']]
+        self.assertEqual([envelope.to for envelope in envelopes], ['Agent2', 'Agent3'])
+        self.assertIs(envelopes[0].message, envelopes[1].message)
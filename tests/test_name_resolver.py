@@ -0,0 +1,85 @@
+import sys
+import types
+import unittest
+from name_resolver.main import NameResolver
+
+
+class TestNameResolver(unittest.TestCase):
+
+    def setUp(self):
+        self.profiles = [
+            {'name': 'ChiefExecAgent', 'supervisor': 'System'},
+            {'name': 'SystemAgent', 'supervisor': 'ChiefExecAgent', 'aliases': ['the system agent']},
+            {'name': 'WriterAgent', 'supervisor': 'ChiefExecAgent'},
+            {'name': 'Agent', 'supervisor': 'SystemAgent'}
+        ]
+        self.resolver = NameResolver()
+        self.resolver.set_agents(self.profiles)
+
+    def test_resolve_names_in_order(self):
+        names = self.resolver.resolve('WriterAgent and SystemAgent, please help.', 'ChiefExecAgent')
+        self.assertEqual(names, ['WriterAgent', 'SystemAgent'])
+
+    def test_resolve_skips_sender_and_duplicates(self):
+        names = self.resolver.resolve('SystemAgent, ChiefExecAgent and SystemAgent again.', 'ChiefExecAgent')
+        self.assertEqual(names, ['SystemAgent'])
+
+    def test_whole_words_only(self):
+        self.assertEqual(self.resolver.resolve('SystemAgents and AgentX are busy.', 'WriterAgent'), [])
+        self.assertEqual(self.resolver.resolve("Ask SystemAgent's team.", 'WriterAgent'), ['SystemAgent'])
+
+    def test_case_rules(self):
+        self.assertEqual(self.resolver.resolve('systemagent, help', 'WriterAgent'), ['SystemAgent'])
+        resolver = NameResolver(case_sensitive=True)
+        resolver.set_agents(self.profiles)
+        self.assertEqual(resolver.resolve('systemagent, help', 'WriterAgent'), [])
+        self.assertEqual(resolver.resolve('Everyone, help', 'WriterAgent'), ['ChiefExecAgent', 'SystemAgent', 'Agent'])
+
+    def test_alias(self):
+        self.assertEqual(self.resolver.resolve('Ask the system agent.', 'WriterAgent'), ['SystemAgent'])
+
+    def test_groups(self):
+        self.assertEqual(self.resolver.resolve('Everyone, stop.', 'SystemAgent'), ['ChiefExecAgent', 'WriterAgent', 'Agent'])
+        self.assertEqual(self.resolver.resolve('Subordinates, report.', 'ChiefExecAgent'), ['SystemAgent', 'WriterAgent'])
+
+    def test_set_agents_rebuilds(self):
+        self.resolver.set_agents(self.profiles + [{'name': 'TesterAgent', 'supervisor': 'ChiefExecAgent'}])
+        self.assertEqual(self.resolver.resolve('TesterAgent, run it.', 'Agent'), ['TesterAgent'])
+
+    def test_alias_used_twice(self):
+        self.profiles[2]['aliases'] = ['the system agent']
+        with self.assertRaises(Exception):
+            self.resolver.set_agents(self.profiles)
+
+    def test_spacy_fallback_batched(self):
+        batches = []
+
+        class Processor:
+            def pipe(self, texts):
+                batches.append(list(texts))
+                return [types.SimpleNamespace(ents=[types.SimpleNamespace(text='System Agent')]) for _ in texts]
+
+        spacy = types.ModuleType('spacy')
+        spacy.load = lambda name: Processor()
+        saved = sys.modules.get('spacy')
+        sys.modules['spacy'] = spacy
+        try:
+            resolver = NameResolver(fallback='spacy')
+            resolver.set_agents(self.profiles)
+            results = resolver.resolve_many([('Ask System  Agent.', 'Agent'), ('WriterAgent', 'Agent'), ('Nobody', 'Agent')])
+        finally:
+            if saved is None:
+                del sys.modules['spacy']
+            else:
+                sys.modules['spacy'] = saved
+        self.assertEqual(results, [['SystemAgent'], ['WriterAgent'], ['SystemAgent']])
+        self.assertEqual(batches, [['Ask System  Agent.', 'Nobody']])
+
+    def test_invalid_fallback(self):
+        with self.assertRaises(Exception):
+            NameResolver(fallback='nltk')
+
+    def test_from_config(self):
+        resolver = NameResolver.from_config({'case_sensitive': True, 'fallback': 'none'})
+        self.assertTrue(resolver.case_sensitive)
+        self.assertIsNone(resolver.fallback)
@@ -0,0 +1,62 @@
+import unittest
+from agent.prompt_packer.main import PromptPacker
+
+
+def make_messages(name:str, count:int, tokens:int) -> list:
+    return [{'from': name, 'message': f'{name} {number}', 'tokens': tokens} for number in range(count)]
+
+
+class TestPromptPacker(unittest.TestCase):
+
+    def setUp(self):
+        self.packer = PromptPacker(newest_count=2, summary_share=0.25)
+        self.head = {'from': 'System', 'message': 'Prompt', 'tokens': 10}
+
+    def test_everything_fits(self):
+        history = make_messages('Agent1', 3, 10)
+        memories = make_messages('Memory', 2, 5)
+        before, middle, after, summary_length = self.packer.pack(self.head, history, memories, 100)
+        self.assertEqual(before, [self.head] + memories + history)
+        self.assertIsNone(middle)
+        self.assertEqual((after, summary_length), ([], 0))
+
+    def test_memories_before_older_history(self):
+        history = make_messages('Agent1', 6, 10)
+        memories = make_messages('Memory', 2, 10)
+        before, middle, after, summary_length = self.packer.pack(self.head, history, memories, 80)
+        self.assertEqual(before, [self.head] + memories)
+        self.assertEqual(after[-2:], history[-2:])
+        self.assertEqual(middle + after, history)
+        self.assertGreaterEqual(summary_length, 10)
+        total = sum(message['tokens'] for message in before + after) + summary_length
+        self.assertLessEqual(total, 80)
+
+    def test_skips_memories_that_do_not_fit(self):
+        history = make_messages('Agent1', 2, 10)
+        memories = [{'from': 'Memory', 'message': 'Long', 'tokens': 50}] + make_messages('Memory', 1, 5)
+        before, middle, _, _ = self.packer.pack(self.head, history, memories, 40)
+        self.assertEqual(before, [self.head] + memories[1:] + history)
+        self.assertIsNone(middle)
+
+    def test_starting_prompt_too_long(self):
+        with self.assertRaises(Exception):
+            self.packer.pack(self.head, [], [], 5)
+
+    def test_last_message_too_long(self):
+        with self.assertRaises(Exception):
+            self.packer.pack(self.head, make_messages('Agent1', 1, 50), [], 40)
+
+    def test_invalid_newest_count(self):
+        with self.assertRaises(Exception):
+            PromptPacker(newest_count=0)
+
+    def test_history_total_fits(self):
+        history = make_messages('Agent1', 3, 10)
+        before, middle, _, _ = self.packer.pack(self.head, history, [], 40, history_tokens=30)
+        self.assertEqual(before, [self.head] + history)
+        self.assertIsNone(middle)
+
+    def test_history_total_overflows(self):
+        history = make_messages('Agent1', 6, 10)
+        _, middle, after, _ = self.packer.pack(self.head, history, [], 50, history_tokens=60)
+        self.assertEqual(middle + after, history)
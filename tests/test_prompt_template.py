@@ -0,0 +1,48 @@
+import unittest
+from agent.prompt_template.main import PromptTemplate, PromptTemplates
+
+
+class TestPromptTemplates(unittest.TestCase):
+
+    def setUp(self):
+        self.templates = PromptTemplates()
+        self.values = {'guidance': 'Help <supervisor>. <commands:user,system>', 'name': 'Agent1', 'supervisor': 'Boss'}
+        self.commands = {'user': ['ask_user()'], 'system': ['run()', 'ask_user()'], 'agent': ['spawn()']}
+
+    def render(self, template:str) -> str:
+        return ''.join(self.templates.render(template, self.values, self.commands))
+
+    def test_segments(self):
+        template = PromptTemplate('Hi <name>, <commands:user> <commands>')
+        self.assertEqual(template.segments, [('text', 'Hi '), ('field', 'name'), ('text', ', '),
+                                             ('commands', ('user',)), ('text', ' '), ('commands', None)])
+
+    def test_fields_and_nested_values(self):
+        self.assertEqual(self.render('<name>: <guidance>'), 'Agent1: Help Boss. ask_user()\n\nrun()')
+
+    def test_unknown_field_kept(self):
+        self.assertEqual(self.render('<name> <agents:subordinate> <role>'), 'Agent1 <agents:subordinate> <role>')
+
+    def test_later_values_are_not_filled_with_earlier_fields(self):
+        values = {'name': 'Agent1', 'supervisor': 'Boss of <name>'}
+        self.assertEqual(''.join(self.templates.render('<supervisor>', values, {})), 'Boss of <name>')
+
+    def test_first_command_block_chooses_tags(self):
+        self.assertEqual(self.render('<commands> | <commands:agent>'),
+                         'ask_user()\n\nrun()\n\nspawn() | ask_user()\n\nrun()\n\nspawn()')
+        self.assertEqual(self.render('<commands:agent> | <commands>'), 'spawn() | spawn()')
+
+    def test_compiled_once(self):
+        self.render('<name>')
+        compiled = self.templates.get('<name>')
+        self.render('<name>')
+        self.assertIs(self.templates.get('<name>'), compiled)
+
+    def test_command_block_rebuilt_for_other_commands(self):
+        self.assertEqual(self.render('<commands:agent>'), 'spawn()')
+        self.commands = {'agent': ['retire()']}
+        self.assertEqual(self.render('<commands:agent>'), 'retire()')
+
+    def test_template_not_a_string(self):
+        with self.assertRaises(Exception):
+            PromptTemplate(None)
@@ -0,0 +1,103 @@
+import asyncio
+import os
+import tempfile
+import unittest
+import uuid
+import datetime
+from agent.main import Agent
+from agent.summary_cache.main import SummaryCache
+from chat_api.main import ChatApi
+from config_manager.main import ConfigManager
+
+
+class SummarizingChatApi(ChatApi):
+
+    def __init__(self):
+        super().__init__(host='https://127.0.0.1', port=5000)
+        self.sent = 0
+
+    def send(self, message, max_tokens:int = 200, timeout:int = 120) -> str:
+        self.sent += 1
+        return 'A summary.'
+
+    async def asend(self, message, max_tokens:int = 200, timeout:int = 120) -> str:
+        self.sent += 1
+        return 'A summary.'
+
+
+class TestSummaryCache(unittest.TestCase):
+
+    def setUp(self):
+
+        self.cache = SummaryCache(max_entries=2)
+        self.request = 'Please summarize the below text.\n\nAgent1: Message 1\n\n'
+
+    def test_get_missing(self):
+        self.assertIsNone(self.cache.get('model', 100, self.request))
+
+    def test_put_get(self):
+        self.cache.put('model', 100, self.request, 'A summary.')
+        self.assertEqual(self.cache.get('model', 100, self.request), 'A summary.')
+
+    def test_key_includes_budget_and_model(self):
+        self.cache.put('model', 100, self.request, 'A summary.')
+        self.assertIsNone(self.cache.get('model', 50, self.request))
+        self.assertIsNone(self.cache.get('other-model', 100, self.request))
+
+    def test_least_recently_used_dropped(self):
+        self.cache.put('model', 100, 'first', 'First summary.')
+        self.cache.put('model', 100, 'second', 'Second summary.')
+        self.cache.get('model', 100, 'first')
+        self.cache.put('model', 100, 'third', 'Third summary.')
+        self.assertIsNone(self.cache.get('model', 100, 'second'))
+        self.assertEqual(self.cache.get('model', 100, 'first'), 'First summary.')
+
+    def test_disk_tier_survives_restart(self):
+        directory = tempfile.TemporaryDirectory()
+        path = os.path.join(directory.name, 'summaries.db')
+        cache = SummaryCache(path=path)
+        cache.put('model', 100, self.request, 'A summary.')
+        cache.close()
+        cache = SummaryCache(path=path)
+        self.assertEqual(cache.get('model', 100, self.request), 'A summary.')
+        cache.close()
+        directory.cleanup()
+
+    def test_invalid_max_entries(self):
+        with self.assertRaises(Exception):
+            SummaryCache(max_entries=0)
+
+
+class TestAgentSummaryCache(unittest.TestCase):
+
+    def setUp(self):
+
+        current_directory = os.path.dirname(os.path.abspath(__file__))
+        config_manager = ConfigManager(os.path.join(current_directory, 'test_config.yaml'))
+        self.chat_api = SummarizingChatApi()
+        self.agent = Agent(self.chat_api, config_manager.get_agents()[0], config_manager.get_project(),
+                           str(uuid.uuid4()), summary_cache=SummaryCache())
+        self.messages = [
+            {
+                'from': 'Agent1',
+                'to': 'ChiefExecAgent',
+                'message': 'Message 1',
+                'timestamp': datetime.datetime.now().strftime(self.agent.TIME_FORMAT),
+                'tokens': 100
+            }
+        ]
+
+    def test_summarize_once(self):
+        self.assertEqual(self.agent.summarize(self.messages, 100), 'A summary.')
+        self.assertEqual(self.agent.summarize(self.messages, 100), 'A summary.')
+        self.assertEqual(self.chat_api.sent, 1)
+
+    def test_asummarize_shares_cache(self):
+        self.agent.summarize(self.messages, 100)
+        self.assertEqual(asyncio.run(self.agent.asummarize(self.messages, 100)), 'A summary.')
+        self.assertEqual(self.chat_api.sent, 1)
+
+    def test_summarize_new_budget(self):
+        self.agent.summarize(self.messages, 100)
+        self.agent.summarize(self.messages, 50)
+        self.assertEqual(self.chat_api.sent, 2)
@@ -0,0 +1,177 @@
+import asyncio
+import os
+import subprocess
+import sys
+import threading
+import time
+import unittest
+from chat_api.main import ChatApi
+from config_manager.main import ConfigManager
+from main import AgentSwarm
+
+
+class Script:
+
+    def __init__(self, respond):
+        self.respond = respond
+        self.lock = threading.Lock()
+        self.prompts = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def start(self, message) -> str:
+        with self.lock:
+            self.prompts.append(message)
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            return self.respond(message)
+
+    def finish(self):
+        with self.lock:
+            self.in_flight -= 1
+
+
+class ScriptedChatApi(ChatApi):
+
+    script = None
+
+    def __init__(self, host:str, port:int, user_string:str = '', agent_string:str = '', http_pool = None):
+        super().__init__(host=host, port=port, user_string=user_string, agent_string=agent_string)
+
+    def send(self, message, max_tokens:int = 200, timeout:int = 120) -> str:
+        reply = self.script.start(message)
+        time.sleep(0.02)
+        self.script.finish()
+        return reply
+
+    async def asend(self, message, max_tokens:int = 200, timeout:int = 120) -> str:
+        reply = self.script.start(message)
+        await asyncio.sleep(0.02)
+        self.script.finish()
+        return reply
+
+
+def reply_to_chief(message) -> str:
+    # ChiefExecAgent asks SystemAgent for help once, everyone else has nothing to say
+    if message[0]['from'] == 'System' and message[0]['to'] == 'ChiefExecAgent':
+        return 'SystemAgent, please deploy the release.'
+    return ''
+
+
+def load_configuration() -> ConfigManager:
+    configuration = ConfigManager(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'test_config.yaml'))
+    configuration.config['exit_on_quiescence'] = True
+    return configuration
+
+
+def create_scripted_swarm(configuration:ConfigManager, script:Script, start:bool = False) -> AgentSwarm:
+    driver = type('Driver', (ScriptedChatApi,), {'script': script})
+
+    class ScriptedSwarm(AgentSwarm):
+        def get_chat_driver(self, backend:str) -> type:
+            return driver
+
+    return ScriptedSwarm(configuration, start=start)
+
+
+class TestAgentSwarm(unittest.TestCase):
+
+    def setUp(self):
+        self.configuration = load_configuration()
+
+    def create_swarm(self, respond, **properties) -> AgentSwarm:
+        self.configuration.config.update(properties)
+        self.script = Script(respond)
+        return create_scripted_swarm(self.configuration, self.script)
+
+    def add_agents(self, count:int):
+        base = self.configuration.get_agents()[1]
+        self.configuration.config['agents'] = self.configuration.get_agents() + [
+            dict(base, name=f'WorkerAgent{number}') for number in range(count)]
+
+    def run_swarm(self, swarm:AgentSwarm):
+        loop = threading.Thread(target=swarm.start_loop)
+        loop.start()
+        loop.join(timeout=10)
+        if loop.is_alive():
+            swarm.stop()
+            loop.join()
+            self.fail('the swarm did not become idle')
+
+    def test_exits_when_quiescent(self):
+        swarm = self.create_swarm(lambda message: '')
+        self.run_swarm(swarm)
+        self.assertEqual(len(self.script.prompts), 2)
+        self.assertFalse(swarm.should_continue)
+
+    def test_delivery_wakes_recipient(self):
+        swarm = self.create_swarm(reply_to_chief)
+        self.run_swarm(swarm)
+        self.assertEqual(len(self.script.prompts), 3)
+        self.assertEqual(self.script.prompts[-1][-1]['message'], 'SystemAgent, please deploy the release.')
+
+    def test_agents_share_one_driver(self):
+        swarm = self.create_swarm(lambda message: '')
+        self.assertEqual(len(swarm.chat_apis), 1)
+        self.assertEqual(set(id(agent.chat_api) for agent in swarm.agents.values()), {id(swarm.chat_apis['tgwui'])})
+        swarm.shutdown_interpreters()
+
+    def test_shutdown_closes_every_resource(self):
+        swarm = self.create_swarm(lambda message: '')
+        closed = []
+        memory_close, summary_cache_close = swarm.memory.close, swarm.summary_cache.close
+
+        def fail_memory_close():
+            memory_close()
+            raise Exception('disk full')
+
+        swarm.memory.close = fail_memory_close
+        swarm.summary_cache.close = lambda: closed.append(summary_cache_close())
+        with self.assertRaises(Exception):
+            swarm.shutdown_interpreters()
+        self.assertEqual(closed, [None])
+
+    def test_lazy_agent_created_on_first_message(self):
+        swarm = self.create_swarm(reply_to_chief, lazy_agents=True)
+        self.assertEqual(list(swarm.agents), ['ChiefExecAgent'])
+        self.run_swarm(swarm)
+        self.assertEqual(list(swarm.agents), ['ChiefExecAgent', 'SystemAgent'])
+        # SystemAgent reads its system prompt and the message in the same turn
+        self.assertEqual(len(self.script.prompts), 3)
+        self.assertEqual([prompt[0]['from'] for prompt in self.script.prompts[1:]], ['System', 'ChiefExecAgent'])
+        self.assertIs(swarm.agents['SystemAgent'].chat_api, swarm.agents['ChiefExecAgent'].chat_api)
+
+    def test_lazy_agent_never_messaged(self):
+        swarm = self.create_swarm(lambda message: '', lazy_agents=True)
+        self.run_swarm(swarm)
+        self.assertEqual(list(swarm.agents), ['ChiefExecAgent'])
+        self.assertEqual(len(self.script.prompts), 1)
+
+    def test_backend_cap_threads(self):
+        self.add_agents(4)
+        swarm = self.create_swarm(lambda message: '', max_concurrent_per_backend={'tgwui': 2})
+        self.run_swarm(swarm)
+        self.assertEqual(len(self.script.prompts), 6)
+        self.assertLessEqual(self.script.max_in_flight, 2)
+
+    def test_backend_cap_async(self):
+        self.add_agents(4)
+        swarm = self.create_swarm(lambda message: '', interpret_mode='async',
+                                  max_concurrent_per_backend={'tgwui': 2})
+        self.run_swarm(swarm)
+        self.assertEqual(len(self.script.prompts), 6)
+        self.assertEqual(self.script.max_in_flight, 2)
+
+    def test_exits_with_stdin_open(self):
+        # A pipe that is never closed, as under docker run -i or CI
+        program = ('from tests.test_swarm import Script, create_scripted_swarm, load_configuration\n'
+                   'create_scripted_swarm(load_configuration(), Script(lambda message: ""), start=True)\n')
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        swarm = subprocess.Popen([sys.executable, '-c', program], cwd=root, stdin=subprocess.PIPE,
+                                 stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        try:
+            self.assertEqual(swarm.wait(timeout=30), 0, swarm.stderr.read().decode())
+        finally:
+            swarm.kill()
+            swarm.stdin.close()
+            swarm.stderr.close()